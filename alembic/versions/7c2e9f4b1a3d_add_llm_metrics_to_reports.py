@@ -0,0 +1,28 @@
+"""Add llm_metrics to reports
+
+Revision ID: 7c2e9f4b1a3d
+Revises: 4a41fdb03e69
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9f4b1a3d'
+down_revision: Union[str, Sequence[str], None] = '4a41fdb03e69'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reports', sa.Column('llm_metrics', sa.JSON(), nullable=True, comment='LLM 调用指标（token、首 token 延迟、耗时、重试）'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reports', 'llm_metrics')
@@ -0,0 +1,28 @@
+"""Add push_content to reports
+
+Revision ID: b3d91e6c2f47
+Revises: 7c2e9f4b1a3d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d91e6c2f47'
+down_revision: Union[str, Sequence[str], None] = '7c2e9f4b1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reports', sa.Column('push_content', sa.Text(), nullable=True, comment='推送摘要（Markdown，微信推送用）'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reports', 'push_content')
@@ -0,0 +1,78 @@
+"""Store report content and HTML gzip-compressed
+
+Revision ID: d58a0c7e9b12
+Revises: b3d91e6c2f47
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import gzip
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd58a0c7e9b12'
+down_revision: Union[str, Sequence[str], None] = 'b3d91e6c2f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BLOB = sa.LargeBinary().with_variant(mysql.MEDIUMBLOB(), 'mysql')
+
+reports = sa.table(
+    'reports',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.JSON(none_as_null=True)),
+    sa.column('html_content', sa.Text),
+    sa.column('content_gz', sa.LargeBinary),
+    sa.column('html_gz', sa.LargeBinary),
+)
+
+
+def _gzip(text):
+    return gzip.compress(text.encode('utf-8'), compresslevel=6, mtime=0) if text is not None else None
+
+
+def _gunzip(blob):
+    return gzip.decompress(blob).decode('utf-8') if blob is not None else None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reports', sa.Column('content_gz', BLOB, nullable=True, comment='结构化内容（LLM 生成的 JSON，gzip 压缩）'))
+    op.add_column('reports', sa.Column('html_gz', BLOB, nullable=True, comment='HTML 格式内容（gzip 压缩）'))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(reports.c.id, reports.c.content, reports.c.html_content)).fetchall()
+    for row in rows:
+        content = json.dumps(row.content, ensure_ascii=False, separators=(',', ':')) if row.content is not None else None
+        bind.execute(
+            reports.update().where(reports.c.id == row.id).values(
+                content_gz=_gzip(content), html_gz=_gzip(row.html_content)
+            )
+        )
+
+    op.drop_column('reports', 'html_content')
+    op.drop_column('reports', 'content')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('reports', sa.Column('content', sa.JSON(), nullable=True, comment='结构化内容（LLM 生成的 JSON）'))
+    op.add_column('reports', sa.Column('html_content', sa.Text(), nullable=True, comment='HTML 格式内容'))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(reports.c.id, reports.c.content_gz, reports.c.html_gz)).fetchall()
+    for row in rows:
+        content = _gunzip(row.content_gz)
+        bind.execute(
+            reports.update().where(reports.c.id == row.id).values(
+                content=json.loads(content) if content is not None else None, html_content=_gunzip(row.html_gz)
+            )
+        )
+
+    op.drop_column('reports', 'html_gz')
+    op.drop_column('reports', 'content_gz')
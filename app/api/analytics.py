@@ -0,0 +1,163 @@
+"""Analytics API - 组合分析看板接口"""
+
+from datetime import date
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.logging import get_logger
+from app.core.exceptions import (
+    PortfolioManagerError,
+    PortfolioNotFoundError,
+    EmptyPortfolioError,
+    DataError
+)
+from app.services.data_service import DataService
+from app.services.correlation_service import CorrelationService
+from app.services.backtest_service import BacktestService
+from app.services.rebalance_service import RebalanceService
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+
+class RebalanceRequest(BaseModel):
+    """调仓模拟请求"""
+    targets: Dict[str, float] = Field(..., description="股票代码 → 目标仓位（%，占总资产）")
+    target_allocation: Optional[Dict] = Field(None, description="目标仓位结构（可选，格式同周报 target_allocation）")
+
+
+@router.get("/correlation")
+def get_correlation(
+    portfolio_id: int = Query(1, description="持仓组合ID"),
+    refresh: bool = Query(False, description="是否忽略缓存重新计算"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取持仓相关系数矩阵与层次聚类结果
+
+    优先返回周报生成时已算好的同交易日结果；无缓存时拉取行情现算并写入缓存。
+    与周报使用同一份持仓行情快照，缓存键中的持仓列表与行情区间一致。
+    """
+    correlation_service = CorrelationService()
+    data_service = None
+
+    try:
+        data_service = DataService(db)
+        snapshot = data_service.get_holdings_snapshot(portfolio_id, refresh=refresh)
+        result = None if refresh else correlation_service.get_cached(snapshot.panel, snapshot.weights, portfolio_id)
+        cached = result is not None
+
+        if result is None:
+            logger.info(f"📊 计算持仓相关性: portfolio_id={portfolio_id}")
+            result = correlation_service.analyze(
+                snapshot.panel,
+                snapshot.weights,
+                snapshot.names,
+                portfolio_id=portfolio_id,
+                refresh=refresh
+            )
+
+        return {
+            "success": True,
+            "portfolio_id": portfolio_id,
+            "cached": cached,
+            "correlation": result
+        }
+
+    except PortfolioNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.to_dict())
+    except EmptyPortfolioError as e:
+        raise HTTPException(status_code=400, detail=e.to_dict())
+    except PortfolioManagerError as e:
+        raise HTTPException(status_code=500, detail=e.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ 计算持仓相关性失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={
+            "error_code": "ANALYTICS_ERROR",
+            "message": str(e)
+        })
+    finally:
+        if data_service:
+            data_service.close()
+
+
+@router.get("/backtest")
+def backtest_action_plans(
+    portfolio_id: int = Query(1, description="持仓组合ID"),
+    start: Optional[date] = Query(None, description="起始日期"),
+    end: Optional[date] = Query(None, description="截止日期"),
+    cost_bps: float = Query(10.0, ge=0, description="单边交易成本（基点）"),
+    risk_free_rate: float = Query(0.0, ge=0, description="年化无风险利率"),
+    db: Session = Depends(get_db)
+):
+    """
+    回测历史周报中的 AI 调仓建议
+
+    按每期 action_plan 的目标仓位在缓存日线上回放，并与“什么都不做”对比，
+    返回双方的净值曲线、收益、夏普、最大回撤和换手率。
+    """
+    try:
+        logger.info(f"📈 回测 AI 调仓建议: portfolio_id={portfolio_id}")
+        service = BacktestService(db, cost_bps=cost_bps, risk_free_rate=risk_free_rate)
+        result = service.run(portfolio_id, start, end)
+        return {"success": True, **result}
+
+    except DataError as e:
+        raise HTTPException(status_code=404, detail=e.to_dict())
+    except PortfolioManagerError as e:
+        raise HTTPException(status_code=500, detail=e.to_dict())
+    except Exception as e:
+        logger.error(f"✗ 回测失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={
+            "error_code": "BACKTEST_ERROR",
+            "message": str(e)
+        })
+
+
+@router.post("/rebalance")
+def simulate_rebalance(
+    request: RebalanceRequest,
+    portfolio_id: int = Query(1, description="持仓组合ID"),
+    db: Session = Depends(get_db)
+):
+    """
+    模拟调仓：把目标仓位转换为整手委托并按涨跌停、交易成本模拟成交
+
+    复用周报生成时缓存的持仓行情快照，修改目标后可反复调用。
+    """
+    data_service = None
+
+    try:
+        data_service = DataService(db)
+        snapshot = data_service.get_holdings_snapshot(portfolio_id)
+        targets = {code: pct / 100 for code, pct in request.targets.items()}
+        result = RebalanceService().simulate(snapshot, targets, request.target_allocation)
+        return {
+            "success": True,
+            "portfolio_id": portfolio_id,
+            "trading_day": snapshot.panel.trading_day.isoformat() if snapshot.panel.trading_day else None,
+            "rebalance": result
+        }
+
+    except PortfolioNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.to_dict())
+    except EmptyPortfolioError as e:
+        raise HTTPException(status_code=400, detail=e.to_dict())
+    except PortfolioManagerError as e:
+        raise HTTPException(status_code=500, detail=e.to_dict())
+    except Exception as e:
+        logger.error(f"✗ 调仓模拟失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={
+            "error_code": "REBALANCE_ERROR",
+            "message": str(e)
+        })
+    finally:
+        if data_service:
+            data_service.close()
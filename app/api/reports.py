@@ -1,11 +1,16 @@
 """Reports API - 周报生成接口"""
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import LargeBinary, type_coerce
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 from datetime import datetime
+import time
 
-from app.core.database import get_db
+from app.core.compression import GZIP_MAGIC, accepts_gzip, decompress_text
+from app.core.database import SessionLocal, get_db
 from app.core.config import settings
 from app.core.logging import get_logger, ProgressTracker
 from app.core.exceptions import (
@@ -17,21 +22,145 @@ from app.core.exceptions import (
     ReportGenerationError
 )
 from app.services.data_service import DataService
+from app.services.llm_metrics import LLMUsage, summarize_reports
 from app.services.llm_service import LLMService
 from app.services.template_service import TemplateService
 from app.services.notification_service import NotificationService
+from app.services.rebalance_service import RebalanceService
 from app.models import Report
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# 业务异常 → HTTP 状态码（按顺序匹配，子类在前）
+ERROR_STATUS = (
+    (PortfolioNotFoundError, 404),
+    (EmptyPortfolioError, 400),
+    (LLMAPIError, 502),
+    (TemplateRenderError, 500),
+    (PortfolioManagerError, 500),
+)
+
+
+def _to_http_exception(e: Exception, progress: ProgressTracker) -> HTTPException:
+    """周报生成失败时结束进度跟踪，并把异常转换为对应的 HTTP 错误"""
+    progress.complete(success=False, message=str(e))
+    for error_type, status_code in ERROR_STATUS:
+        if isinstance(e, error_type):
+            return HTTPException(status_code=status_code, detail=e.to_dict())
+    logger.error(f"生成周报失败: {e}", exc_info=True)
+    return HTTPException(status_code=500, detail={
+        "error_code": "UNKNOWN_ERROR",
+        "message": f"生成周报失败: {str(e)}"
+    })
+
+
+async def _collect_report_data(
+    data_service: DataService,
+    portfolio_id: int,
+    use_cache: bool,
+    fanout: Optional[bool],
+    usage: LLMUsage,
+    progress: ProgressTracker
+) -> Dict[str, Any]:
+    """
+    周报生成的前三步：获取持仓行情、LLM 分析、调仓模拟
+
+    行情拉取、数据库查询和调仓模拟都是同步调用，放到线程池执行，避免阻塞事件循环。
+
+    Returns:
+        Dict: 模板渲染所需的完整数据（report_data + analysis + rebalance）
+    """
+    # 步骤 1: 获取数据
+    progress.step("获取持仓和行情数据")
+    report_data = await run_in_threadpool(data_service.get_weekly_report_data, portfolio_id)
+    
+    if not report_data:
+        raise ReportGenerationError("数据获取", "无法获取周报数据")
+    
+    holdings_count = len(report_data.get('holdings', []))
+    logger.info(f"   ✓ 数据获取完成，持仓数量: {holdings_count}")
+    
+    # 步骤 2: LLM 分析
+    progress.step("LLM 智能分析")
+    llm_service = LLMService(
+        api_url=settings.LLM_API_URL,
+        api_key=settings.LLM_API_KEY,
+        model=settings.LLM_MODEL
+    )
+    
+    analysis = await llm_service.generate_weekly_analysis_async(
+        report_data, use_cache=use_cache, fanout=fanout, usage=usage
+    )
+    
+    if not analysis:
+        raise ReportGenerationError("LLM分析", "LLM 返回空结果")
+    
+    # 步骤 3: 合并数据
+    progress.step("合并数据")
+    rebalance = {}
+    try:
+        rebalance = await run_in_threadpool(_simulate_rebalance, data_service, portfolio_id, analysis)
+    except Exception as e:
+        logger.warning(f"   ⚠️ 调仓模拟失败: {e}")
+    
+    complete_data = {
+        **report_data,
+        'analysis': analysis,
+        'rebalance': rebalance
+    }
+    logger.info("   ✓ 数据合并完成")
+    return complete_data
+
+
+def _simulate_rebalance(data_service: DataService, portfolio_id: int, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """按 LLM 操作建议模拟调仓（同步，供线程池调用）"""
+    snapshot = data_service.get_holdings_snapshot(portfolio_id)
+    return RebalanceService().simulate_analysis(snapshot, analysis)
+
+
+def _save_report(
+    db: Session,
+    portfolio_id: int,
+    analysis: Dict[str, Any],
+    html: str,
+    push_content: Optional[str],
+    started: float,
+    usage: LLMUsage
+) -> Optional[Report]:
+    """保存周报（HTML 与推送摘要一起保存，重新推送时直接复用），失败时回滚并返回 None"""
+    try:
+        report = Report(
+            portfolio_id=portfolio_id,
+            report_type="weekly",
+            report_date=datetime.now().date(),
+            content=analysis,
+            html_content=html,
+            push_content=push_content,
+            pushed=False,
+            generation_time=round(time.perf_counter() - started),
+            llm_tokens=usage.total_tokens,
+            llm_metrics=usage.to_dict()
+        )
+        db.add(report)
+        db.commit()
+        db.refresh(report)
+        logger.info(f"   ✓ 周报已保存，ID: {report.id}")
+        return report
+    except Exception as e:
+        logger.error(f"   ⚠️ 保存到数据库失败: {e}")
+        db.rollback()
+        return None
+
 
 @router.post("/weekly")
 async def generate_weekly_report(
     portfolio_id: int = Query(1, description="持仓组合ID"),
     skip_push: bool = Query(False, description="是否跳过推送"),
     save_to_db: bool = Query(True, description="是否保存到数据库"),
+    use_cache: bool = Query(True, description="是否使用 LLM 响应缓存（False 时强制重新生成）"),
+    fanout: Optional[bool] = Query(None, description="是否按个股并行生成分析（默认取 LLM_FANOUT 配置）"),
     db: Session = Depends(get_db)
 ):
     """
@@ -52,71 +181,33 @@ async def generate_weekly_report(
     progress.start()
     
     data_service = None
+    started = time.perf_counter()
     
     try:
-        logger.info(f"参数: portfolio_id={portfolio_id}, skip_push={skip_push}, save_to_db={save_to_db}")
+        logger.info(f"参数: portfolio_id={portfolio_id}, skip_push={skip_push}, save_to_db={save_to_db}, use_cache={use_cache}")
         
-        # 步骤 1: 获取数据
-        progress.step("获取持仓和行情数据")
+        # 步骤 1-3: 数据、LLM 分析与调仓模拟
         data_service = DataService(db)
-        report_data = data_service.get_weekly_report_data(portfolio_id)
-        
-        if not report_data:
-            raise ReportGenerationError("数据获取", "无法获取周报数据")
-        
-        holdings_count = len(report_data.get('holdings', []))
-        logger.info(f"   ✓ 数据获取完成，持仓数量: {holdings_count}")
-        
-        # 步骤 2: LLM 分析
-        progress.step("LLM 智能分析")
-        llm_service = LLMService(
-            api_url=settings.LLM_API_URL,
-            api_key=settings.LLM_API_KEY,
-            model=settings.LLM_MODEL
-        )
-        
-        analysis = llm_service.generate_weekly_analysis(report_data)
-        
-        if not analysis:
-            raise ReportGenerationError("LLM分析", "LLM 返回空结果")
-        
-        # 步骤 3: 合并数据
-        progress.step("合并数据")
-        complete_data = {
-            **report_data,
-            'analysis': analysis
-        }
-        logger.info("   ✓ 数据合并完成")
+        usage = LLMUsage()
+        complete_data = await _collect_report_data(data_service, portfolio_id, use_cache, fanout, usage, progress)
+        analysis = complete_data['analysis']
         
         # 步骤 4: 渲染 HTML
         progress.step("渲染 HTML 模板")
         template_service = TemplateService()
-        html = template_service.render_weekly_report(complete_data)
+        html = await run_in_threadpool(template_service.render_weekly_report, complete_data)
         
         if not html:
             raise ReportGenerationError("HTML渲染", "渲染结果为空")
         
+        push_content = await run_in_threadpool(template_service.render_push_digest, complete_data)
+        
         # 步骤 5: 保存和推送
         progress.step("保存和推送")
         report_id = None
         if save_to_db:
-            try:
-                report = Report(
-                    portfolio_id=portfolio_id,
-                    report_type="weekly",
-                    report_date=datetime.now().date(),
-                    content=analysis,
-                    html_content=html,
-                    pushed=False
-                )
-                db.add(report)
-                db.commit()
-                db.refresh(report)
-                report_id = report.id
-                logger.info(f"   ✓ 周报已保存，ID: {report_id}")
-            except Exception as e:
-                logger.error(f"   ⚠️ 保存到数据库失败: {e}")
-                db.rollback()
+            report = await run_in_threadpool(_save_report, db, portfolio_id, analysis, html, push_content, started, usage)
+            report_id = report.id if report else None
         
         # 推送到微信
         pushed = False
@@ -124,9 +215,11 @@ async def generate_weekly_report(
             try:
                 logger.info("   📱 正在推送到微信...")
                 notification_service = NotificationService(settings.SERVERCHAN_KEY)
-                pushed = notification_service.send_weekly_report(
+                pushed = await run_in_threadpool(
+                    notification_service.send_weekly_report,
                     html_content=html,
-                    report_date=datetime.now()
+                    report_date=datetime.now(),
+                    push_content=push_content
                 )
                 
                 # 更新数据库中的推送状态
@@ -155,6 +248,7 @@ async def generate_weekly_report(
             "html": html,
             "html_length": len(html),
             "pushed": pushed,
+            "llm_metrics": {k: v for k, v in usage.to_dict().items() if k != "details"},
             "analysis_summary": {
                 "core_viewpoint": analysis.get("core_viewpoint", "")[:100] + "...",
                 "stock_count": len(analysis.get("stock_analysis", [])),
@@ -162,52 +256,102 @@ async def generate_weekly_report(
             }
         }
     
-    except PortfolioNotFoundError as e:
-        progress.complete(success=False, message=str(e))
-        raise HTTPException(status_code=404, detail=e.to_dict())
+    except HTTPException:
+        raise
     
-    except EmptyPortfolioError as e:
-        progress.complete(success=False, message=str(e))
-        raise HTTPException(status_code=400, detail=e.to_dict())
+    except Exception as e:
+        raise _to_http_exception(e, progress)
+    
+    finally:
+        # 确保关闭服务
+        if data_service:
+            try:
+                data_service.close()
+            except Exception:
+                pass
+
+
+@router.post("/weekly/stream")
+async def stream_weekly_report(
+    portfolio_id: int = Query(1, description="持仓组合ID"),
+    save_to_db: bool = Query(True, description="渲染完成后是否保存到数据库"),
+    use_cache: bool = Query(True, description="是否使用 LLM 响应缓存（False 时强制重新生成）"),
+    fanout: Optional[bool] = Query(None, description="是否按个股并行生成分析（默认取 LLM_FANOUT 配置）"),
+    db: Session = Depends(get_db)
+):
+    """
+    生成周报并以流式 HTML 返回（text/html，不推送）
     
-    except LLMAPIError as e:
-        progress.complete(success=False, message=str(e))
-        raise HTTPException(status_code=502, detail=e.to_dict())
+    数据获取与 LLM 分析完成后，HTML 边渲染边发送：浏览器无需等待整页拼接完成即可开始解析，
+    也不会像 /weekly 那样把整页 HTML 再编码进一个 JSON 响应。
+    渲染开始前的错误返回与 /weekly 相同的 HTTP 错误；开始发送后出错只能中断响应。
+    """
+    progress = ProgressTracker(logger, total_steps=4, task_name="周报生成（流式）")
+    progress.start()
     
-    except TemplateRenderError as e:
-        progress.complete(success=False, message=str(e))
-        raise HTTPException(status_code=500, detail=e.to_dict())
+    data_service = None
+    started = time.perf_counter()
     
-    except PortfolioManagerError as e:
-        progress.complete(success=False, message=str(e))
-        raise HTTPException(status_code=500, detail=e.to_dict())
+    try:
+        data_service = DataService(db)
+        usage = LLMUsage()
+        complete_data = await _collect_report_data(data_service, portfolio_id, use_cache, fanout, usage, progress)
+        
+        progress.step("流式渲染 HTML")
+        template_service = TemplateService()
+        chunks = template_service.stream_weekly_report(complete_data)
+        push_content = None
+        if save_to_db:
+            push_content = await run_in_threadpool(template_service.render_push_digest, complete_data)
     
     except HTTPException:
         raise
     
     except Exception as e:
-        progress.complete(success=False, message=str(e))
-        logger.error(f"生成周报失败: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail={
-            "error_code": "UNKNOWN_ERROR",
-            "message": f"生成周报失败: {str(e)}"
-        })
+        raise _to_http_exception(e, progress)
     
     finally:
-        # 确保关闭服务
         if data_service:
             try:
                 data_service.close()
             except Exception:
                 pass
+    
+    def body() -> Iterator[str]:
+        parts = []
+        try:
+            for chunk in chunks:
+                if save_to_db:
+                    parts.append(chunk)
+                yield chunk
+        except TemplateRenderError as e:
+            progress.complete(success=False, message=str(e))
+            return
+        
+        report_id = None
+        if save_to_db:
+            # 请求的数据库会话在部分 FastAPI 版本中先于流式响应结束关闭，这里单独创建会话
+            session = SessionLocal()
+            try:
+                report = _save_report(
+                    session, portfolio_id, complete_data['analysis'], "".join(parts), push_content, started, usage
+                )
+                report_id = report.id if report else None
+            finally:
+                session.close()
+        progress.complete(success=True, message=f"报告ID: {report_id}")
+    
+    # body 是同步生成器，Starlette 会在线程池中迭代，渲染与入库不占用事件循环
+    return StreamingResponse(body(), media_type="text/html; charset=utf-8")
 
 
 @router.get("/latest")
 async def get_latest_report(
     portfolio_id: int = Query(1, description="持仓组合ID"),
+    include_html: bool = Query(True, description="是否返回 HTML（False 时只读取元数据）"),
     db: Session = Depends(get_db)
 ):
-    """获取最新周报"""
+    """获取最新周报（HTML 延迟加载，include_html=False 时不读取也不解压）"""
     try:
         logger.debug(f"获取最新周报: portfolio_id={portfolio_id}")
         
@@ -229,7 +373,7 @@ async def get_latest_report(
             "id": report.id,
             "report_date": report.report_date,
             "created_at": report.created_at,
-            "html_content": report.html_content,
+            "html_content": report.html_content if include_html else None,
             "pushed": report.pushed
         }
     
@@ -243,6 +387,48 @@ async def get_latest_report(
         })
 
 
+@router.get("/metrics")
+async def get_llm_metrics(
+    portfolio_id: Optional[int] = Query(None, description="持仓组合ID（不传则统计全部）"),
+    limit: int = Query(50, ge=1, le=500, description="最近的报告数量"),
+    db: Session = Depends(get_db)
+):
+    """获取最近周报的 LLM 用量与延迟指标（按模型汇总，用于跟踪换模型后的成本与延迟变化）"""
+    try:
+        query = db.query(
+            Report.id, Report.report_date, Report.created_at,
+            Report.generation_time, Report.llm_tokens, Report.llm_metrics
+        ).filter(Report.llm_metrics.isnot(None))
+        if portfolio_id is not None:
+            query = query.filter(Report.portfolio_id == portfolio_id)
+        rows = query.order_by(Report.created_at.desc()).limit(limit).all()
+
+        records = [
+            {
+                "id": row.id,
+                "report_date": row.report_date,
+                "created_at": row.created_at,
+                "generation_time": row.generation_time,
+                "llm_tokens": row.llm_tokens,
+                "llm_metrics": {k: v for k, v in (row.llm_metrics or {}).items() if k != "details"},
+            }
+            for row in rows
+        ]
+
+        return {
+            "count": len(records),
+            "by_model": summarize_reports(records),
+            "reports": records
+        }
+
+    except Exception as e:
+        logger.error(f"✗ 获取 LLM 指标失败: {e}")
+        raise HTTPException(status_code=500, detail={
+            "error_code": "DATABASE_ERROR",
+            "message": str(e)
+        })
+
+
 @router.get("/{report_id}")
 async def get_report(
     report_id: int,
@@ -284,6 +470,41 @@ async def get_report(
         })
 
 
+@router.get("/{report_id}/html")
+async def get_report_html(
+    report_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    获取周报 HTML 页面
+    
+    HTML 在库中以 gzip 压缩存储：客户端接受 gzip 时原样返回库中的字节（Content-Encoding: gzip），
+    不做解压和再压缩；否则解压后返回。
+    """
+    try:
+        blob = db.query(type_coerce(Report.html_content, LargeBinary)).filter(Report.id == report_id).scalar()
+    except Exception as e:
+        logger.error(f"✗ 获取周报 HTML 失败: {e}")
+        raise HTTPException(status_code=500, detail={
+            "error_code": "DATABASE_ERROR",
+            "message": str(e)
+        })
+    
+    if blob is None:
+        raise HTTPException(status_code=404, detail={
+            "error_code": "REPORT_NOT_FOUND",
+            "message": f"周报不存在或没有 HTML 内容: ID={report_id}"
+        })
+    
+    headers = {"Vary": "Accept-Encoding"}
+    blob = bytes(blob)
+    if accepts_gzip(request.headers.get("accept-encoding")) and blob.startswith(GZIP_MAGIC):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=blob, media_type="text/html; charset=utf-8", headers=headers)
+    return HTMLResponse(content=decompress_text(blob), headers=headers)
+
+
 @router.post("/{report_id}/push")
 async def push_report(
     report_id: int,
@@ -321,9 +542,11 @@ async def push_report(
         
         # 推送
         notification_service = NotificationService(settings.SERVERCHAN_KEY)
-        pushed = notification_service.send_weekly_report(
+        pushed = await run_in_threadpool(
+            notification_service.send_weekly_report,
             html_content=report.html_content,
-            report_date=report.report_date
+            report_date=report.report_date,
+            push_content=report.push_content
         )
         
         if pushed:
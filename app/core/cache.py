@@ -0,0 +1,114 @@
+"""
+In-Process Cache - 进程内缓存
+
+按交易日分区的计算结果缓存：同一交易日内相同输入只计算一次，
+新交易日写入时自动淘汰旧交易日的数据。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Hashable, Optional, Tuple
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    计算输入的稳定指纹（sha256），用作缓存键
+
+    Args:
+        parts: 任意可 JSON 序列化的对象
+
+    Returns:
+        str: 十六进制摘要
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TradingDayCache:
+    """按交易日分区的 LRU 缓存（线程安全）"""
+
+    def __init__(self, maxsize: int = 256):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大缓存条目数
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[date, Hashable], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latest_day: Optional[date] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, trading_day: date, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            trading_day: 交易日
+            key: 缓存键
+
+        Returns:
+            缓存的值，不存在返回 None
+        """
+        with self._lock:
+            value = self._data.get((trading_day, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end((trading_day, key))
+            self.hits += 1
+            return value
+
+    def latest(self, key: Hashable) -> Optional[Tuple[date, Any]]:
+        """
+        读取某个键在最近一个交易日的缓存（不关心具体是哪一天时使用）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Tuple[date, Any]: (交易日, 缓存值)，不存在返回 None
+        """
+        with self._lock:
+            days = [k[0] for k in self._data if k[1] == key]
+            if not days:
+                self.misses += 1
+                return None
+            day = max(days)
+            self._data.move_to_end((day, key))
+            self.hits += 1
+            return day, self._data[(day, key)]
+
+    def set(self, trading_day: date, key: Hashable, value: Any) -> None:
+        """
+        写入缓存（写入更新的交易日时淘汰旧交易日数据）
+
+        Args:
+            trading_day: 交易日
+            key: 缓存键
+            value: 缓存值
+        """
+        with self._lock:
+            if self._latest_day is None or trading_day > self._latest_day:
+                self._latest_day = trading_day
+                for stale in [k for k in self._data if k[0] < trading_day]:
+                    del self._data[stale]
+
+            self._data[(trading_day, key)] = value
+            self._data.move_to_end((trading_day, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._latest_day = None
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,84 @@
+"""
+Compression - 报告内容的压缩存储
+
+周报 HTML 与结构化 JSON 以 gzip 压缩后入库（文本约压缩到 1/5 ~ 1/8）。选用 gzip 而不是 zstd：
+所有浏览器和 HTTP 客户端都支持 Content-Encoding: gzip，接口可以把库中的字节原样返回，
+省去“解压 → 再由中间件压缩”的往返。
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+GZIP_MAGIC = b"\x1f\x8b"
+COMPRESS_LEVEL = 6
+
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    """
+    压缩文本（mtime 固定为 0，相同内容得到相同字节）
+
+    Args:
+        text: 文本，None 原样返回
+
+    Returns:
+        bytes: gzip 数据
+    """
+    if text is None:
+        return None
+    return gzip.compress(text.encode("utf-8"), compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def decompress_text(blob: Optional[bytes]) -> Optional[str]:
+    """
+    解压文本（兼容未压缩的旧数据）
+
+    Args:
+        blob: gzip 数据，None 原样返回
+
+    Returns:
+        str: 文本
+    """
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    if blob.startswith(GZIP_MAGIC):
+        blob = gzip.decompress(blob)
+    return blob.decode("utf-8")
+
+
+def compress_json(value: Any) -> Optional[bytes]:
+    """序列化为紧凑 JSON 后压缩，None 原样返回"""
+    if value is None:
+        return None
+    return compress_text(json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+
+
+def decompress_json(blob: Optional[bytes]) -> Any:
+    """解压并解析 JSON，None 原样返回"""
+    text = decompress_text(blob)
+    return json.loads(text) if text is not None else None
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    客户端是否接受 gzip 编码的响应
+
+    Args:
+        accept_encoding: 请求头 Accept-Encoding
+
+    Returns:
+        bool: gzip（未列出时看 *）的 q 值大于 0
+    """
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
@@ -1,7 +1,7 @@
 """Application configuration"""
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -29,6 +29,27 @@ class Settings(BaseSettings):
     LLM_API_URL: str
     LLM_API_KEY: str
     LLM_MODEL: str = "gemini-3-pro-preview-thinking"
+    LLM_TIMEOUT: float = 300.0  # 秒
+    LLM_MAX_CONNECTIONS: int = 10
+    LLM_HTTP2: bool = True  # 需安装 h2（httpx[http2]）
+    LLM_PROMPT_VERSION: str = "v1"  # 提示词模板版本（prompts/ 下的子目录）
+    LLM_PROMPT_MAX_TOKENS: int = 24000  # 用户提示词 token 预算（本地估算）
+    LLM_FANOUT: bool = False  # 按个股并行生成 stock_analysis
+    LLM_FANOUT_CONCURRENCY: int = 4
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "output/cache/llm_responses.sqlite3"
+    LLM_CACHE_TTL_HOURS: float = 168.0  # 7 天，<= 0 表示不过期
+    LLM_CACHE_MAX_ENTRIES: int = 200
+    LLM_FALLBACK_MODELS: List[str] = []  # 主模型失败后依次尝试的后备模型（环境变量用 JSON 数组）
+    LLM_MODEL_DEADLINES: Dict[str, float] = {}  # 模型 → 截止时间（秒，含重试），环境变量用 JSON 对象
+    LLM_DEFAULT_DEADLINE: float = 0.0  # 未单独配置的模型的截止时间，<= 0 表示不限制
+    LLM_SECTION_REPAIR: bool = True  # 无效字段单独请求补全，而不是整份重新生成
+    LLM_HEDGE_AFTER: float = 0.0  # 首 token 超过该秒数时并行请求下一个模型，<= 0 关闭（对冲时不实时转发流式输出）
+    
+    # Templates
+    TEMPLATE_CACHE_DIR: str = "output/cache/jinja"  # Jinja2 字节码缓存目录，空串表示不缓存
+    TEMPLATE_AUTO_RELOAD: Optional[bool] = None  # 模板修改后自动重新加载，None 表示跟随 DEBUG
+    TEMPLATE_SECTION_CACHE_SIZE: int = 256  # 周报区块渲染结果缓存条数，0 表示不缓存
     
     # ServerChan (WeChat Notification)
     SERVERCHAN_KEY: Optional[str] = None
@@ -41,6 +62,17 @@ class Settings(BaseSettings):
     # Wind API
     WIND_API_URL: str = "http://localhost:14268"
     
+    # Analytics
+    BENCHMARK_CODE: str = "000300.SH"
+    BENCHMARK_NAME: str = "沪深300"
+    RISK_CONFIDENCE: float = 0.95
+    
+    # Trading costs (A-share)
+    COMMISSION_RATE: float = 0.00025
+    MIN_COMMISSION: float = 5.0
+    STAMP_TAX_RATE: float = 0.0005  # 仅卖出收取
+    TRANSFER_FEE_RATE: float = 0.00001
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,60 @@
+"""
+Shared HTTP Client - 共享异步 HTTP 连接池
+
+进程内复用一个 httpx.AsyncClient：保持长连接（keep-alive），避免每次 LLM 调用都重新握手；
+安装了 h2 时启用 HTTP/2。客户端与创建它的事件循环绑定，事件循环变化时（如脚本多次 asyncio.run）自动重建。
+"""
+
+import asyncio
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# HTTP/2 依赖 h2 包（httpx[http2]），未安装时退回 HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    获取共享的异步 HTTP 客户端（需在事件循环中调用）
+
+    Returns:
+        httpx.AsyncClient: 连接池客户端
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        http2 = settings.LLM_HTTP2 and HTTP2_AVAILABLE
+        _client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            )
+        )
+        _client_loop = loop
+        logger.debug(f"✓ 创建共享 HTTP 客户端 (HTTP/2: {http2})")
+    return _client
+
+
+async def close_async_client() -> None:
+    """关闭共享的异步 HTTP 客户端（应用关闭时调用）"""
+    global _client, _client_loop
+
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("✓ 共享 HTTP 客户端已关闭")
+    _client = None
+    _client_loop = None
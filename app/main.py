@@ -8,6 +8,9 @@ import logging
 from app.core.config import settings
 from app.core.logging import setup_logging, get_logger
 from app.core.exceptions import PortfolioManagerError
+from app.core.http import close_async_client
+from app.services.prompt_library import get_prompt_library
+from app.services.template_service import precompile_templates
 
 # 配置日志
 log_level = settings.LOG_LEVEL if not settings.DEBUG else "DEBUG"
@@ -75,11 +78,16 @@ async def startup_event():
     logger.info(f"   调试模式: {settings.DEBUG}")
     logger.info("=" * 60)
 
+    # 预编译提示词与 HTML 模板（模板缺失时启动即失败，而不是等到第一次生成周报）
+    get_prompt_library()
+    precompile_templates()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
     logger.info("👋 应用正在关闭...")
+    await close_async_client()
 
 
 @app.get("/")
@@ -99,8 +107,9 @@ async def health_check():
 
 
 # Include API routers
-from app.api import reports
+from app.api import reports, analytics
 
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 logger.info("✓ API 路由注册完成")
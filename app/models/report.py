@@ -1,9 +1,10 @@
 """Report model"""
 
 from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Text, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import GzipJSON, GzipText
 
 
 class Report(Base):
@@ -15,9 +16,10 @@ class Report(Base):
     report_type = Column(String(20), nullable=False, default="weekly", comment="报告类型（weekly/daily）")
     report_date = Column(Date, nullable=False, index=True, comment="报告日期")
     
-    # 报告内容
-    content = Column(JSON, nullable=True, comment="结构化内容（LLM 生成的 JSON）")
-    html_content = Column(Text, nullable=True, comment="HTML 格式内容")
+    # 报告内容（gzip 压缩存储，读写透明；延迟加载，只查元数据时不读取）
+    content = deferred(Column("content_gz", GzipJSON, nullable=True, comment="结构化内容（LLM 生成的 JSON，gzip 压缩）"))
+    html_content = deferred(Column("html_gz", GzipText, nullable=True, comment="HTML 格式内容（gzip 压缩）"))
+    push_content = Column(Text, nullable=True, comment="推送摘要（Markdown，微信推送用）")
     
     # 推送状态
     pushed = Column(Boolean, default=False, comment="是否已推送")
@@ -27,6 +29,7 @@ class Report(Base):
     # 元数据
     generation_time = Column(Integer, nullable=True, comment="生成耗时（秒）")
     llm_tokens = Column(Integer, nullable=True, comment="LLM 使用的 token 数")
+    llm_metrics = Column(JSON, nullable=True, comment="LLM 调用指标（token、首 token 延迟、耗时、重试）")
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
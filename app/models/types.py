@@ -0,0 +1,38 @@
+"""Custom column types"""
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
+
+from app.core.compression import compress_json, compress_text, decompress_json, decompress_text
+
+
+class GzipText(TypeDecorator):
+    """gzip 压缩存储的文本（读写时透明压缩 / 解压）"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        # MySQL 的 BLOB 上限 64KB，改用 MEDIUMBLOB（16MB）
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(mysql.MEDIUMBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+class GzipJSON(GzipText):
+    """gzip 压缩存储的 JSON"""
+
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_json(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_json(value)
@@ -0,0 +1,358 @@
+"""Attribution Service - 业绩归因服务
+
+把“本周 / 年初至今赚的钱从哪来”算成数字交给 LLM 解读，而不是让模型去猜：
+- 个股贡献：区间初始权重 × 区间收益，组合收益恰好等于各持仓贡献之和
+- 行业归因（Brinson-Fachler 两因子）：
+  配置效应 = (w_p,s − w_b,s) × (R_b,s − R_b)
+  选股效应 = w_p,s × (R_p,s − R_b,s)
+  现金作为单独一档（收益为 0），两类效应合计恰好等于超额收益
+
+基准行业权重与收益来自指数成分股（Wind）；取不到时退化为以指数整体收益作为各行业基准，
+此时配置效应只体现在现金仓位上。没有逐笔交易记录，区间内按当前持仓数量买入持有计算。
+全部计算在价格面板和净值序列上向量化完成。
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.cache import TradingDayCache, fingerprint
+from app.core.logging import get_logger
+from app.services.market_panel import PricePanel
+from app.services.position_book import PositionBook
+
+logger = get_logger(__name__)
+
+UNCLASSIFIED = "未分类"
+CASH_SECTOR = "现金"
+
+# 进程级缓存：行业分类与基准行业数据按交易日分区
+_attribution_cache = TradingDayCache(maxsize=64)
+
+
+def base_index(dates: pd.DatetimeIndex, start: date) -> int:
+    """
+    区间基准日下标：不晚于 start 的最后一个交易日（面板未覆盖时取首日）
+
+    Args:
+        dates: 面板交易日
+        start: 区间基准日期
+
+    Returns:
+        int: 基准日下标
+    """
+    pos = int(dates.searchsorted(pd.Timestamp(start), side="right")) - 1
+    return max(pos, 0)
+
+
+def holding_contributions(
+    closes: np.ndarray,
+    quantities: np.ndarray,
+    cash: float,
+    base: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    买入持有假设下的个股贡献
+
+    基准日之后才上市（或才有价格）的持仓按首个价格回填：视为自基准日起以首日价格持有，
+    区间收益从首个价格算起，组合净值与个股贡献覆盖同一组持仓。
+
+    Args:
+        closes: 收盘价矩阵 (T, N)
+        quantities: 持仓数量 (N,)
+        cash: 现金
+        base: 区间基准日下标
+
+    Returns:
+        Tuple: (基准日权重, 区间收益, 贡献, 组合净值序列)
+    """
+    prices = np.nan_to_num(pd.DataFrame(closes).bfill().to_numpy(), nan=0.0)
+    nav = prices @ quantities + cash
+    start = prices[base]
+    weights = quantities * start / nav[base] if nav[base] > 0 else np.zeros_like(start)
+    returns = np.divide(prices[-1] - start, start, out=np.zeros_like(start), where=start > 0)
+    return weights, returns, weights * returns, nav
+
+
+def sector_totals(sectors: Sequence[str], weights: np.ndarray, returns: np.ndarray) -> Dict[str, Tuple[float, float]]:
+    """
+    按行业汇总权重与收益
+
+    Args:
+        sectors: 每只股票所属行业
+        weights: 权重
+        returns: 区间收益
+
+    Returns:
+        Dict[str, Tuple[float, float]]: 行业 → (权重, 行业内加权收益)
+    """
+    labels, inverse = np.unique(np.asarray(sectors, dtype=object), return_inverse=True)
+    w = np.bincount(inverse, weights=weights, minlength=len(labels))
+    wr = np.bincount(inverse, weights=weights * returns, minlength=len(labels))
+    r = np.divide(wr, w, out=np.zeros_like(w), where=w != 0)
+    return {str(labels[i]): (float(w[i]), float(r[i])) for i in range(len(labels))}
+
+
+def brinson_fachler(
+    portfolio: Dict[str, Tuple[float, float]],
+    benchmark: Dict[str, Tuple[float, float]],
+    benchmark_return: float
+) -> List[Dict]:
+    """
+    Brinson-Fachler 两因子归因（交互项并入选股效应）
+
+    Args:
+        portfolio: 行业 → (组合权重, 组合行业收益)，权重合计为 1（含现金）
+        benchmark: 行业 → (基准权重, 基准行业收益)，权重合计为 1；为空时各行业以基准整体收益为参照
+        benchmark_return: 基准整体收益
+
+    Returns:
+        List[Dict]: 每个行业的权重、收益、配置效应与选股效应（比例，未乘 100）
+    """
+    sectors = list(dict.fromkeys(list(portfolio) + list(benchmark)))
+    wp = np.array([portfolio.get(s, (0.0, 0.0))[0] for s in sectors])
+    rb = np.array([
+        0.0 if s == CASH_SECTOR else benchmark.get(s, (0.0, benchmark_return))[1]
+        for s in sectors
+    ])
+    rp = np.array([portfolio[s][1] if s in portfolio else rb[i] for i, s in enumerate(sectors)])
+    wb = np.array([benchmark.get(s, (0.0, 0.0))[0] for s in sectors])
+
+    allocation = (wp - wb) * (rb - benchmark_return)
+    selection = wp * (rp - rb)
+    return [
+        {
+            "sector": s,
+            "portfolio_weight": float(wp[i]),
+            "benchmark_weight": float(wb[i]),
+            "portfolio_return": float(rp[i]),
+            "benchmark_return": float(rb[i]),
+            "allocation": float(allocation[i]),
+            "selection": float(selection[i]),
+        }
+        for i, s in enumerate(sectors)
+    ]
+
+
+class AttributionService:
+    """业绩归因服务类"""
+
+    def __init__(self, wind_service=None, cache: Optional[TradingDayCache] = None):
+        """
+        初始化归因服务
+
+        Args:
+            wind_service: Wind 服务（用于行业分类与基准成分，缺省时只做个股与现金归因）
+            cache: 交易日缓存（默认使用进程级缓存）
+        """
+        self.wind_service = wind_service
+        self.cache = cache if cache is not None else _attribution_cache
+
+    def get_sectors(self, stock_codes: List[str], trading_day: date) -> Dict[str, str]:
+        """
+        获取持仓行业分类（同一交易日缓存）
+
+        Args:
+            stock_codes: 股票代码列表
+            trading_day: 交易日（缓存分区）
+
+        Returns:
+            Dict[str, str]: 股票代码 → 行业
+        """
+        if self.wind_service is None:
+            return {code: UNCLASSIFIED for code in stock_codes}
+
+        key = fingerprint("sectors", sorted(stock_codes))
+        sectors = self.cache.get(trading_day, key)
+        if sectors is None:
+            industries = self.wind_service.get_stock_industries(stock_codes)
+            sectors = {code: industries.get(code) or UNCLASSIFIED for code in stock_codes}
+            self.cache.set(trading_day, key, sectors)
+        return sectors
+
+    def get_benchmark_sectors(
+        self,
+        index_code: str,
+        base_day: date,
+        end_day: date
+    ) -> Dict[str, Tuple[float, float]]:
+        """
+        由指数成分股汇总基准的行业权重与区间收益（同一交易日缓存）
+
+        Args:
+            index_code: 指数代码
+            base_day: 区间基准日（权重取该日）
+            end_day: 区间截止日
+
+        Returns:
+            Dict[str, Tuple[float, float]]: 行业 → (权重, 区间收益)，取不到时返回空字典
+        """
+        if self.wind_service is None:
+            return {}
+
+        key = fingerprint("benchmark_sectors", index_code, base_day, end_day)
+        cached = self.cache.get(end_day, key)
+        if cached is not None:
+            return cached
+
+        constituents = self.wind_service.get_index_constituents(index_code, base_day.isoformat())
+        result: Dict[str, Tuple[float, float]] = {}
+        if constituents:
+            codes = list(constituents)
+            industries = self.wind_service.get_stock_industries(codes)
+            returns = self.wind_service.get_period_returns(
+                codes,
+                (base_day + timedelta(days=1)).isoformat(),
+                end_day.isoformat()
+            )
+            valid = [c for c in codes if returns.get(c) is not None]
+            if valid:
+                weights = np.array([constituents[c] for c in valid])
+                result = sector_totals(
+                    [industries.get(c) or UNCLASSIFIED for c in valid],
+                    weights / weights.sum(),
+                    np.array([returns[c] for c in valid]) / 100
+                )
+        self.cache.set(end_day, key, result)
+        return result
+
+    def analyze(
+        self,
+        panel: PricePanel,
+        book: PositionBook,
+        cash: float,
+        benchmark: Optional[pd.Series] = None,
+        report_date: Optional[date] = None,
+        benchmark_code: Optional[str] = None
+    ) -> Dict:
+        """
+        计算本周与年初至今的个股贡献和行业归因
+
+        Args:
+            panel: 持仓价格面板
+            book: 持仓簿（提供持仓数量与名称）
+            cash: 现金
+            benchmark: 基准指数收盘价序列
+            report_date: 报告日期（默认面板最后一个交易日）
+            benchmark_code: 基准指数代码（用于获取成分股行业数据）
+
+        Returns:
+            Dict: {"week": ..., "ytd": ...}，面板为空时返回空字典
+        """
+        panel = panel.select(book.stock_codes)
+        if panel.trading_day is None or len(panel) < 2:
+            return {}
+
+        report_date = report_date or panel.trading_day
+        index = {code: i for i, code in enumerate(book.stock_codes)}
+        quantities = np.array([book.quantities[index[c]] for c in panel.stock_codes])
+        names = {c: book.stock_names[index[c]] or c for c in panel.stock_codes}
+        sectors = self.get_sectors(panel.stock_codes, panel.trading_day)
+
+        periods = {
+            "week": report_date - timedelta(days=7),
+            "ytd": date(report_date.year, 1, 1) - timedelta(days=1),
+        }
+        result = {}
+        for label, start in periods.items():
+            result[label] = self._period(
+                panel, quantities, cash, names, sectors, start, benchmark, benchmark_code
+            )
+
+        week = result["week"]
+        logger.info(f"   ✓ 业绩归因: 本周 {week['portfolio_return_pct']:+.2f}% "
+                    f"(基准 {week['benchmark_return_pct']:+.2f}%, "
+                    f"配置 {week['allocation_pct']:+.2f}% / 选股 {week['selection_pct']:+.2f}%)")
+        return result
+
+    def _period(
+        self,
+        panel: PricePanel,
+        quantities: np.ndarray,
+        cash: float,
+        names: Dict[str, str],
+        sectors: Dict[str, str],
+        start: date,
+        benchmark: Optional[pd.Series],
+        benchmark_code: Optional[str]
+    ) -> Dict:
+        """单个区间的归因"""
+        base = base_index(panel.dates, start)
+        base_day = panel.dates[base].date()
+        end_day = panel.trading_day
+
+        weights, returns, contributions, nav = holding_contributions(panel.closes, quantities, cash, base)
+        portfolio_return = float(nav[-1] / nav[base] - 1) if nav[base] > 0 else 0.0
+
+        # 基准：优先成分股行业数据，其次指数整体收益
+        benchmark_sectors = self.get_benchmark_sectors(benchmark_code, base_day, end_day) if benchmark_code else {}
+        index_return = None
+        if benchmark is not None and len(benchmark) > 0:
+            series = benchmark.sort_index()
+            start_value = series.asof(pd.Timestamp(base_day))
+            end_value = series.asof(pd.Timestamp(end_day))
+            if pd.notna(start_value) and pd.notna(end_value) and start_value > 0:
+                index_return = float(end_value / start_value - 1)
+
+        if benchmark_sectors:
+            benchmark_return = sum(w * r for w, r in benchmark_sectors.values())
+            source = "constituents"
+        elif index_return is not None:
+            benchmark_return = index_return
+            source = "index"
+        else:
+            benchmark_return = 0.0
+            source = "none"
+
+        codes = panel.stock_codes
+        portfolio_sectors = sector_totals([sectors[c] for c in codes], weights, returns)
+        cash_weight = float(1 - weights.sum())
+        if abs(cash_weight) > 1e-12:
+            portfolio_sectors[CASH_SECTOR] = (cash_weight, 0.0)
+        rows = brinson_fachler(portfolio_sectors, benchmark_sectors, benchmark_return)
+
+        holdings = [
+            {
+                "stock_code": codes[i],
+                "stock_name": names[codes[i]],
+                "sector": sectors[codes[i]],
+                "start_weight_pct": float(weights[i] * 100),
+                "return_pct": float(returns[i] * 100),
+                "contribution_pct": float(contributions[i] * 100),
+            }
+            for i in np.argsort(-contributions)
+        ]
+        sector_rows = sorted(
+            (
+                {
+                    "sector": r["sector"],
+                    "portfolio_weight_pct": r["portfolio_weight"] * 100,
+                    "benchmark_weight_pct": r["benchmark_weight"] * 100,
+                    "portfolio_return_pct": r["portfolio_return"] * 100,
+                    "benchmark_return_pct": r["benchmark_return"] * 100,
+                    "allocation_pct": r["allocation"] * 100,
+                    "selection_pct": r["selection"] * 100,
+                    "total_pct": (r["allocation"] + r["selection"]) * 100,
+                }
+                for r in rows
+                if r["portfolio_weight"] > 0 or abs(r["allocation"]) > 1e-6
+            ),
+            key=lambda r: -abs(r["total_pct"])
+        )
+
+        return {
+            "start": base_day.isoformat(),
+            "end": end_day.isoformat(),
+            "truncated": base_day > start,
+            "portfolio_return_pct": portfolio_return * 100,
+            "benchmark_return_pct": benchmark_return * 100,
+            "index_return_pct": index_return * 100 if index_return is not None else None,
+            "excess_return_pct": (portfolio_return - benchmark_return) * 100,
+            "allocation_pct": sum(r["allocation"] for r in rows) * 100,
+            "selection_pct": sum(r["selection"] for r in rows) * 100,
+            "benchmark_source": source,
+            "holdings": holdings,
+            "sectors": sector_rows,
+        }
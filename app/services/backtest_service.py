@@ -0,0 +1,466 @@
+"""Backtest Service - LLM 调仓建议回测服务
+
+回答 PRD 中“如果当初按 AI 的建议操作会怎样”：
+把历史周报 `Report.content.action_plan` 中的目标仓位（target_position_pct）
+作为逐期调仓指令，在缓存的日线收盘价上回放，并与“什么都不做”（首期仓位买入持有）对比。
+
+回测引擎完全基于数组面板：每个调仓区间内的持仓增长用累计对数收益一次算出，
+区间之间只做 K 次（报告数量级）的净值衔接，不存在逐日 Python 循环。
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.core.exceptions import DataError
+from app.models import Report, StockDataCache
+from app.services.market_panel import PricePanel
+from app.services.risk_service import TRADING_DAYS, max_drawdown
+
+logger = get_logger(__name__)
+
+# 缓存行情覆盖不足时，允许的首尾缺口（自然日）
+CACHE_COVERAGE_TOLERANCE_DAYS = 7
+
+
+def performance_stats(
+    nav: np.ndarray,
+    risk_free_rate: float = 0.0,
+    initial: Optional[float] = None
+) -> Dict[str, float]:
+    """
+    由净值序列计算绩效指标
+
+    Args:
+        nav: 净值序列（首个值为起点）
+        risk_free_rate: 年化无风险利率
+        initial: 计算总收益的起始净值（默认取首个值；首期调仓成本已从首个值中扣除时传入调仓前净值）
+
+    Returns:
+        Dict: 总收益、年化收益、年化波动、夏普、最大回撤（均为百分比，夏普除外）
+    """
+    if nav.size < 2:
+        return {
+            "total_return_pct": 0.0,
+            "annual_return_pct": 0.0,
+            "annual_volatility_pct": 0.0,
+            "sharpe": 0.0,
+            "max_drawdown_pct": 0.0,
+        }
+
+    daily = nav[1:] / nav[:-1] - 1
+    total = nav[-1] / (nav[0] if initial is None else initial) - 1
+    years = daily.size / TRADING_DAYS
+    annual = (1 + total) ** (1 / years) - 1 if years > 0 and total > -1 else -1.0
+    vol = float(daily.std(ddof=1)) if daily.size > 1 else 0.0
+    excess = daily.mean() - risk_free_rate / TRADING_DAYS
+    sharpe = excess / vol * np.sqrt(TRADING_DAYS) if vol > 0 else 0.0
+
+    return {
+        "total_return_pct": float(total * 100),
+        "annual_return_pct": float(annual * 100),
+        "annual_volatility_pct": float(vol * np.sqrt(TRADING_DAYS) * 100),
+        "sharpe": float(sharpe),
+        "max_drawdown_pct": max_drawdown(nav) * 100,
+    }
+
+
+class ActionPlanBacktester:
+    """目标仓位回测引擎（纯数组计算，不访问数据库）"""
+
+    def __init__(self, cost_bps: float = 10.0, risk_free_rate: float = 0.0):
+        """
+        初始化回测引擎
+
+        Args:
+            cost_bps: 单边交易成本（基点），按调仓成交额扣除
+            risk_free_rate: 年化无风险利率（现金部分按此计息，也用于夏普）
+        """
+        self.cost = cost_bps / 10000
+        self.risk_free_rate = risk_free_rate
+
+    def simulate(
+        self,
+        panel: PricePanel,
+        rebalance_dates: Sequence[date],
+        target_weights: np.ndarray,
+        initial_weights: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        按调仓计划回放组合净值
+
+        调仓在报告日收盘执行，新权重从下一个交易日的收益开始生效；
+        区间内持仓随价格漂移，不做再平衡。
+
+        Args:
+            panel: 价格面板 (T × N)
+            rebalance_dates: 调仓日期（升序）
+            target_weights: 目标权重矩阵 (K × N)，行和 ≤ 1，剩余为现金
+            initial_weights: 首期调仓前的持仓权重 (N,)；不提供时视为从现金建仓
+
+        Returns:
+            Dict: nav（与 panel.dates[start:] 对齐）、turnover（每次调仓单边换手）、起始下标
+        """
+        weights = np.asarray(target_weights, dtype=np.float64)
+        closes = panel.closes
+        t_count = closes.shape[0]
+
+        # 调仓日映射到面板行号（报告日非交易日时取之前最近的交易日）
+        dates = panel.dates.values.astype("datetime64[D]")
+        reb_idx = np.searchsorted(dates, np.asarray(rebalance_dates, dtype="datetime64[D]"), side="right") - 1
+        reb_idx = np.clip(reb_idx, 0, t_count - 1)
+        start = int(reb_idx[0])
+
+        # 面板收益率（第 t 行为 t-1 → t 的收益）与累计对数收益
+        returns = np.vstack([np.zeros((1, closes.shape[1])), panel.returns()])
+        cash_daily = self.risk_free_rate / TRADING_DAYS
+        log_growth = np.cumsum(np.log1p(returns), axis=0)
+        cash_log_growth = np.arange(t_count) * np.log1p(cash_daily)
+
+        # 每个交易日所属的调仓区间
+        rows = np.arange(start, t_count)
+        seg = np.searchsorted(reb_idx, rows, side="right") - 1
+        seg_start = reb_idx[seg]
+
+        # 区间内增长倍数：G[t, n] = Π (1 + r) over (seg_start, t]
+        growth = np.exp(log_growth[rows] - log_growth[seg_start])
+        cash_growth = np.exp(cash_log_growth[rows] - cash_log_growth[seg_start])
+        cash_weights = 1.0 - weights.sum(axis=1)
+        seg_value = np.einsum("tn,tn->t", weights[seg], growth) + cash_weights[seg] * cash_growth
+
+        # 上一区间在下一个调仓日收盘时的组合价值与漂移权重（K-1 个调仓点一次算出）
+        prev_start, next_start = reb_idx[:-1], reb_idx[1:]
+        drift = weights[:-1] * np.exp(log_growth[next_start] - log_growth[prev_start])
+        cash_drift = cash_weights[:-1] * np.exp(cash_log_growth[next_start] - cash_log_growth[prev_start])
+        seg_end_value = drift.sum(axis=1) + cash_drift
+        drift = drift / np.where(seg_end_value > 0, seg_end_value, 1.0)[:, None]
+
+        # 调仓换手（单边）与成本；首期从调仓前持仓换仓，未提供时视为从现金建仓
+        if initial_weights is None:
+            first_traded, first_turnover = weights[0].sum(), weights[0].sum()
+        else:
+            first_traded = np.abs(weights[0] - np.asarray(initial_weights, dtype=np.float64)).sum()
+            first_turnover = first_traded / 2
+        traded = np.concatenate([[first_traded], np.abs(weights[1:] - drift).sum(axis=1)])
+        turnover = np.concatenate([[first_turnover], traded[1:] / 2])
+        costs = traded * self.cost
+
+        # 区间衔接：区间起点净值 = 之前各区间末值的累积乘积 × Π(1 - 调仓成本)
+        seg_scale = np.cumprod(np.concatenate([[1.0], seg_end_value])) * np.cumprod(1 - costs)
+        nav = seg_scale[seg] * seg_value
+
+        return {
+            "start_index": start,
+            "nav": nav,
+            "turnover": turnover,
+            "costs": costs,
+        }
+
+    def run(
+        self,
+        panel: PricePanel,
+        rebalance_dates: Sequence[date],
+        target_weights: np.ndarray,
+        baseline_weights: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        回测调仓计划并与“什么都不做”对比
+
+        Args:
+            panel: 价格面板
+            rebalance_dates: 调仓日期（升序）
+            target_weights: 目标权重矩阵 (K × N)
+            baseline_weights: 基线权重 (N,)，默认取首期目标之前的持仓（由调用方提供）
+
+        Returns:
+            Dict: 策略与基线的净值序列、绩效指标和调仓明细
+        """
+        if baseline_weights is None:
+            baseline_weights = target_weights[0]
+        # 两条曲线都从基线持仓出发：基线不交易，策略首期按与基线的差额计换手和成本
+        strategy = self.simulate(panel, rebalance_dates, target_weights, initial_weights=baseline_weights)
+        baseline = self.simulate(
+            panel, rebalance_dates[:1], np.asarray([baseline_weights]), initial_weights=baseline_weights
+        )
+
+        start = strategy["start_index"]
+        nav = strategy["nav"]
+        base_nav = baseline["nav"]
+
+        # 净值以调仓前的 1.0 为起点，首期换仓成本计入总收益
+        stats = performance_stats(nav, self.risk_free_rate, initial=1.0)
+        base_stats = performance_stats(base_nav, self.risk_free_rate, initial=1.0)
+        stats["turnover"] = float(strategy["turnover"].sum())
+        stats["avg_turnover"] = float(strategy["turnover"].mean())
+        stats["cost_pct"] = float(strategy["costs"].sum() * 100)
+
+        return {
+            "dates": [d.strftime("%Y-%m-%d") for d in panel.dates[start:]],
+            "stock_codes": panel.stock_codes,
+            "strategy": {"nav": nav.tolist(), **stats},
+            "baseline": {"nav": base_nav.tolist(), **base_stats},
+            "excess_return_pct": stats["total_return_pct"] - base_stats["total_return_pct"],
+            "rebalances": [
+                {
+                    "date": pd.Timestamp(d).strftime("%Y-%m-%d"),
+                    "turnover_pct": float(strategy["turnover"][i] * 100),
+                    "weights": {
+                        code: float(target_weights[i][n])
+                        for n, code in enumerate(panel.stock_codes)
+                        if target_weights[i][n] > 0
+                    },
+                }
+                for i, d in enumerate(rebalance_dates)
+            ],
+        }
+
+
+def plans_to_schedule(
+    plans: Sequence[Tuple[date, List[Dict]]]
+) -> Tuple[List[date], List[str], np.ndarray, np.ndarray]:
+    """
+    把历史 action_plan 转换为调仓日期 + 目标权重矩阵
+
+    未出现在某期 action_plan 中的股票沿用上一期目标（首期未出现则视为 0）。
+
+    Args:
+        plans: [(报告日期, action_plan 列表)]，按日期升序
+
+    Returns:
+        Tuple: (调仓日期, 股票代码, 目标权重矩阵 K × N, 基线权重 N)
+    """
+    codes: List[str] = []
+    for _, plan in plans:
+        for item in plan:
+            code = item.get("stock_code")
+            if code and code not in codes:
+                codes.append(code)
+
+    index = {code: i for i, code in enumerate(codes)}
+    weights = np.zeros((len(plans), len(codes)))
+    baseline = np.zeros(len(codes))
+    baseline_seen = np.zeros(len(codes), dtype=bool)
+
+    for k, (_, plan) in enumerate(plans):
+        if k > 0:
+            weights[k] = weights[k - 1]
+        for item in plan:
+            code = item.get("stock_code")
+            if code not in index:
+                continue
+            i = index[code]
+            target = as_pct(item.get("target_position_pct"))
+            current = as_pct(item.get("current_position_pct"))
+            if target is not None:
+                weights[k, i] = target / 100
+            if current is not None and not baseline_seen[i]:
+                baseline[i] = current / 100
+                baseline_seen[i] = True
+
+    # 权重和超过 100% 时等比缩放（LLM 给出的目标偶尔不自洽）
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.where(totals > 1, weights / np.where(totals > 0, totals, 1), weights)
+    if baseline.sum() > 1:
+        baseline = baseline / baseline.sum()
+
+    return [d for d, _ in plans], codes, weights, baseline
+
+
+def as_pct(value) -> Optional[float]:
+    """把 LLM 输出的百分比（可能是字符串 "45%"）转换为数字"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+class BacktestService:
+    """回测服务类：从数据库读取历史周报和缓存行情并执行回测"""
+
+    def __init__(self, db: Session, cost_bps: float = 10.0, risk_free_rate: float = 0.0):
+        """
+        初始化回测服务
+
+        Args:
+            db: 数据库会话
+            cost_bps: 单边交易成本（基点）
+            risk_free_rate: 年化无风险利率
+        """
+        self.db = db
+        self.engine = ActionPlanBacktester(cost_bps=cost_bps, risk_free_rate=risk_free_rate)
+
+    def load_action_plans(
+        self,
+        portfolio_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[Tuple[date, List[Dict]]]:
+        """
+        读取历史周报中的 action_plan（同一天多份报告取最新一份）
+
+        Args:
+            portfolio_id: 组合ID
+            start: 起始日期（可选）
+            end: 截止日期（可选）
+
+        Returns:
+            List[Tuple[date, List[Dict]]]: 按日期升序的调仓计划
+        """
+        query = self.db.query(Report.report_date, Report.content).filter(
+            Report.portfolio_id == portfolio_id,
+            Report.report_type == "weekly"
+        )
+        if start:
+            query = query.filter(Report.report_date >= start)
+        if end:
+            query = query.filter(Report.report_date <= end)
+
+        plans: Dict[date, List[Dict]] = {}
+        for report_date, content in query.order_by(Report.report_date, Report.created_at):
+            plan = (content or {}).get("action_plan") if isinstance(content, dict) else None
+            if plan:
+                plans[report_date] = plan
+
+        logger.info(f"   ✓ 读取历史调仓计划: {len(plans)} 期")
+        return sorted(plans.items())
+
+    def load_close_panel(self, stock_codes: Sequence[str], start: date, end: date) -> PricePanel:
+        """
+        从行情缓存表读取收盘价面板，缓存覆盖不足的股票从 Wind 回补并写入缓存
+
+        Args:
+            stock_codes: 股票代码
+            start: 起始日期
+            end: 截止日期
+
+        Returns:
+            PricePanel: 收盘价面板
+        """
+        rows = self.db.query(
+            StockDataCache.stock_code, StockDataCache.date, StockDataCache.close_price
+        ).filter(
+            StockDataCache.stock_code.in_(list(stock_codes)),
+            StockDataCache.date >= start,
+            StockDataCache.date <= end
+        ).all()
+
+        cached = pd.DataFrame(rows, columns=["stock_code", "date", "close"])
+        frames: Dict[str, pd.DataFrame] = {}
+        tolerance = timedelta(days=CACHE_COVERAGE_TOLERANCE_DAYS)
+        missing = []
+        for code in stock_codes:
+            part = cached[cached["stock_code"] == code]
+            if part.empty or part["date"].min() > start + tolerance or part["date"].max() < end - tolerance:
+                missing.append(code)
+                continue
+            frames[code] = pd.DataFrame(
+                {"CLOSE": part["close"].astype(float).to_numpy()},
+                index=pd.to_datetime(part["date"])
+            )
+
+        if missing:
+            frames.update(self._backfill_from_wind(missing, start, end))
+
+        return PricePanel.from_frames(frames)
+
+    def _backfill_from_wind(self, stock_codes: Sequence[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        """从 Wind 拉取缺失行情并写入 stock_data_cache"""
+        from app.services.wind_service import WindService
+
+        logger.info(f"   📥 行情缓存不足，从 Wind 回补: {', '.join(stock_codes)}")
+        wind_service = WindService()
+        days = (datetime.now().date() - start).days + CACHE_COVERAGE_TOLERANCE_DAYS
+        frames = {}
+
+        for code in stock_codes:
+            df = wind_service.get_stock_data(code, days=days, fields="close,volume")
+            if df.empty or "CLOSE" not in df:
+                logger.warning(f"   ⚠️ {code} 无行情数据，回测中按现金处理")
+                continue
+            df = df[(df.index.date >= start) & (df.index.date <= end)].dropna(subset=["CLOSE"])
+            frames[code] = df
+
+            existing = {
+                d for (d,) in self.db.query(StockDataCache.date).filter(
+                    StockDataCache.stock_code == code,
+                    StockDataCache.date >= start,
+                    StockDataCache.date <= end
+                )
+            }
+            new_rows = [
+                {
+                    "stock_code": code,
+                    "date": ts.date(),
+                    "close_price": float(row["CLOSE"]),
+                    "volume": int(row["VOLUME"]) if "VOLUME" in df and pd.notna(row["VOLUME"]) else None,
+                }
+                for ts, row in df.iterrows()
+                if ts.date() not in existing
+            ]
+            if new_rows:
+                try:
+                    self.db.bulk_insert_mappings(StockDataCache, new_rows)
+                    self.db.commit()
+                except Exception as e:
+                    self.db.rollback()
+                    logger.warning(f"   ⚠️ 写入行情缓存失败: {code} - {e}")
+
+        wind_service.close()
+        return frames
+
+    def run(
+        self,
+        portfolio_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict:
+        """
+        回放组合的历史 AI 调仓建议
+
+        Args:
+            portfolio_id: 组合ID
+            start: 起始日期（可选）
+            end: 截止日期（可选，默认今天）
+
+        Returns:
+            Dict: 回测结果
+
+        Raises:
+            DataError: 没有可回放的调仓计划或行情数据
+        """
+        plans = self.load_action_plans(portfolio_id, start, end)
+        if not plans:
+            raise DataError(message="没有包含调仓计划的历史周报", error_code="NO_ACTION_PLAN")
+
+        dates, codes, weights, baseline = plans_to_schedule(plans)
+        end = end or datetime.now().date()
+        panel = self.load_close_panel(codes, dates[0], end)
+        if len(panel) < 2:
+            raise DataError(message="回测区间内没有足够的行情数据", error_code="NO_PRICE_DATA")
+
+        # 对齐到实际拿到行情的股票
+        columns = [codes.index(c) for c in panel.stock_codes]
+        weights = weights[:, columns]
+        baseline = baseline[columns]
+
+        # 面板首日之前的调仓无法回放
+        first_day = panel.dates[0].date()
+        keep = [i for i, d in enumerate(dates) if d >= first_day]
+        if not keep:
+            raise DataError(message="调仓日期早于可用行情", error_code="NO_PRICE_DATA")
+        dates = [dates[i] for i in keep]
+        weights = weights[keep]
+
+        result = self.engine.run(panel, dates, weights, baseline)
+        logger.info(f"   ✓ 回测完成: {len(dates)} 次调仓, "
+                    f"策略 {result['strategy']['total_return_pct']:+.2f}% vs "
+                    f"不操作 {result['baseline']['total_return_pct']:+.2f}%")
+        return {"portfolio_id": portfolio_id, **result}
@@ -0,0 +1,284 @@
+"""Correlation Service - 持仓相关性与聚类服务
+
+A 股组合的集中度风险主要来自相关性：几只白酒股往往表现得像同一个持仓。
+本模块基于持仓日收益率面板一次性计算两两相关系数矩阵，
+再用平均连接（average linkage）层次聚类把高度相关的持仓归为一组。
+
+相关系数矩阵与聚类按 (组合, 持仓列表, 行情区间) 在交易日缓存中共享，提示词构建和看板接口复用同一份结果；
+各簇的合计仓位与持仓权重有关，读取缓存后按当前权重计算。
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.cache import TradingDayCache, fingerprint
+from app.core.logging import get_logger
+from app.services.market_panel import PricePanel
+
+logger = get_logger(__name__)
+
+# 聚类切分阈值：相关系数不低于该值的持仓归为同一簇
+DEFAULT_CLUSTER_CORRELATION = 0.6
+
+# 高相关持仓对的展示阈值
+HIGH_CORRELATION = 0.7
+
+# 进程级缓存：按交易日分区
+_correlation_cache = TradingDayCache(maxsize=128)
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """
+    计算收益率的皮尔逊相关系数矩阵（零波动的列与其它列相关系数记为 0）
+
+    Args:
+        returns: 收益率矩阵，形状 (T, N)
+
+    Returns:
+        np.ndarray: 相关系数矩阵，形状 (N, N)
+    """
+    n = returns.shape[1]
+    if returns.shape[0] < 2 or n == 0:
+        return np.eye(n)
+
+    x = returns - returns.mean(axis=0)
+    std = np.sqrt(np.sum(x ** 2, axis=0))
+    safe = np.where(std > 0, std, 1.0)
+    corr = (x.T @ x) / np.outer(safe, safe)
+    corr[std == 0, :] = 0.0
+    corr[:, std == 0] = 0.0
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def average_linkage(distance: np.ndarray) -> List[Tuple[int, int, float, int]]:
+    """
+    平均连接层次聚类
+
+    Args:
+        distance: 对称距离矩阵，形状 (N, N)
+
+    Returns:
+        List[Tuple[int, int, float, int]]: 合并记录 (簇 a, 簇 b, 合并距离, 新簇大小)，
+            编号规则与 scipy linkage 一致：0..N-1 为叶子，之后依次为新簇
+    """
+    n = distance.shape[0]
+    d = distance.astype(np.float64).copy()
+    np.fill_diagonal(d, np.inf)
+    sizes = np.ones(n)
+    labels = list(range(n))
+    active = np.ones(n, dtype=bool)
+    merges = []
+
+    for step in range(n - 1):
+        masked = np.where(active[:, None] & active[None, :], d, np.inf)
+        i, j = np.unravel_index(np.argmin(masked), masked.shape)
+        if i > j:
+            i, j = j, i
+        height = float(masked[i, j])
+        size = sizes[i] + sizes[j]
+        merges.append((labels[i], labels[j], height, int(size)))
+
+        # Lance-Williams 更新：新簇放在 i 位置，j 失效
+        merged = (sizes[i] * d[i] + sizes[j] * d[j]) / size
+        d[i, :] = merged
+        d[:, i] = merged
+        d[i, i] = np.inf
+        sizes[i] = size
+        labels[i] = n + step
+        active[j] = False
+
+    return merges
+
+
+def leaf_order(merges: Sequence[Tuple[int, int, float, int]], n: int) -> List[int]:
+    """
+    由合并记录得到叶子顺序（用于热力图的行列排序，让相关持仓相邻）
+
+    Args:
+        merges: average_linkage 的输出
+        n: 叶子数
+
+    Returns:
+        List[int]: 叶子下标顺序
+    """
+    if n == 0:
+        return []
+    members: Dict[int, List[int]] = {i: [i] for i in range(n)}
+    for step, (a, b, _, _) in enumerate(merges):
+        members[n + step] = members.pop(a) + members.pop(b)
+    return members[n + len(merges) - 1] if merges else [0]
+
+
+def cut_clusters(merges: Sequence[Tuple[int, int, float, int]], n: int, max_distance: float) -> List[List[int]]:
+    """
+    在给定距离处切分聚类树
+
+    Args:
+        merges: average_linkage 的输出
+        n: 叶子数
+        max_distance: 最大合并距离
+
+    Returns:
+        List[List[int]]: 每个簇包含的叶子下标
+    """
+    members: Dict[int, List[int]] = {i: [i] for i in range(n)}
+    for step, (a, b, height, _) in enumerate(merges):
+        if height > max_distance:
+            break
+        members[n + step] = members.pop(a) + members.pop(b)
+    return sorted(members.values(), key=lambda c: (-len(c), c[0]))
+
+
+class CorrelationService:
+    """持仓相关性与聚类服务类"""
+
+    def __init__(
+        self,
+        cluster_correlation: float = DEFAULT_CLUSTER_CORRELATION,
+        cache: Optional[TradingDayCache] = None
+    ):
+        """
+        初始化相关性服务
+
+        Args:
+            cluster_correlation: 聚类切分的相关系数阈值
+            cache: 交易日缓存（默认使用进程级缓存）
+        """
+        self.cluster_correlation = cluster_correlation
+        self.cache = cache if cache is not None else _correlation_cache
+
+    @staticmethod
+    def cache_key(portfolio_id: Optional[int], panel: PricePanel) -> str:
+        """缓存键：组合 + 持仓列表 + 面板起始日（结束日即交易日分区）"""
+        return fingerprint("correlation", portfolio_id, sorted(panel.stock_codes), panel.dates[0].date())
+
+    @staticmethod
+    def with_weights(result: Dict, weights: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        按持仓权重汇总每簇的合计仓位（不修改缓存中的结果）
+
+        Args:
+            result: 不含仓位的相关性结果
+            weights: 股票代码 → 占总资产权重（0-1）
+
+        Returns:
+            Dict: 每个簇带 weight_pct 的结果
+        """
+        weights = weights or {}
+        clusters = [
+            {**c, "weight_pct": float(sum(weights.get(code, 0.0) for code in c["stock_codes"]) * 100)}
+            for c in result["clusters"]
+        ]
+        return {**result, "clusters": clusters}
+
+    def get_cached(
+        self,
+        panel: PricePanel,
+        weights: Optional[Dict[str, float]] = None,
+        portfolio_id: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        读取同一面板的缓存结果（看板接口使用，不触发计算）
+
+        Args:
+            panel: 持仓价格面板
+            weights: 股票代码 → 占总资产权重（0-1）
+            portfolio_id: 组合ID
+
+        Returns:
+            Dict: 相关性结果，无缓存返回 None
+        """
+        if panel.trading_day is None or len(panel.stock_codes) == 0:
+            return None
+        cached = self.cache.get(panel.trading_day, self.cache_key(portfolio_id, panel))
+        return self.with_weights(cached, weights) if cached is not None else None
+
+    def analyze(
+        self,
+        panel: PricePanel,
+        weights: Optional[Dict[str, float]] = None,
+        names: Optional[Dict[str, str]] = None,
+        portfolio_id: Optional[int] = None,
+        refresh: bool = False
+    ) -> Dict:
+        """
+        计算相关系数矩阵与聚类（同一交易日内命中缓存直接返回）
+
+        Args:
+            panel: 持仓价格面板
+            weights: 股票代码 → 占总资产权重（0-1），用于汇总每簇的合计仓位
+            names: 股票代码 → 股票名称
+            portfolio_id: 组合ID（参与缓存键）
+            refresh: 是否跳过缓存读取强制重算
+
+        Returns:
+            Dict: 相关性与聚类结果，数据不足时返回空字典
+        """
+        trading_day = panel.trading_day
+        if trading_day is None or len(panel.stock_codes) == 0:
+            return {}
+
+        key = self.cache_key(portfolio_id, panel)
+        cached = None if refresh else self.cache.get(trading_day, key)
+        if cached is not None:
+            logger.debug("   ✓ 相关性矩阵命中缓存")
+            return self.with_weights(cached, weights)
+
+        result = self._compute(panel, names or {})
+        result["trading_day"] = trading_day.isoformat()
+        self.cache.set(trading_day, key, result)
+        return self.with_weights(result, weights)
+
+    def _compute(self, panel: PricePanel, names: Dict[str, str]) -> Dict:
+        """执行相关性与聚类计算（结果与持仓权重无关）"""
+        codes = panel.stock_codes
+        n = len(codes)
+        corr = correlation_matrix(panel.returns())
+        distance = np.sqrt(np.clip(0.5 * (1.0 - corr), 0.0, 1.0))
+
+        merges = average_linkage(distance)
+        order = leaf_order(merges, n)
+        max_distance = float(np.sqrt(0.5 * (1.0 - self.cluster_correlation)))
+
+        clusters = []
+        for members in cut_clusters(merges, n, max_distance):
+            if len(members) > 1:
+                block = corr[np.ix_(members, members)]
+                avg_corr = float((block.sum() - len(members)) / (len(members) * (len(members) - 1)))
+            else:
+                avg_corr = 1.0
+            clusters.append({
+                "stock_codes": [codes[i] for i in members],
+                "stock_names": [names.get(codes[i], codes[i]) for i in members],
+                "avg_correlation": avg_corr,
+            })
+
+        # 高相关持仓对（上三角）
+        iu, ju = np.triu_indices(n, k=1)
+        pair_corr = corr[iu, ju]
+        pairs = [
+            {
+                "pair": [codes[i], codes[j]],
+                "names": [names.get(codes[i], codes[i]), names.get(codes[j], codes[j])],
+                "correlation": float(c),
+            }
+            for i, j, c in sorted(zip(iu, ju, pair_corr), key=lambda x: -x[2])
+            if c >= HIGH_CORRELATION
+        ]
+
+        multi = [c for c in clusters if len(c["stock_codes"]) > 1]
+        logger.info(f"   ✓ 相关性聚类: {n} 只持仓 → {len(clusters)} 个簇"
+                    f"（{len(multi)} 个多成员簇）, 高相关对 {len(pairs)} 个")
+
+        return {
+            "stock_codes": codes,
+            "order": [codes[i] for i in order],
+            "matrix": corr.tolist(),
+            "cluster_threshold": self.cluster_correlation,
+            "clusters": clusters,
+            "high_correlation_pairs": pairs,
+            "average_correlation": float(pair_corr.mean()) if pair_corr.size else 0.0,
+            "effective_clusters": len(clusters),
+        }
@@ -1,9 +1,12 @@
 """Data Integration Service - 数据整合服务"""
 
-from typing import Dict, List
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+import pandas as pd
 from sqlalchemy.orm import Session
 
+from app.core.cache import TradingDayCache, fingerprint
+from app.core.config import settings
 from app.core.logging import get_logger, ProgressTracker
 from app.core.exceptions import (
     PortfolioNotFoundError,
@@ -12,9 +15,94 @@ from app.core.exceptions import (
 )
 from app.services.wind_service import WindService
 from app.services.portfolio_service import PortfolioService
+from app.services.market_panel import PricePanel
+from app.services.position_book import PositionBook
+from app.services.risk_service import RiskService
+from app.services.correlation_service import CorrelationService
+from app.services.optimizer_service import OptimizerService
+from app.services.attribution_service import AttributionService
 
 logger = get_logger(__name__)
 
+# 持仓行情快照缓存：按交易日分区，键为 (组合ID, 持仓指纹)，分析接口复用周报生成时拉取的行情
+_snapshot_cache = TradingDayCache(maxsize=64)
+
+# 行情历史最少天数（技术指标与风险计算所需）
+MIN_HISTORY_DAYS = 90
+
+
+def history_days(today: Optional[date] = None) -> int:
+    """
+    行情历史天数：覆盖年初至今（YTD 归因需要上一年最后一个交易日），且不少于 MIN_HISTORY_DAYS
+
+    Args:
+        today: 当前日期（默认今天）
+
+    Returns:
+        int: 自然日天数
+    """
+    today = today or date.today()
+    return max(MIN_HISTORY_DAYS, (today - date(today.year, 1, 1)).days + 10)
+
+
+def positions_fingerprint(total_assets: float, positions: List) -> str:
+    """
+    持仓指纹：总资产与各持仓的代码、数量、成本价（增删改持仓后指纹变化，旧快照不再命中）
+
+    Args:
+        total_assets: 总资产
+        positions: 持仓列表
+
+    Returns:
+        str: 指纹
+    """
+    return fingerprint(
+        float(total_assets),
+        sorted((p.stock_code, int(p.quantity), float(p.cost_price)) for p in positions)
+    )
+
+
+class HoldingsSnapshot:
+    """持仓行情快照：价格面板 + 持仓簿 + 总资产"""
+    
+    def __init__(self, portfolio_id: int, panel: PricePanel, book: PositionBook, total_assets: float):
+        """
+        初始化快照
+        
+        Args:
+            portfolio_id: 组合ID
+            panel: 持仓价格面板
+            book: 按最新价估值的持仓簿
+            total_assets: 总资产（含现金）
+        """
+        self.portfolio_id = portfolio_id
+        self.panel = panel
+        self.book = book
+        self.total_assets = total_assets
+        self.fetched_on = date.today()
+    
+    @property
+    def weights(self) -> Dict[str, float]:
+        """股票代码 → 占总资产权重（0-1）"""
+        return self.book.weight_map(self.total_assets)
+    
+    @property
+    def names(self) -> Dict[str, str]:
+        """股票代码 → 股票名称"""
+        return {code: name or code for code, name in zip(self.book.stock_codes, self.book.stock_names)}
+    
+    @property
+    def cash(self) -> float:
+        """现金"""
+        return self.total_assets - self.book.total_market_value
+    
+    @property
+    def prev_close(self) -> Dict[str, float]:
+        """股票代码 → 前一交易日收盘价（用于涨跌停判断）"""
+        if len(self.panel) < 2:
+            return {}
+        return {code: float(self.panel.closes[-2, i]) for i, code in enumerate(self.panel.stock_codes)}
+
 
 class DataService:
     """数据整合服务类 - 整合持仓、行情、技术指标等所有数据"""
@@ -29,6 +117,10 @@ class DataService:
         self.db = db
         self.wind_service = WindService()
         self.portfolio_service = PortfolioService(db)
+        self.risk_service = RiskService(confidence=settings.RISK_CONFIDENCE)
+        self.correlation_service = CorrelationService()
+        self.optimizer_service = OptimizerService(risk_service=self.risk_service)
+        self.attribution_service = AttributionService(self.wind_service)
     
     def get_weekly_report_data(self, portfolio_id: int) -> Dict:
         """
@@ -45,7 +137,7 @@ class DataService:
             EmptyPortfolioError: 持仓组合为空
         """
         # 创建进度跟踪器
-        progress = ProgressTracker(logger, total_steps=4, task_name="周报数据获取")
+        progress = ProgressTracker(logger, total_steps=5, task_name="周报数据获取")
         progress.start()
         
         try:
@@ -67,7 +159,7 @@ class DataService:
             
             # 步骤 3: 获取每只股票的完整数据
             progress.step("获取股票行情和技术指标")
-            holdings_data = []
+            market_data = {}
             success_count = 0
             fail_count = 0
             
@@ -76,56 +168,14 @@ class DataService:
                 
                 try:
                     # 获取 Wind 数据
-                    wind_data = self.wind_service.get_stock_complete_data(position.stock_code)
+                    wind_data = self.wind_service.get_stock_complete_data(position.stock_code, days=history_days())
                     
                     if not wind_data or wind_data.get("data") is None:
                         logger.warning(f"   ⚠️  跳过 {position.stock_code}（无数据）")
                         fail_count += 1
                         continue
                     
-                    # 提取数据
-                    df = wind_data["data"]
-                    
-                    # 获取技术指标（Wind API 已经计算好了）
-                    indicators = wind_data.get("indicators", {})
-                    
-                    # 计算盈亏
-                    current_price = wind_data["latest_price"]
-                    position_metrics = self.portfolio_service.calculate_position_metrics(
-                        position, 
-                        current_price
-                    )
-                    
-                    # 整合数据
-                    holding_data = {
-                        # 基本信息
-                        "stock_code": position.stock_code,
-                        "stock_name": wind_data["name"] or position.stock_name,
-                        
-                        # 持仓信息
-                        "quantity": position.quantity,
-                        "cost_price": float(position.cost_price),
-                        
-                        # 当前行情
-                        "current_price": current_price,
-                        "volume": wind_data["volume"],
-                        "pe_ttm": wind_data["pe_ttm"],
-                        "turnover": wind_data["turnover"],
-                        
-                        # 盈亏情况
-                        "market_value": position_metrics["market_value"],
-                        "cost_value": position_metrics["cost_value"],
-                        "profit_loss": position_metrics["profit_loss"],
-                        "profit_loss_pct": position_metrics["profit_loss_pct"],
-                        
-                        # 技术指标
-                        "indicators": indicators,
-                        
-                        # 原始数据（用于进一步分析）
-                        "historical_data": df.to_dict('records')  # 转为字典列表
-                    }
-                    
-                    holdings_data.append(holding_data)
+                    market_data[position.stock_code] = wind_data
                     success_count += 1
                 
                 except Exception as e:
@@ -135,24 +185,87 @@ class DataService:
             
             logger.info(f"   📊 数据获取完成: 成功 {success_count}, 失败 {fail_count}")
             
-            if not holdings_data:
+            if not market_data:
                 raise DataError(
                     message="没有成功获取任何股票数据",
                     error_code="NO_STOCK_DATA"
                 )
             
-            # 步骤 4: 计算组合级别指标
+            # 步骤 4: 计算持仓和组合级别指标（持仓簿一次性向量化计算）
             progress.step("计算组合指标")
-            portfolio_metrics = self.portfolio_service.calculate_portfolio_metrics(
-                portfolio_id, 
-                holdings_data
+            book = self.portfolio_service.build_position_book(
+                positions,
+                prices={code: d["latest_price"] for code, d in market_data.items()},
+                names={code: d["name"] for code, d in market_data.items() if d["name"]}
+            )
+            portfolio_metrics = self.portfolio_service.calculate_portfolio_metrics(portfolio, book)
+            
+            holdings_data = []
+            for record in book.to_records(portfolio_metrics["total_assets"]):
+                wind_data = market_data[record["stock_code"]]
+                holdings_data.append({
+                    # 基本信息、持仓信息、当前行情、盈亏情况、仓位占比
+                    **record,
+                    "volume": wind_data["volume"],
+                    "pe_ttm": wind_data["pe_ttm"],
+                    "turnover": wind_data["turnover"],
+                    
+                    # 技术指标（Wind 数据已在本地计算好）
+                    "indicators": wind_data.get("indicators", {}),
+                    
+                    # 原始数据（用于进一步分析）
+                    "historical_data": wind_data["data"].to_dict('records')  # 转为字典列表
+                })
+            
+            # 步骤 5: 计算风险、相关性与参考配置（基于持仓日收益率面板）
+            progress.step("计算风险、相关性与参考配置")
+            panel = PricePanel.from_frames({code: d["data"] for code, d in market_data.items()})
+            weights = book.weight_map(portfolio_metrics["total_assets"])
+            if panel.trading_day:
+                _snapshot_cache.set(
+                    panel.trading_day,
+                    (portfolio.id, positions_fingerprint(portfolio.total_assets, positions)),
+                    HoldingsSnapshot(portfolio.id, panel, book, portfolio_metrics["total_assets"])
+                )
+            benchmark = self._get_benchmark_series()
+            risk_metrics = self.risk_service.assess(
+                panel,
+                weights=weights,
+                total_assets=portfolio_metrics["total_assets"],
+                benchmark=benchmark,
+                portfolio_id=portfolio.id
+            )
+            correlation = self.correlation_service.analyze(
+                panel,
+                weights=weights,
+                names=dict(zip(book.stock_codes, book.stock_names)),
+                portfolio_id=portfolio.id
+            )
+            optimization = self.optimizer_service.optimize(
+                panel,
+                weights=weights,
+                names=dict(zip(book.stock_codes, book.stock_names))
             )
             
-            # 5. 生成报告元数据
+            # 6. 生成报告元数据
             report_date = datetime.now().date()
             period_start = report_date - timedelta(days=7)  # 最近一周
             
-            # 6. 组装完整数据
+            # 业绩归因（本周 / 年初至今）
+            attribution = self.attribution_service.analyze(
+                panel,
+                book,
+                cash=portfolio_metrics["cash"],
+                benchmark=benchmark,
+                report_date=report_date,
+                benchmark_code=settings.BENCHMARK_CODE
+            )
+            week = attribution.get("week", {})
+            ytd = attribution.get("ytd", {})
+            weekly_return = week.get("portfolio_return_pct", 0.0)
+            benchmark_return = week.get("benchmark_return_pct", 0.0)
+            
+            # 7. 组装完整数据
             complete_data = {
                 # 报告元数据
                 "report_date": report_date.strftime("%Y-%m-%d"),
@@ -178,17 +291,35 @@ class DataService:
                     "position_ratio": portfolio_metrics["position_ratio"],
                     "cash": portfolio_metrics["cash"],
                     "cash_ratio": portfolio_metrics["cash_ratio"],
-                    "position_count": portfolio_metrics["position_count"]
+                    "position_count": portfolio_metrics["position_count"],
+                    "weekly_return": weekly_return
                 },
                 
                 # KPI 指标（用于周报顶部展示）
                 "kpis": {
-                    "weekly_return": 0,  # TODO: 需要历史数据计算
-                    "ytd_return": portfolio_metrics["total_return_pct"],  # 暂用总收益率
+                    "weekly_return": weekly_return,
+                    "benchmark_return": benchmark_return,
+                    "ytd_return": ytd.get("portfolio_return_pct", portfolio_metrics["total_return_pct"]),
                     "position_ratio": portfolio_metrics["position_ratio"],
                     "action_count": 0  # TODO: 由 LLM 生成
                 },
                 
+                # 基准
+                "benchmark_name": settings.BENCHMARK_NAME,
+                "benchmark_return": benchmark_return,
+                
+                # 业绩归因（个股贡献 + 行业 Brinson 归因）
+                "attribution": attribution,
+                
+                # 量化风险指标
+                "risk_metrics": risk_metrics,
+                
+                # 持仓相关性与聚类
+                "correlation": correlation,
+                
+                # 量化参考配置（均值-方差 / 最小方差 / 风险平价）
+                "optimization": optimization,
+                
                 # 持仓明细
                 "holdings": holdings_data
             }
@@ -214,6 +345,66 @@ class DataService:
                 error_code="DATA_FETCH_ERROR"
             )
     
+    def get_holdings_snapshot(self, portfolio_id: int, refresh: bool = False) -> HoldingsSnapshot:
+        """
+        获取持仓行情快照（优先复用当日拉取且持仓未变的缓存，否则只拉取收盘价历史，不计算技术指标）
+        
+        Args:
+            portfolio_id: 持仓组合ID
+            refresh: 是否忽略缓存重新拉取行情
+            
+        Returns:
+            HoldingsSnapshot: 持仓行情快照
+            
+        Raises:
+            PortfolioNotFoundError: 持仓组合不存在
+            EmptyPortfolioError: 持仓组合为空
+        """
+        portfolio = self.portfolio_service.get_portfolio(portfolio_id)
+        if not portfolio:
+            raise PortfolioNotFoundError(portfolio_id)
+        positions = self.portfolio_service.get_positions(portfolio_id)
+        if not positions:
+            raise EmptyPortfolioError(portfolio_id)
+        
+        key = (portfolio_id, positions_fingerprint(portfolio.total_assets, positions))
+        if not refresh:
+            hit = _snapshot_cache.latest(key)
+            # 只复用当日拉取的行情：隔日的快照缺少新交易日的收盘价
+            if hit is not None and hit[1].fetched_on == date.today():
+                logger.debug(f"   ✓ 持仓行情快照命中缓存: {hit[0]}")
+                return hit[1]
+        
+        # 与周报使用同一行情窗口，风险、相关性与跟踪误差和周报一致，并共用缓存结果
+        days = history_days()
+        frames = {p.stock_code: self.wind_service.get_stock_data(p.stock_code, days=days) for p in positions}
+        panel = PricePanel.from_frames(frames)
+        if len(panel) == 0:
+            raise DataError(message="没有成功获取任何股票数据", error_code="NO_STOCK_DATA")
+        
+        last_prices = {code: float(panel.closes[-1, i]) for i, code in enumerate(panel.stock_codes)}
+        book = self.portfolio_service.build_position_book(positions, last_prices)
+        snapshot = HoldingsSnapshot(portfolio_id, panel, book, float(portfolio.total_assets))
+        _snapshot_cache.set(panel.trading_day, key, snapshot)
+        return snapshot
+    
+    def _get_benchmark_series(self) -> Optional[pd.Series]:
+        """
+        获取基准指数收盘价序列
+        
+        Returns:
+            pd.Series: 基准收盘价，获取失败返回 None
+        """
+        try:
+            df = self.wind_service.get_stock_data(settings.BENCHMARK_CODE, days=history_days())
+            if df.empty or "CLOSE" not in df:
+                logger.warning(f"   ⚠️ 基准 {settings.BENCHMARK_CODE} 无行情数据")
+                return None
+            return df["CLOSE"]
+        except Exception as e:
+            logger.warning(f"   ⚠️ 获取基准行情失败: {e}")
+            return None
+    
     def close(self):
         """关闭服务"""
         try:
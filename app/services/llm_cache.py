@@ -0,0 +1,163 @@
+"""
+LLM Response Cache - LLM 分析结果持久化缓存
+
+以 (模型, 系统提示词, 用户提示词, 采样参数) 的指纹为键，把解析后的分析 JSON 存入本地 SQLite：
+同一份输入重复提交（推送失败后重试、重新渲染等）直接命中缓存，毫秒级返回且不消耗 token。
+
+- TTL：超过有效期的条目视为未命中并删除
+- LRU：条目数超过上限时淘汰最久未访问的条目
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.cache import fingerprint
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses (accessed_at)"
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, params: Dict[str, Any]) -> str:
+    """
+    计算 LLM 请求的缓存键
+
+    Args:
+        model: 模型名称
+        system_prompt: 系统提示词
+        user_prompt: 用户提示词
+        params: 采样参数（temperature、top_p、max_tokens 等）
+
+    Returns:
+        str: 十六进制摘要
+    """
+    return fingerprint("llm", model, system_prompt, user_prompt, params)
+
+
+class LLMResponseCache:
+    """基于 SQLite 的 LLM 响应缓存（TTL + LRU，线程安全）"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_hours: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        """
+        初始化缓存（数据库文件在首次读写时创建）
+
+        Args:
+            path: SQLite 文件路径，":memory:" 表示仅进程内
+            ttl_hours: 有效期（小时），<= 0 表示不过期
+            max_entries: 最大条目数
+        """
+        self.path = path or settings.LLM_CACHE_PATH
+        self.ttl_seconds = (settings.LLM_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self.max_entries = settings.LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL" if self.path != ":memory:" else "PRAGMA journal_mode=MEMORY")
+            self._conn.execute(_SCHEMA)
+            self._conn.execute(_INDEX)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Dict: 缓存的分析结果，不存在或已过期返回 None
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                conn.commit()
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE llm_responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            self.hits += 1
+
+        return json.loads(response)
+
+    def set(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        """
+        写入缓存（超过上限时按最近访问时间淘汰）
+
+        Args:
+            key: 缓存键
+            model: 模型名称
+            response: 分析结果
+        """
+        now = time.time()
+        payload = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, model, payload, now, now)
+            )
+            if self.ttl_seconds > 0:
+                conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key NOT IN "
+                "(SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_responses")
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
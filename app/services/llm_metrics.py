@@ -0,0 +1,193 @@
+"""
+LLM Metrics - LLM 调用用量与延迟指标
+
+- LLMCallMetrics：单次调用的 prompt/completion token、首 token 延迟（TTFT）、流式耗时、重试次数
+- LLMUsage：一次周报生成中所有调用的汇总（个股并行模式下包含多次调用），持久化到 Report.llm_metrics
+- summarize_reports：按模型汇总历史报告的指标，用于跟踪换模型后的成本与延迟变化
+
+接口未返回 usage 时用本地估算的 token 数代替，并标记 usage_estimated。
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.prompt_encoder import estimate_tokens
+
+
+class LLMCallMetrics:
+    """单次 LLM 调用的指标"""
+
+    def __init__(self, model: str, kind: str = "report"):
+        """
+        初始化调用指标
+
+        Args:
+            model: 模型名称
+            kind: 调用类型（report 完整周报 / stock 个股 / portfolio 组合层面）
+        """
+        self.model = model
+        self.kind = kind
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.usage_estimated = False
+        self.ttft_ms: Optional[float] = None
+        self.stream_ms = 0.0
+        self.retries = 0
+        self.cached = False
+        self.cancelled = False  # 对冲竞速中落败 / 超过截止时间被取消
+        self._started = 0.0
+
+    def start_attempt(self, attempt: int) -> None:
+        """开始一次请求尝试（重试时重新计时）"""
+        self.retries = attempt
+        self.ttft_ms = None
+        self._started = time.perf_counter()
+
+    def first_token(self) -> None:
+        """收到第一段增量文本"""
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self._started) * 1000
+
+    def finish(self, usage: Optional[Dict[str, Any]], prompt_text: str, output_text: str) -> None:
+        """
+        流式输出结束，记录耗时与 token 用量
+
+        Args:
+            usage: 接口返回的 usage（可能为空）
+            prompt_text: 提示词全文（用于估算）
+            output_text: 模型输出全文（用于估算）
+        """
+        self.stream_ms = (time.perf_counter() - self._started) * 1000
+        if usage and usage.get("prompt_tokens") is not None:
+            self.prompt_tokens = int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens = int(usage.get("completion_tokens") or 0)
+            self.usage_estimated = False
+        else:
+            self.prompt_tokens = estimate_tokens(prompt_text)
+            self.completion_tokens = estimate_tokens(output_text)
+            self.usage_estimated = True
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "cached": self.cached,
+            "cancelled": self.cancelled,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "usage_estimated": self.usage_estimated,
+            "ttft_ms": round(self.ttft_ms, 1) if self.ttft_ms is not None else None,
+            "stream_ms": round(self.stream_ms, 1),
+            "retries": self.retries,
+        }
+
+
+class LLMUsage:
+    """一次周报生成的 LLM 用量汇总"""
+
+    def __init__(self):
+        self.calls: List[LLMCallMetrics] = []
+        self.wall_ms = 0.0
+
+    def new_call(self, model: str, kind: str = "report") -> LLMCallMetrics:
+        """登记一次新的调用"""
+        call = LLMCallMetrics(model, kind)
+        self.calls.append(call)
+        return call
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(c.prompt_tokens for c in self.calls)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(c.completion_tokens for c in self.calls)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def retries(self) -> int:
+        return sum(c.retries for c in self.calls)
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        """最早的首 token 延迟（未命中缓存的调用中）"""
+        values = [c.ttft_ms for c in self.calls if c.ttft_ms is not None]
+        return min(values) if values else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        models = sorted({c.model for c in self.calls})
+        ttft = self.ttft_ms
+        return {
+            "model": ",".join(models),
+            "calls": len(self.calls),
+            "cached_calls": sum(1 for c in self.calls if c.cached),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "usage_estimated": any(c.usage_estimated for c in self.calls),
+            "ttft_ms": round(ttft, 1) if ttft is not None else None,
+            "stream_ms": round(sum(c.stream_ms for c in self.calls), 1),
+            "wall_ms": round(self.wall_ms, 1),
+            "retries": self.retries,
+            "details": [c.to_dict() for c in self.calls],
+        }
+
+    def summary(self) -> str:
+        """单行日志摘要"""
+        ttft = self.ttft_ms
+        estimated = "（估算）" if any(c.usage_estimated for c in self.calls) else ""
+        return (
+            f"prompt {self.prompt_tokens} / completion {self.completion_tokens} tokens{estimated}，"
+            f"TTFT {f'{ttft:.0f} ms' if ttft is not None else 'N/A'}，"
+            f"耗时 {self.wall_ms / 1000:.1f} 秒，调用 {len(self.calls)} 次，重试 {self.retries} 次"
+        )
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 1) if values else None
+
+
+def summarize_reports(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    按模型汇总历史报告的 LLM 指标
+
+    Args:
+        records: 报告指标列表，每项包含 llm_metrics（LLMUsage.to_dict 的结果）与 generation_time
+
+    Returns:
+        Dict: 模型 → {reports, avg_total_tokens, ttft_p50_ms, ttft_p95_ms, wall_p50_ms, wall_p95_ms,
+              avg_generation_time, retry_rate}
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        metrics = record.get("llm_metrics") or {}
+        if not metrics:
+            continue
+        groups.setdefault(metrics.get("model") or "unknown", []).append(record)
+
+    summary = {}
+    for model, rows in groups.items():
+        metrics = [r["llm_metrics"] for r in rows]
+        ttfts = [m["ttft_ms"] for m in metrics if m.get("ttft_ms") is not None]
+        walls = [m["wall_ms"] for m in metrics if m.get("cached_calls") != m.get("calls")]
+        times = [r["generation_time"] for r in rows if r.get("generation_time") is not None]
+        summary[model] = {
+            "reports": len(rows),
+            "avg_total_tokens": round(float(np.mean([m.get("total_tokens", 0) for m in metrics])), 1),
+            "ttft_p50_ms": _percentile(ttfts, 50),
+            "ttft_p95_ms": _percentile(ttfts, 95),
+            "wall_p50_ms": _percentile(walls, 50),
+            "wall_p95_ms": _percentile(walls, 95),
+            "avg_generation_time": round(float(np.mean(times)), 1) if times else None,
+            "retry_rate": round(sum(1 for m in metrics if m.get("retries")) / len(metrics), 3),
+        }
+    return summary
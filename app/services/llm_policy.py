@@ -0,0 +1,228 @@
+"""
+LLM Model Policy - 模型降级与对冲请求策略
+
+- 有序模型列表：主模型失败（重试耗尽、超过截止时间、输出无法解析）后依次降级到后备模型
+- 每个模型单独的截止时间：包含该模型的全部重试，避免慢模型把一份周报拖到十几分钟
+- 对冲请求（hedged request）：主模型在阈值时间内还没有输出首 token 时，并行向下一个模型发起请求，
+  先返回合法 JSON（通过 accept 检查，如必需字段齐全）的一方胜出，另一方被取消；
+  先返回的结果不完整时继续等待另一方，另一方也失败时才退回这份不完整的结果
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import LLMAPIError
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 异步调用：attempt(model, first_token) -> 解析后的结果；收到首 token 时应 set first_token
+AsyncAttempt = Callable[[str, asyncio.Event], Awaitable[Any]]
+
+# 结果检查：accept(result) -> 是否可以直接胜出
+Accept = Callable[[Any], bool]
+
+
+class ModelPolicy:
+    """模型调用策略：有序降级列表 + 每模型截止时间 + 对冲阈值"""
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        deadlines: Optional[Dict[str, float]] = None,
+        default_deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None
+    ):
+        """
+        初始化策略
+
+        Args:
+            models: 按优先级排列的模型列表（第一个为主模型）
+            deadlines: 模型 → 截止时间（秒），未配置的模型使用 default_deadline
+            default_deadline: 默认截止时间（秒），None 或 <= 0 表示不限制
+            hedge_after: 首 token 超过该时间（秒）仍未到达时发起对冲请求，None 或 <= 0 表示不对冲
+        """
+        self.models: List[str] = list(dict.fromkeys(m for m in models if m))
+        if not self.models:
+            raise ValueError("模型列表不能为空")
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+
+    @classmethod
+    def from_settings(cls, primary: str) -> "ModelPolicy":
+        """
+        按配置构建策略（LLM_FALLBACK_MODELS / LLM_MODEL_DEADLINES / LLM_DEFAULT_DEADLINE / LLM_HEDGE_AFTER）
+
+        Args:
+            primary: 主模型
+
+        Returns:
+            ModelPolicy: 策略
+        """
+        return cls(
+            [primary, *settings.LLM_FALLBACK_MODELS],
+            deadlines=settings.LLM_MODEL_DEADLINES,
+            default_deadline=settings.LLM_DEFAULT_DEADLINE,
+            hedge_after=settings.LLM_HEDGE_AFTER
+        )
+
+    @property
+    def hedging(self) -> bool:
+        """是否可能发起对冲请求（需配置阈值且存在后备模型）"""
+        return self.hedge_after is not None and len(self.models) > 1
+
+    def deadline(self, model: str) -> Optional[float]:
+        """模型的截止时间（秒），不限制时返回 None"""
+        value = self.deadlines.get(model, self.default_deadline)
+        return value if value and value > 0 else None
+
+    def run_sync(self, attempt: Callable[[str], Any]) -> Tuple[str, Any]:
+        """
+        同步执行：按顺序尝试各模型（同步调用无法并行，不做对冲）
+
+        Args:
+            attempt: attempt(model) -> 结果，失败时抛出异常
+
+        Returns:
+            Tuple[str, Any]: (胜出的模型, 结果)
+        """
+        errors = []
+        for model in self.models:
+            try:
+                return model, attempt(model)
+            except Exception as e:
+                errors.append((model, e))
+                self._log_fallback(model, e)
+        raise self._all_failed(errors)
+
+    async def run(self, attempt: AsyncAttempt, accept: Optional[Accept] = None) -> Tuple[str, Any]:
+        """
+        异步执行：按顺序尝试各模型，主模型首 token 过慢时对冲到下一个模型
+
+        Args:
+            attempt: attempt(model, first_token) -> 结果，失败时抛出异常
+            accept: 竞速时判断结果是否完整（None 表示任何结果都可胜出）
+
+        Returns:
+            Tuple[str, Any]: (胜出的模型, 结果)
+        """
+        errors: List[Tuple[str, Exception]] = []
+        index = 0
+        while index < len(self.models):
+            model = self.models[index]
+            hedge_model = self.models[index + 1] if self.hedge_after and index + 1 < len(self.models) else None
+
+            if hedge_model is None:
+                result = await self._attempt_single(model, attempt, errors)
+                index += 1
+            else:
+                result = await self._race(model, hedge_model, attempt, errors, accept)
+                index += 2
+            if result is not None:
+                return result
+
+        raise self._all_failed(errors)
+
+    async def _race(
+        self,
+        model: str,
+        hedge_model: str,
+        attempt: AsyncAttempt,
+        errors: List[Tuple[str, Exception]],
+        accept: Optional[Accept] = None
+    ) -> Optional[Tuple[str, Any]]:
+        """主模型 + 对冲模型竞速；两者都失败时返回 None（错误追加到 errors）"""
+        first_token = asyncio.Event()
+        tasks: Dict[asyncio.Task, str] = {
+            asyncio.ensure_future(self._with_deadline(model, attempt(model, first_token))): model
+        }
+        started = time.perf_counter()
+
+        try:
+            waiter = asyncio.ensure_future(first_token.wait())
+            done, _ = await asyncio.wait(
+                [waiter, *tasks], timeout=self.hedge_after, return_when=asyncio.FIRST_COMPLETED
+            )
+            waiter.cancel()
+            if not first_token.is_set() and not any(task in done for task in tasks):
+                logger.warning(
+                    f"   ⏱️ {model} 首 token 超过 {self.hedge_after:.0f} 秒，发起对冲请求: {hedge_model}"
+                )
+                tasks[asyncio.ensure_future(
+                    self._with_deadline(hedge_model, attempt(hedge_model, asyncio.Event()))
+                )] = hedge_model
+
+            pending = set(tasks)
+            incomplete = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 同时完成时先看完整的结果
+                for task in sorted(done, key=lambda t: not self._accepted(t, accept)):
+                    winner = tasks[task]
+                    if task.exception() is None:
+                        if pending and not self._accepted(task, accept):
+                            logger.warning(f"   ⚠️ {winner} 返回的结果不完整，继续等待其余请求")
+                            incomplete = incomplete or (winner, task.result())
+                            continue
+                        if len(tasks) > 1:
+                            logger.info(
+                                f"   🏁 {winner} 胜出（{time.perf_counter() - started:.1f} 秒），取消其余请求"
+                            )
+                        return winner, task.result()
+                    errors.append((winner, task.exception()))
+                    self._log_fallback(winner, task.exception())
+            if incomplete is not None:
+                return incomplete
+            if len(tasks) == 1:
+                # 主模型在对冲阈值之前就失败了：直接尝试下一个模型
+                return await self._attempt_single(hedge_model, attempt, errors)
+            return None
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _accepted(task: asyncio.Task, accept: Optional[Accept]) -> bool:
+        """任务成功且结果通过 accept 检查"""
+        return task.exception() is None and (accept is None or accept(task.result()))
+
+    async def _attempt_single(
+        self,
+        model: str,
+        attempt: AsyncAttempt,
+        errors: List[Tuple[str, Exception]]
+    ) -> Optional[Tuple[str, Any]]:
+        """单独调用一个模型；失败时返回 None（错误追加到 errors）"""
+        try:
+            return model, await self._with_deadline(model, attempt(model, asyncio.Event()))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            errors.append((model, e))
+            self._log_fallback(model, e)
+            return None
+
+    async def _with_deadline(self, model: str, call: Awaitable[Any]) -> Any:
+        deadline = self.deadline(model)
+        if deadline is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, timeout=deadline)
+        except asyncio.TimeoutError:
+            raise LLMAPIError(f"超过截止时间 {deadline:.0f} 秒")
+
+    @staticmethod
+    def _all_failed(errors: List[Tuple[str, Exception]]) -> Exception:
+        """全部模型失败时抛出的异常：只有一个模型时保留原始异常"""
+        if len(errors) == 1:
+            return errors[0][1]
+        return LLMAPIError(f"所有模型均失败（{'；'.join(f'{m}: {e}' for m, e in errors)}）")
+
+    @staticmethod
+    def _log_fallback(model: str, error: Exception) -> None:
+        logger.warning(f"   ⚠️ 模型 {model} 调用失败: {error}")
@@ -0,0 +1,371 @@
+"""
+LLM Schema - 周报分析 JSON 的结构校验与就地修复
+
+模型输出偶尔会有尾逗号、被截断的数组、不在枚举内的 status_class、带 % 的数值等小问题，
+整份丢弃重新生成代价太高。这里分两步尽量挽救：
+
+- repair_json：文本层面的修复（去掉尾逗号、截断时回退到最后一个完整元素并补齐括号）
+- validate：按 _build_system_prompt 中约定的结构逐字段校验，能修正的就地修正（数值、枚举、
+  单个字符串 → 列表），修不了的记录路径（如 ``stock_analysis[2].suggestion``），供按字段重新生成使用
+
+结构描述用普通的 dict/list 表示：``str`` / ``float`` / ``int`` / ``Choice`` 为叶子，
+``[spec]`` 表示列表，``{"key": spec}`` 表示对象，键名以 ``?`` 结尾表示可选，``"*"`` 匹配任意键。
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_NUMBER = re.compile(r"^\s*([+-]?\d[\d,]*(?:\.\d+)?)\s*%?\s*$")
+_SECTION = re.compile(r"^([^.\[]+)(?:\[(\d+)\])?")
+
+
+class Choice:
+    """枚举字段：同义词映射，取不到时可按兄弟字段的关键词推断"""
+
+    def __init__(
+        self,
+        values: Sequence[str],
+        default: Optional[str] = None,
+        synonyms: Optional[Dict[str, str]] = None,
+        infer: Optional[Tuple[str, Sequence[Tuple[str, str]]]] = None
+    ):
+        """
+        Args:
+            values: 合法取值
+            default: 无法修正时的默认值（None 表示记为校验失败）
+            synonyms: 同义词 → 合法取值
+            infer: (兄弟字段, [(关键词, 取值), ...])，按顺序匹配兄弟字段文本
+        """
+        self.values = tuple(values)
+        self.default = default
+        self.synonyms = synonyms or {}
+        self.infer = infer
+
+    def coerce(self, value: Any, parent: Dict[str, Any]) -> Optional[str]:
+        """返回修正后的取值，无法修正时返回 None"""
+        text = str(value or "").strip().lower()
+        if text in self.values:
+            return text
+        if text in self.synonyms:
+            return self.synonyms[text]
+        # 例如 "positive/negative"：取最先出现的合法值
+        found = [(text.find(v), v) for v in self.values if v in text]
+        if found:
+            return min(found)[1]
+        if self.infer:
+            key, keywords = self.infer
+            source = str(parent.get(key) or "")
+            for keyword, result in keywords:
+                if keyword in source:
+                    return result
+        return self.default
+
+
+STOCK_SCHEMA = {
+    "stock_code": str,
+    "stock_name?": str,
+    "stock_role?": str,
+    "status": str,
+    "status_class": Choice(
+        ("positive", "negative", "warning", "neutral"),
+        default="neutral",
+        synonyms={"bullish": "positive", "up": "positive", "bearish": "negative", "down": "negative",
+                  "caution": "warning", "alert": "warning"},
+        infer=("status", (("预警", "warning"), ("破位", "negative"), ("下跌", "negative"), ("空头", "negative"),
+                          ("多头", "positive"), ("反弹", "positive"), ("上涨", "positive"))),
+    ),
+    "sentiment_class?": Choice(
+        ("bull", "bear", "neutral"),
+        default="neutral",
+        synonyms={"bullish": "bull", "positive": "bull", "bearish": "bear", "negative": "bear"},
+    ),
+    "technical": str,
+    "fundamental?": str,
+    "theme?": str,
+    "risk?": str,
+    "suggestion": str,
+}
+
+ACTION_SCHEMA = {
+    "stock_code": str,
+    "stock_name?": str,
+    "action": str,
+    "action_class": Choice(
+        ("reduce", "clear", "add", "hold"),
+        synonyms={"sell": "reduce", "buy": "add", "keep": "hold", "increase": "add", "decrease": "reduce"},
+        infer=("action", (("清仓", "clear"), ("减", "reduce"), ("卖", "reduce"), ("加", "add"), ("买", "add"),
+                          ("持有", "hold"), ("观望", "hold"))),
+    ),
+    "price_range?": str,
+    "current_position_pct": float,
+    "target_position_pct": float,
+    "plan?": str,
+    "reason?": str,
+}
+
+# 目标仓位中的一项；旧格式直接给数字（如 "cash": 10），修复时补上默认名称
+ALLOCATION_SCHEMA = {"percent": float, "label": str}
+ALLOCATION_LABELS = {"consumer": "消费相关", "tech_growth": "科技成长", "dividend": "高股息/价值", "cash": "现金/货基"}
+
+# 字段的旧名称（早期提示词中使用过），缺失新字段时改名沿用
+KEY_ALIASES = {
+    "current_position_pct": ("current_position",),
+    "target_position_pct": ("target_position",),
+}
+
+REPORT_SCHEMA = {
+    "core_viewpoint": str,
+    "kpis": {
+        "weekly_return": float,
+        "benchmark_return": float,
+        "ytd_return": float,
+        "position_ratio": float,
+        "action_count": int,
+        "ytd_comment?": str,
+        "position_comment?": str,
+        "action_summary?": str,
+    },
+    "section_subtitles?": {"*": str},
+    "holdings_analysis": {
+        "summary": str,
+        "highlights": [str],
+    },
+    "stock_analysis": [STOCK_SCHEMA],
+    "action_plan": [ACTION_SCHEMA],
+    "risk_assessment": {
+        "level": str,
+        "level_score": float,
+        "current_risks": [str],
+        "optimization_suggestions": [str],
+    },
+    "sector_view": {
+        "summary": str,
+        "main_theme?": str,
+        "consumer_position?": str,
+        "portfolio_position?": str,
+        "adjustment_direction?": str,
+    },
+    "target_allocation": {
+        "*": ALLOCATION_SCHEMA,
+    },
+}
+
+# 个股并行模式下组合层面请求的结构（stock_analysis 单独生成）
+PORTFOLIO_SCHEMA = {k: v for k, v in REPORT_SCHEMA.items() if k != "stock_analysis"}
+
+# 调用类型 → 结构（与 LLMCallMetrics.kind 一致）
+SCHEMAS = {"report": REPORT_SCHEMA, "stock": STOCK_SCHEMA, "portfolio": PORTFOLIO_SCHEMA}
+
+
+class ValidationReport:
+    """校验结果：repaired 为已就地修正的字段路径，invalid 为无法修正的字段路径"""
+
+    def __init__(self):
+        self.repaired: List[str] = []
+        self.invalid: List[str] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.invalid
+
+
+def validate(data: Dict[str, Any], schema: Dict[str, Any]) -> ValidationReport:
+    """
+    按结构校验并就地修复
+
+    Args:
+        data: 解析后的 JSON（会被就地修改）
+        schema: 结构描述（REPORT_SCHEMA / STOCK_SCHEMA / PORTFOLIO_SCHEMA）
+
+    Returns:
+        ValidationReport: 修正与失败的字段路径
+    """
+    report = ValidationReport()
+    if not isinstance(data, dict):
+        report.invalid.append("")
+        return report
+    _validate_object(data, schema, "", report)
+    return report
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _validate_object(data: Dict[str, Any], schema: Dict[str, Any], path: str, report: ValidationReport) -> None:
+    wildcard = schema.get("*")
+    for raw_key, spec in schema.items():
+        if raw_key == "*":
+            continue
+        key = raw_key.rstrip("?")
+        if data.get(key) is None:
+            for alias in KEY_ALIASES.get(key, ()):
+                if data.get(alias) is not None:
+                    data[key] = data.pop(alias)
+                    report.repaired.append(_join(path, key))
+                    break
+        if data.get(key) is None:
+            if not raw_key.endswith("?"):
+                report.invalid.append(_join(path, key))
+            continue
+        _validate_field(data, key, spec, _join(path, key), report)
+
+    if wildcard is not None:
+        for key in [k for k in data if k not in schema and f"{k}?" not in schema]:
+            _validate_field(data, key, wildcard, _join(path, key), report)
+
+
+def _validate_field(parent: Any, key: Any, spec: Any, path: str, report: ValidationReport) -> bool:
+    """校验 parent[key]，必要时就地替换；返回是否有效"""
+    value = parent[key]
+
+    if spec is ALLOCATION_SCHEMA and isinstance(value, (int, float, str)) and key in ALLOCATION_LABELS:
+        parent[key] = value = {"percent": value, "label": ALLOCATION_LABELS[key]}
+        report.repaired.append(path)
+
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            report.invalid.append(path)
+            return False
+        before = len(report.invalid)
+        _validate_object(value, spec, path, report)
+        return len(report.invalid) == before
+
+    if isinstance(spec, list):
+        if isinstance(value, str) and spec[0] is str:
+            parent[key] = value = [value]
+            report.repaired.append(path)
+        if not isinstance(value, list):
+            report.invalid.append(path)
+            return False
+        valid = True
+        for index in range(len(value)):
+            valid = _validate_field(value, index, spec[0], f"{path}[{index}]", report) and valid
+        return valid
+
+    if isinstance(spec, Choice):
+        coerced = spec.coerce(value, parent if isinstance(parent, dict) else {})
+        if coerced is None:
+            report.invalid.append(path)
+            return False
+        if coerced != value:
+            parent[key] = coerced
+            report.repaired.append(path)
+        return True
+
+    if spec is str:
+        if isinstance(value, str):
+            return True
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            parent[key] = str(value)
+            report.repaired.append(path)
+            return True
+        report.invalid.append(path)
+        return False
+
+    # float / int
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if spec is int and not isinstance(value, int):
+            parent[key] = int(round(value))
+            report.repaired.append(path)
+        return True
+    match = _NUMBER.match(value) if isinstance(value, str) else None
+    if match is None:
+        report.invalid.append(path)
+        return False
+    number = float(match.group(1).replace(",", ""))
+    parent[key] = int(round(number)) if spec is int else number
+    report.repaired.append(path)
+    return True
+
+
+def field_spec(schema: Dict[str, Any], field: str) -> Any:
+    """顶层字段的结构描述（兼容可选字段的 ``?`` 后缀），不存在时返回 None"""
+    return schema.get(field, schema.get(f"{field}?"))
+
+
+def invalid_sections(paths: Sequence[str]) -> Tuple[List[str], Dict[str, List[int]]]:
+    """
+    把无法修复的字段路径归并为需要重新生成的单元
+
+    Args:
+        paths: ValidationReport.invalid 中的路径
+
+    Returns:
+        Tuple: (整体重新生成的顶层字段, {数组字段: 需要重新生成的条目序号})
+    """
+    fields: List[str] = []
+    items: Dict[str, List[int]] = {}
+    for path in paths:
+        match = _SECTION.match(path)
+        if match is None:
+            continue
+        name, index = match.group(1), match.group(2)
+        if index is None:
+            if name not in fields:
+                fields.append(name)
+        elif int(index) not in items.setdefault(name, []):
+            items[name].append(int(index))
+    return fields, {name: indices for name, indices in items.items() if name not in fields}
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    文本层面的 JSON 修复：去掉对象/数组末尾的多余逗号；输出被截断时回退到最后一个完整元素并补齐括号
+
+    Args:
+        text: 以 ``{`` 开头的 JSON 文本
+
+    Returns:
+        str: 修复后的文本（不保证一定合法，调用方仍需 json.loads），无法修复时返回 None
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    # 最后一个可以安全截断的位置：(out 长度, 当时的括号栈)
+    safe: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                return None
+            stack.pop()
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(ch)
+            if not stack:
+                break
+            safe = (len(out), tuple(stack))
+            continue
+        elif ch == "," and stack:
+            safe = (len(out), tuple(stack))
+        out.append(ch)
+
+    if not stack:
+        return "".join(out) if out else None
+    if safe is None:
+        return None
+    # 被截断：丢弃最后一个不完整的元素
+    length, open_stack = safe
+    del out[length:]
+    while out and out[-1] in " \t\r\n,":
+        out.pop()
+    out.extend(reversed(open_stack))
+    return "".join(out)
@@ -3,38 +3,107 @@
 LLM Service - 基于 Gemini API 的周报分析服务
 """
 
+import asyncio
 import requests
+import httpx
 import json
-import time
 import re
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
+from app.core.config import settings
+from app.core.http import get_async_client
 from app.core.logging import get_logger
 from app.core.exceptions import LLMAPIError, LLMResponseParseError
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_metrics import LLMCallMetrics, LLMUsage
+from app.services.llm_policy import ModelPolicy
+from app.services.llm_schema import (
+    SCHEMAS,
+    ValidationReport,
+    field_spec,
+    invalid_sections,
+    repair_json,
+    validate,
+)
+from app.services.llm_stream import IncrementalJSONParser, StreamBuffer, parse_sse_event
+from app.services.prompt_encoder import (
+    CORE_DETAIL,
+    FULL_DETAIL,
+    NO_INDICATORS,
+    encode_holdings,
+    estimate_tokens,
+    max_detail,
+)
+from app.services.prompt_library import get_prompt_library
 
 logger = get_logger(__name__)
 
+# 周报分析 JSON 的顶层字段；字段齐全的结果才写入缓存（增量解析恢复的部分结果不缓存）
+REPORT_FIELDS = (
+    "core_viewpoint",
+    "kpis",
+    "holdings_analysis",
+    "stock_analysis",
+    "action_plan",
+    "risk_assessment",
+    "sector_view",
+    "target_allocation",
+)
+
+# 个股分析条目的必需字段（并行生成时用于判断结果是否可缓存）
+STOCK_FIELDS = ("stock_code", "status", "status_class", "technical", "suggestion")
+
+# 单次请求的最大输出 token：完整周报 / 单只个股
+MAX_TOKENS = 50000
+STOCK_MAX_TOKENS = 8000
+
+# 按字段补全的最大输出 token（只输出缺失 / 无效的部分）
+REPAIR_MAX_TOKENS = 16000
+
+# 用户提示词超出 token 预算时，可选片段的省略顺序
+OPTIONAL_SECTION_DROP_ORDER = ("correlation", "optimization", "attribution", "risk")
+
+# 进程共享的响应缓存（SQLite 文件在首次使用时创建）
+_response_cache = LLMResponseCache()
+
 
 class LLMService:
     """LLM 服务类 - 调用 Gemini API 生成周报分析（JSON + HTML 片段）"""
 
-    def __init__(self, api_url: str, api_key: str, model: str = "gemini-3-pro-preview-thinking"):
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        model: str = "gemini-3-pro-preview-thinking",
+        cache: Optional[LLMResponseCache] = None,
+        policy: Optional[ModelPolicy] = None
+    ):
         """
         初始化 LLM 服务
 
         Args:
             api_url: API 地址
             api_key: API 密钥
-            model: 模型名称
+            model: 模型名称（主模型）
+            cache: 响应缓存，默认使用进程共享缓存（LLM_CACHE_ENABLED 关闭时不缓存）
+            policy: 模型降级 / 对冲策略，默认按配置以 model 为主模型构建
         """
         self.api_url = api_url
         self.api_key = api_key
         self.model = model
+        self.cache = cache if cache is not None else (_response_cache if settings.LLM_CACHE_ENABLED else None)
+        self.policy = policy or ModelPolicy.from_settings(model)
+        self.prompts = get_prompt_library()
 
     def generate_weekly_analysis(
         self,
         report_data: Dict[str, Any],
-        stream_callback=None
+        stream_callback=None,
+        field_callback=None,
+        use_cache: bool = True,
+        fanout: Optional[bool] = None,
+        usage: Optional[LLMUsage] = None
     ) -> Optional[Dict[str, Any]]:
         """
         生成周报分析内容（结构化 JSON，供 Jinja2 模板渲染）
@@ -42,6 +111,11 @@ class LLMService:
         Args:
             report_data: 周报输入数据（组合信息、持仓、行情、技术指标等）
             stream_callback: 流式输出回调函数，接收每个 token 文本
+            field_callback: 字段完成回调 field_callback(key, value, index)，顶层字段闭合时 index 为 None，
+                数组字段（如 stock_analysis）的每个元素闭合时 index 为元素序号
+            use_cache: 是否读取响应缓存（False 时强制重新生成，结果仍会写入缓存）
+            fanout: 是否按个股并行生成（默认取 LLM_FANOUT 配置），见 generate_weekly_analysis_async
+            usage: 用量收集器，传入时记录本次生成所有调用的 token、首 token 延迟、耗时与重试次数
 
         Returns:
             Dict 包含（示意结构）：
@@ -54,438 +128,988 @@ class LLMService:
                 - sector_view         板块 & 题材视角
                 - target_allocation   下周目标仓位结构
         """
+        if self._use_fanout(fanout, report_data):
+            # 并行生成依赖事件循环，同步入口（命令行脚本）在这里起一个
+            return asyncio.run(self.generate_weekly_analysis_async(
+                report_data, stream_callback=stream_callback, field_callback=field_callback,
+                use_cache=use_cache, fanout=True, usage=usage
+            ))
+
+        usage = usage if usage is not None else LLMUsage()
+        started = time.perf_counter()
+        try:
+            system_prompt, user_prompt = self._prepare_prompts(report_data)
+            response = self._cached_call(
+                system_prompt, user_prompt, REPORT_FIELDS, use_cache,
+                usage=usage, kind="report",
+                stream_callback=stream_callback, field_callback=field_callback
+            )
+            return self._check_response(response)
+
+        except LLMAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"✗ 生成周报分析失败: {e}", exc_info=True)
+            raise LLMAPIError(str(e))
+        finally:
+            usage.wall_ms = (time.perf_counter() - started) * 1000
+            if usage.calls:
+                logger.info(f"   📊 LLM 用量: {usage.summary()}")
+
+    async def generate_weekly_analysis_async(
+        self,
+        report_data: Dict[str, Any],
+        stream_callback=None,
+        field_callback=None,
+        use_cache: bool = True,
+        fanout: Optional[bool] = None,
+        usage: Optional[LLMUsage] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        生成周报分析内容（异步版本，在 API 请求处理中使用，不阻塞事件循环）
+
+        fanout 模式下先为每只持仓并行发起一个小请求生成 stock_analysis 条目（并发数受 LLM_FANOUT_CONCURRENCY 限制，
+        每只股票单独缓存），再用一次组合层面的请求基于个股结论摘要生成其余字段：
+        总耗时取决于最慢的一只股票而不是所有股票之和，单只股票解析失败也只影响该条目。
+
+        Args:
+            report_data: 周报输入数据
+            stream_callback: 流式输出回调函数，接收每个 token 文本
+            field_callback: 字段完成回调，同 generate_weekly_analysis
+            use_cache: 是否读取响应缓存
+            fanout: 是否按个股并行生成（默认取 LLM_FANOUT 配置）
+            usage: 用量收集器，同 generate_weekly_analysis
+
+        Returns:
+            Dict: 结构同 generate_weekly_analysis
+        """
+        usage = usage if usage is not None else LLMUsage()
+        started = time.perf_counter()
         try:
-            logger.info("🤖 开始生成周报分析...")
-            logger.info(f"   模型: {self.model}")
-            logger.info(f"   持仓数量: {len(report_data.get('holdings', []))}")
-            
-            system_prompt = self._build_system_prompt()
-            user_prompt = self._build_user_prompt(report_data)
-
-            response = self._call_api(system_prompt, user_prompt, stream_callback=stream_callback)
-
-            if response:
-                # 统计分析结果
-                stock_count = len(response.get("stock_analysis", []))
-                action_count = len(response.get("action_plan", []))
-                logger.info(f"✓ LLM 分析完成: {stock_count} 只股票分析, {action_count} 条调仓建议")
-                return response
+            if self._use_fanout(fanout, report_data):
+                response = await self._generate_fanout_async(
+                    report_data, stream_callback, field_callback, use_cache, usage
+                )
             else:
-                logger.error("✗ LLM 返回空结果")
-                raise LLMResponseParseError("LLM 返回空结果")
+                system_prompt, user_prompt = self._prepare_prompts(report_data)
+                response = await self._cached_call_async(
+                    system_prompt, user_prompt, REPORT_FIELDS, use_cache,
+                    usage=usage, kind="report",
+                    stream_callback=stream_callback, field_callback=field_callback
+                )
+            return self._check_response(response)
 
         except LLMAPIError:
             raise
         except Exception as e:
             logger.error(f"✗ 生成周报分析失败: {e}", exc_info=True)
             raise LLMAPIError(str(e))
+        finally:
+            usage.wall_ms = (time.perf_counter() - started) * 1000
+            if usage.calls:
+                logger.info(f"   📊 LLM 用量: {usage.summary()}")
+
+    def _prepare_prompts(self, report_data: Dict[str, Any]):
+        """记录调用信息并构建 (系统提示词, 用户提示词)"""
+        logger.info("🤖 开始生成周报分析...")
+        logger.info(f"   模型: {' → '.join(self.policy.models)}")
+        logger.info(f"   持仓数量: {len(report_data.get('holdings', []))}")
+        return self._build_system_prompt(), self._build_user_prompt(report_data)
+
+    @staticmethod
+    def _use_fanout(fanout: Optional[bool], report_data: Dict[str, Any]) -> bool:
+        """是否走个股并行生成（无持仓时没有意义）"""
+        enabled = settings.LLM_FANOUT if fanout is None else fanout
+        return bool(enabled and report_data.get("holdings"))
+
+    async def _generate_fanout_async(
+        self,
+        report_data: Dict[str, Any],
+        stream_callback=None,
+        field_callback=None,
+        use_cache: bool = True,
+        usage: Optional[LLMUsage] = None
+    ) -> Dict[str, Any]:
+        """个股并行生成 + 组合层面汇总"""
+        usage = usage if usage is not None else LLMUsage()
+        holdings = report_data.get("holdings", [])
+        logger.info("🤖 开始生成周报分析（个股并行模式）...")
+        logger.info(f"   模型: {' → '.join(self.policy.models)}")
+        logger.info(f"   持仓数量: {len(holdings)}，并发数: {settings.LLM_FANOUT_CONCURRENCY}")
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(1, settings.LLM_FANOUT_CONCURRENCY))
+        stock_system_prompt = self._build_stock_system_prompt()
+
+        async def analyze(index: int, holding: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    item = await self._cached_call_async(
+                        stock_system_prompt,
+                        self._build_stock_prompt(report_data, holding),
+                        STOCK_FIELDS,
+                        use_cache,
+                        max_tokens=STOCK_MAX_TOKENS,
+                        usage=usage,
+                        kind="stock",
+                        max_retries=2
+                    )
+                    item = {**item, "stock_code": holding.get("stock_code"), "stock_name": holding.get("stock_name")}
+                except Exception as e:
+                    logger.warning(f"   ⚠️ {holding.get('stock_name')} 个股分析失败，使用占位内容: {e}")
+                    item = self._placeholder_stock_item(holding)
+            if field_callback:
+                field_callback("stock_analysis", item, index)
+            return item
+
+        stock_items = list(await asyncio.gather(*(analyze(i, h) for i, h in enumerate(holdings))))
+        logger.info(f"   ✓ 个股分析完成: {len(stock_items)} 只，耗时 {time.perf_counter() - started:.1f} 秒")
+        if field_callback:
+            field_callback("stock_analysis", stock_items, None)
+
+        response = await self._cached_call_async(
+            self._build_system_prompt() + self.prompts.static("portfolio_note.md"),
+            self._build_user_prompt(report_data, self._format_stock_conclusions(stock_items)),
+            tuple(f for f in REPORT_FIELDS if f != "stock_analysis"),
+            use_cache,
+            usage=usage,
+            kind="portfolio",
+            stream_callback=stream_callback,
+            field_callback=field_callback
+        )
+        logger.info(f"   ✓ 组合层面分析完成，总耗时 {time.perf_counter() - started:.1f} 秒")
+        return {**response, "stock_analysis": stock_items}
+
+    def _cached_call(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        required: tuple,
+        use_cache: bool,
+        max_tokens: int = MAX_TOKENS,
+        usage: Optional[LLMUsage] = None,
+        kind: str = "report",
+        **kwargs
+    ) -> Dict[str, Any]:
+        """带响应缓存的同步调用：按模型策略依次降级（kwargs 透传给 _call_api）"""
+        key = self._cache_key(system_prompt, user_prompt, max_tokens)
+        cached = self._cache_get(key, use_cache, kwargs.get("field_callback"))
+        if cached is not None:
+            if usage is not None:
+                usage.new_call(self.model, kind).cached = True
+            return cached
+
+        model, response = self._run_policy(system_prompt, user_prompt, max_tokens, usage, kind, **kwargs)
+        validation = self._validate_and_repair(
+            system_prompt, user_prompt, response, kind, usage, kwargs.get("field_callback")
+        )
+        self._cache_set(key, response, required, model, validation)
+        return response
+
+    async def _cached_call_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        required: tuple,
+        use_cache: bool,
+        max_tokens: int = MAX_TOKENS,
+        usage: Optional[LLMUsage] = None,
+        kind: str = "report",
+        stream_callback=None,
+        field_callback=None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """带响应缓存的异步调用：按模型策略降级 / 对冲（kwargs 透传给 _call_api_async）"""
+        key = self._cache_key(system_prompt, user_prompt, max_tokens)
+        # SQLite 读写放到线程池，避免阻塞事件循环；字段回调仍在事件循环中回放
+        cached = await asyncio.to_thread(self._cache_get, key, use_cache)
+        if cached is not None:
+            self._replay_fields(cached, field_callback)
+            if usage is not None:
+                usage.new_call(self.model, kind).cached = True
+            return cached
+
+        model, response = await self._run_policy_async(
+            system_prompt, user_prompt, max_tokens, usage, kind,
+            stream_callback=stream_callback, field_callback=field_callback, required=required, **kwargs
+        )
+        validation = await self._validate_and_repair_async(
+            system_prompt, user_prompt, response, kind, usage, field_callback
+        )
+        await asyncio.to_thread(self._cache_set, key, response, required, model, validation)
+        return response
+
+    def _run_policy(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        usage: Optional[LLMUsage],
+        kind: str,
+        **kwargs
+    ) -> Tuple[str, Dict[str, Any]]:
+        """按模型策略同步调用，返回 (模型, 结果)（kwargs 透传给 _call_api）"""
+        def attempt(model: str) -> Dict[str, Any]:
+            return self._call_api(
+                system_prompt, user_prompt, max_tokens=max_tokens,
+                metrics=usage.new_call(model, kind) if usage is not None else None,
+                model=model, deadline=self.policy.deadline(model), **kwargs
+            )
+
+        return self.policy.run_sync(attempt)
+
+    async def _run_policy_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        usage: Optional[LLMUsage],
+        kind: str,
+        stream_callback=None,
+        field_callback=None,
+        required: Optional[tuple] = None,
+        **kwargs
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        按模型策略异步调用，返回 (模型, 结果)（kwargs 透传给 _call_api_async）
+
+        对冲竞速时只有 required 字段齐全的结果才能直接胜出（截断后恢复的部分结果需等待另一方）。
+        没有发起对冲时流式文本与字段回调照常转发；一旦对冲请求开始，两路输出不能交错地推给调用方，
+        此后停止转发，由胜出的结果按顺序回放字段回调。
+        """
+        state = {"running": 0, "hedged": False}
+
+        async def attempt(model: str, first_token: asyncio.Event) -> Dict[str, Any]:
+            # 已有请求在进行中时启动的就是对冲请求
+            if state["running"]:
+                state["hedged"] = True
+            state["running"] += 1
+
+            def on_chunk(chunk: str, length: int):
+                first_token.set()
+                if stream_callback and not state["hedged"]:
+                    stream_callback(chunk, length)
+
+            def on_field(*args):
+                if not state["hedged"]:
+                    field_callback(*args)
+
+            metrics = usage.new_call(model, kind) if usage is not None else None
+            try:
+                return await self._call_api_async(
+                    system_prompt, user_prompt, max_tokens=max_tokens, metrics=metrics, model=model,
+                    stream_callback=on_chunk, field_callback=on_field if field_callback else None, **kwargs
+                )
+            except asyncio.CancelledError:
+                if metrics is not None:
+                    metrics.cancelled = True
+                raise
+            finally:
+                state["running"] -= 1
+
+        def accept(result: Optional[Dict[str, Any]]) -> bool:
+            return bool(result) and all(field in result for field in required or ())
+
+        model, response = await self.policy.run(attempt, accept)
+        if state["hedged"]:
+            self._replay_fields(response, field_callback)
+        return model, response
+
+    def _validate_and_repair(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response: Dict[str, Any],
+        kind: str,
+        usage: Optional[LLMUsage] = None,
+        field_callback=None
+    ) -> ValidationReport:
+        """校验结果，无法就地修复的字段单独请求重新生成并合并回 response（同步版本），返回最终的校验结果"""
+        validation = self._validate(response, kind)
+        request = self._repair_request(user_prompt, response, validation)
+        if request is None:
+            return validation
+        prompt, fields, items = request
+        try:
+            _, patch = self._run_policy(system_prompt, prompt, REPAIR_MAX_TOKENS, usage, "repair", max_retries=2)
+        except Exception as e:
+            logger.warning(f"   ⚠️ 按字段补全失败，保留原结果: {e}")
+            return validation
+        self._merge_repair(response, patch, fields, items, kind, field_callback)
+        return validate(response, SCHEMAS.get(kind, SCHEMAS["report"]))
+
+    async def _validate_and_repair_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response: Dict[str, Any],
+        kind: str,
+        usage: Optional[LLMUsage] = None,
+        field_callback=None
+    ) -> ValidationReport:
+        """校验结果，无法就地修复的字段单独请求重新生成并合并回 response（异步版本），返回最终的校验结果"""
+        validation = self._validate(response, kind)
+        request = self._repair_request(user_prompt, response, validation)
+        if request is None:
+            return validation
+        prompt, fields, items = request
+        try:
+            _, patch = await self._run_policy_async(
+                system_prompt, prompt, REPAIR_MAX_TOKENS, usage, "repair", max_retries=2
+            )
+        except Exception as e:
+            logger.warning(f"   ⚠️ 按字段补全失败，保留原结果: {e}")
+            return validation
+        self._merge_repair(response, patch, fields, items, kind, field_callback)
+        return validate(response, SCHEMAS.get(kind, SCHEMAS["report"]))
+
+    @staticmethod
+    def _validate(response: Optional[Dict[str, Any]], kind: str = "report") -> ValidationReport:
+        """按输出结构校验并就地修复（数值、枚举等），记录无法修复的字段"""
+        report = validate(response or {}, SCHEMAS.get(kind, SCHEMAS["report"]))
+        if report.repaired:
+            logger.info(f"   🔧 已修正 {len(report.repaired)} 处字段格式: {', '.join(report.repaired[:8])}")
+        if report.invalid:
+            logger.warning(f"   ⚠️ {len(report.invalid)} 处字段未通过校验: {', '.join(report.invalid[:8])}")
+        return report
+
+    def _repair_request(
+        self,
+        user_prompt: str,
+        response: Dict[str, Any],
+        validation: ValidationReport
+    ) -> Optional[Tuple[str, List[str], Dict[str, List[int]]]]:
+        """
+        构建按字段补全的请求：原用户提示词 + 需要补全的部分 + 已生成的有效内容
+
+        Args:
+            user_prompt: 原用户提示词
+            response: 校验后的结果
+            validation: 校验结果
+
+        Returns:
+            Tuple: (补全提示词, 整体重新生成的字段, {数组字段: 条目序号})；无需补全时返回 None
+        """
+        if validation.ok or not settings.LLM_SECTION_REPAIR:
+            return None
+        fields, items = invalid_sections(validation.invalid)
+        if not fields and not items:
+            return None
+
+        targets = [f"- `{field}`：整体重新输出" for field in fields]
+        context = {k: v for k, v in response.items() if k not in fields}
+        for name, indices in items.items():
+            for index in indices:
+                item = response[name][index]
+                code = item.get("stock_code") if isinstance(item, dict) else None
+                targets.append(f"- `{name}` 的第 {index + 1} 个条目" + (f"（stock_code: {code}）" if code else ""))
+            context[name] = [item for i, item in enumerate(response[name]) if i not in indices]
+
+        logger.info(f"   🩹 按字段补全: {', '.join(fields + [f'{n}{i}' for n, i in items.items()])}")
+        prompt = user_prompt + self.prompts.render(
+            "repair_note.md",
+            targets="\n".join(targets),
+            context=json.dumps(context, ensure_ascii=False, separators=(",", ":"))
+        )
+        return prompt, fields, items
+
+    def _merge_repair(
+        self,
+        response: Dict[str, Any],
+        patch: Dict[str, Any],
+        fields: List[str],
+        items: Dict[str, List[int]],
+        kind: str,
+        field_callback=None
+    ) -> None:
+        """把补全结果中通过校验的部分合并回 response（数组条目优先按 stock_code 对应）"""
+        schema = SCHEMAS.get(kind, SCHEMAS["report"])
+        merged = []
+
+        for field in fields:
+            spec = field_spec(schema, field)
+            if field in patch and spec is not None and validate({field: patch[field]}, {field: spec}).ok:
+                response[field] = patch[field]
+                merged.append(field)
+                if field_callback:
+                    field_callback(field, response[field], None)
+
+        for name, indices in items.items():
+            spec = field_spec(schema, name)
+            remaining = list(indices)
+            for item in patch.get(name) or []:
+                if not remaining or not isinstance(item, dict) or not validate(item, spec[0]).ok:
+                    continue
+                index = next(
+                    (i for i in remaining if isinstance(response[name][i], dict)
+                     and response[name][i].get("stock_code") == item.get("stock_code")),
+                    remaining[0]
+                )
+                remaining.remove(index)
+                response[name][index] = item
+                merged.append(f"{name}[{index}]")
+                if field_callback:
+                    field_callback(name, item, index)
+            if field_callback and len(remaining) < len(indices):
+                field_callback(name, response[name], None)
+
+        missing = len(fields) + sum(len(v) for v in items.values()) - len(merged)
+        logger.info(f"   ✓ 已补全 {len(merged)} 处" + (f"，仍有 {missing} 处无效" if missing else ""))
+
+    def _cache_key(self, system_prompt: str, user_prompt: str, max_tokens: int = MAX_TOKENS) -> str:
+        """缓存键：模型 + 提示词 + 采样参数（不含 messages/stream 等传输参数）"""
+        params = {
+            k: v for k, v in self._build_payload("", "", max_tokens).items()
+            if k not in ("model", "messages", "stream", "stream_options")
+        }
+        return cache_key(self.model, system_prompt, user_prompt, params)
+
+    def _cache_get(self, key: str, use_cache: bool, field_callback=None) -> Optional[Dict[str, Any]]:
+        """读取响应缓存（缓存故障不影响生成）；命中时按流式解析的顺序回放字段回调"""
+        if self.cache is None or not use_cache:
+            return None
+        try:
+            cached = self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"   ⚠️ 读取 LLM 缓存失败: {e}")
+            return None
+        if cached is not None:
+            logger.info(f"   ⚡ 命中 LLM 响应缓存 ({key[:12]})，跳过生成")
+            self._replay_fields(cached, field_callback)
+        return cached
+
+    @staticmethod
+    def _replay_fields(response: Optional[Dict[str, Any]], field_callback=None) -> None:
+        """按流式解析的顺序回放字段回调（缓存命中、对冲竞速结束时使用）"""
+        if not field_callback or not response:
+            return
+        for field, value in response.items():
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    field_callback(field, item, index)
+            field_callback(field, value, None)
+
+    def _cache_set(
+        self,
+        key: str,
+        response: Optional[Dict[str, Any]],
+        required: tuple = REPORT_FIELDS,
+        model: Optional[str] = None,
+        validation: Optional[ValidationReport] = None
+    ) -> None:
+        """写入响应缓存（只缓存主模型生成、必需字段齐全且通过校验的结果）"""
+        if self.cache is None or not response:
+            return
+        if model and model != self.model:
+            # 缓存键按主模型计算：降级 / 对冲模型的结果不能冒充主模型的输出
+            logger.info(f"   结果由 {model} 生成（主模型 {self.model}），不写入缓存")
+            return
+        missing = [field for field in required if field not in response]
+        if missing:
+            logger.info(f"   结果缺少字段 {missing}，不写入缓存")
+            return
+        if validation is not None and not validation.ok:
+            logger.info(f"   结果仍有 {len(validation.invalid)} 处字段未通过校验，不写入缓存")
+            return
+        try:
+            self.cache.set(key, model or self.model, response)
+        except Exception as e:
+            logger.warning(f"   ⚠️ 写入 LLM 缓存失败: {e}")
+
+    @staticmethod
+    def _check_response(response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """检查并统计分析结果"""
+        if not response:
+            logger.error("✗ LLM 返回空结果")
+            raise LLMResponseParseError("LLM 返回空结果")
+
+        stock_count = len(response.get("stock_analysis", []))
+        action_count = len(response.get("action_plan", []))
+        logger.info(f"✓ LLM 分析完成: {stock_count} 只股票分析, {action_count} 条调仓建议")
+        return response
 
     # --------------------------------------------------------------------- #
     # 提示词：系统角色定义 + JSON 输出结构
     # --------------------------------------------------------------------- #
     def _build_system_prompt(self) -> str:
-        """构建系统提示词（主要约束输出 JSON 结构 + 允许的 HTML，尽量不限制内容发挥）"""
-        return r"""
-# Role
-
-你是一名熟悉 A 股市场的专业投资顾问兼周报写手。  
-你的任务：根据传入的组合数据，输出一个 **严格的 JSON 对象**，用于渲染一个周度持仓报告页面。
-
-你可以自由发挥你的投研能力和表达风格，但**必须**遵守下面的格式约束。
-
---------------------------------
-## 1. 允许使用的 HTML（只在指定字段内）
-
-部分字段是“富文本”，前端会用 `|safe` 渲染，你可以在这些字段中嵌入简单 HTML 来增强表现力，但只允许：
-
-- `<strong>文本</strong>`：用于小标题、关键结论、操作动词等逻辑锚点；
-- `<span class="highlight-phrase">文本</span>`：用于强调组合层面的重要判断；
-- `<span class="text-up">+3.5%</span>` / `<span class="text-down">-4.2%</span>`：用于文字里的涨跌方向；
-- `<p>段落内容</p>`：一个自然段一个 `<p>`；
-- `<ul class="data-list"><li>条目</li></ul>`：当你需要列出关键要点时使用。
-
-**禁止** 使用其它标签（例如 table/div/h1/script/style 等），也不要输出任何 CSS/JS。
-
-允许 HTML 的字段会在下面 JSON 结构说明里明确标出来。
-
---------------------------------
-## 2. 输出 JSON 结构（必须完全匹配）
-
-你必须输出一个 JSON 对象，结构如下（示例值仅用于说明，实际内容请你自己分析生成）：
-
-{
-  "core_viewpoint": "字符串，80-140 字，允许 HTML，用来在开头一段话里点明本周组合的核心矛盾与主线。",
-
-  "kpis": {
-    "weekly_return": 0.0,
-    "benchmark_return": 0.0,
-    "ytd_return": 0.0,
-    "position_ratio": 0.0,
-    "action_count": 0,
-    "ytd_comment": "字符串，简短点评今年以来表现。",
-    "position_comment": "字符串，对当前仓位水平的点评。",
-    "action_summary": "字符串，对本周调仓重点的摘要。"
-  },
-
-  "section_subtitles": {
-    "overview": "字符串，概括“本周组合总览”的一句话小标题。",
-    "holdings": "字符串，概括“持仓盈亏分析”想表达的重点。",
-    "stock": "字符串，概括“个股与 ETF 分析”的角度，例如更偏技术/题材/轮动。",
-    "action": "字符串，概括“本周操作计划”的风格（如偏防御、偏优化结构等）。",
-    "risk": "字符串，概括风险与优化部分的主基调。",
-    "sector": "字符串，概括板块和题材视角的核心观点。"
-  },
-
-  "holdings_analysis": {
-    "summary": "字符串，100-200 字，对持仓盈亏结构的整体点评，允许 HTML。",
-    "highlights": [
-      "字符串，要点 1，允许 HTML。",
-      "字符串，要点 2，允许 HTML。",
-      "字符串，要点 3，允许 HTML。"
-    ]
-  },
-
-  "stock_analysis": [
-    {
-      "stock_code": "600519.SH",
-      "stock_name": "贵州茅台",
-      "stock_role": "核心持仓/卫星持仓/配置类/观察仓 等自由描述",
-      "status": "超卖反弹/横盘震荡/趋势破位/多头趋势/回调预警 等你认为合适的标签",
-      "status_class": "positive/negative/warning/neutral",
-      "sentiment_class": "bull/bear/neutral",
-
-      "technical": "技术面分析，50-120 字，允许 HTML（例如以 <strong>技术面：</strong> 开头）。",
-      "fundamental": "基本面分析，50-120 字，允许 HTML。",
-      "theme": "题材与风格逻辑，50-120 字，允许 HTML，注意符合 A 股话语（主线/轮动/资金风格等）。",
-      "risk": "风险点，30-80 字，允许 HTML。",
-      "suggestion": "操作建议，50-120 字，允许 HTML，包含执行思路（如区间、分批）、仓位思路等。"
-    }
-  ],
-
-  "action_plan": [
-    {
-      "stock_code": "600519.SH",
-      "stock_name": "贵州茅台",
-      "action": "逢高减仓/反弹减仓/逐步清仓/继续持有/逢低加仓 等简洁动词短语",
-      "action_class": "reduce/clear/add/hold",
-      "price_range": "例如 \"1460–1480 元\" 或 \"+1% 涨幅内择机\"",
-      "current_position_pct": 45.0,
-      "target_position_pct": 40.0,
-      "plan": "执行计划说明，例如 “触及区间上沿分两次各减 2.5%”。",
-      "reason": "一句话逻辑摘要，说明为什么这样操作。"
-    }
-  ],
-
-  "risk_assessment": {
-    "level": "偏低/中等/中等偏高/偏高 等自然中文描述",
-    "level_score": 65,
-    "current_risks": [
-      "当前风险点 1，允许 HTML。",
-      "当前风险点 2，允许 HTML。",
-      "当前风险点 3，允许 HTML。"
-    ],
-    "optimization_suggestions": [
-      "优化建议 1，允许 HTML。",
-      "优化建议 2，允许 HTML。",
-      "优化建议 3，允许 HTML。"
-    ]
-  },
-
-  "sector_view": {
-    "summary": "板块 & 题材综合视角的完整段落，允许 HTML。",
-    "main_theme": "一句话说明你眼中当前市场资金主线（例如 “科技成长（算力/半导体）、高股息红利”）。",
-    "consumer_position": "一句话说明消费板块在当前结构中的位置。",
-    "portfolio_position": "一句话说明当前组合在风格/节奏中的位置。",
-    "adjustment_direction": "一句话说明未来一两周调仓方向。"
-  },
-
-  "target_allocation": {
-    "consumer": {
-      "percent": 55,
-      "label": "消费相关（你可以自由命名，例如“消费修复”）"
-    },
-    "tech_growth": {
-      "percent": 20,
-      "label": "科技成长（例如“科技成长/算力相关”）"
-    },
-    "dividend": {
-      "percent": 15,
-      "label": "高股息/价值（例如“高股息稳健资产”）"
-    },
-    "cash": {
-      "percent": 10,
-      "label": "现金/货基（例如“现金缓冲”）"
-    }
-  }
-}
-
---------------------------------
-## 3. 类型 & 约束汇总（非常重要）
-
-1. **必须输出严格 JSON**：
-   - 最外层是一个 `{}` 对象；
-   - 不允许出现任何解释文字、注释、额外字段。
-
-2. 数值字段必须是裸数字：
-   - `weekly_return`, `benchmark_return`, `ytd_return`, `position_ratio`, `action_count`,
-     `current_position_pct`, `target_position_pct`, `level_score`,
-     以及 `target_allocation` 中的 `percent`；
-   - 不要在数值字段里加 `%` 或任何单位，也不要嵌入 HTML。
-
-3. 只有这些字段可以包含 HTML：
-   - `core_viewpoint`
-   - `holdings_analysis.summary`
-   - `holdings_analysis.highlights[*]`
-   - `stock_analysis[*].technical`
-   - `stock_analysis[*].fundamental`
-   - `stock_analysis[*].theme`
-   - `stock_analysis[*].risk`
-   - `stock_analysis[*].suggestion`
-   - `risk_assessment.current_risks[*]`
-   - `risk_assessment.optimization_suggestions[*]`
-   - `sector_view.summary`
-
-4. 枚举值约束：
-   - `status_class` ∈ {`positive`, `negative`, `warning`, `neutral`};
-   - `sentiment_class` ∈ {`bull`, `bear`, `neutral`};
-   - `action_class` ∈ {`reduce`, `clear`, `add`, `hold`}。
-
-5. 内容风格：
-   - 你可以自由使用 A 股常见表达（主线、情绪、轮动、超跌反弹等）；
-   - 表达可以有自己的风格，但尽量**简洁、信息密度高**，避免空洞语句。
-
-请根据我稍后提供的组合数据，直接输出一个满足上述结构与约束的 JSON 对象。
-"""
+        """
+        构建系统提示词（主要约束输出 JSON 结构 + 允许的 HTML，尽量不限制内容发挥）
+
+        模板见 prompts/<版本>/report_system.md，进程内只渲染一次，保证前缀逐字节一致。
+        """
+        return self.prompts.static("report_system.md")
 
-    def _build_user_prompt(self, report_data: Dict[str, Any]) -> str:
-        """构建用户提示词：把组合/持仓/行情数据打包给模型，尽量少干预内容，仅描述上下文"""
+    def _build_user_prompt(self, report_data: Dict[str, Any], extra_sections: str = "") -> str:
+        """
+        构建用户提示词：把组合/持仓/行情数据打包给模型，尽量少干预内容，仅描述上下文
 
-        portfolio = report_data.get("portfolio", {})
-        metrics = report_data.get("metrics", {})
+        估算 token 超过 LLM_PROMPT_MAX_TOKENS 时逐步降级：先精简持仓表的技术指标，
+        再依次省略相关性、参考配置、业绩归因、风险指标片段，最后只保留仓位最大的若干只持仓。
+        """
         holdings = report_data.get("holdings", [])
-        period = report_data.get("period", "")
-        benchmark_name = report_data.get("benchmark_name", "沪深300")
-        benchmark_return = report_data.get("benchmark_return", 0.0)
-
-        holdings_summary = []
-        for h in holdings:
-            indicators = h.get("indicators", {})
-            holdings_summary.append(
-                {
-                    "股票代码": h.get("stock_code"),
-                    "股票名称": h.get("stock_name"),
-                    "当前价格": f"{h.get('current_price', 0.0):.2f}",
-                    "成本价": f"{h.get('cost_price', 0.0):.2f}",
-                    "持仓数量": h.get("quantity", 0),
-                    "市值": f"{h.get('market_value', 0.0):.2f}",
-                    "盈亏": f"{h.get('profit_loss', 0.0):+,.2f}",
-                    "盈亏比例": f"{h.get('profit_loss_pct', 0.0):+.2f}%",
-                    "仓位占比": f"{h.get('position_ratio', 0.0):.1f}%",
-                    "技术指标": indicators
-                }
+        budget = settings.LLM_PROMPT_MAX_TOKENS
+        optional = {
+            "attribution": self._format_attribution(report_data.get("attribution") or {}),
+            "risk": self._format_risk_metrics(report_data.get("risk_metrics") or {}),
+            "correlation": self._format_correlation(report_data.get("correlation") or {}),
+            "optimization": self._format_optimization(report_data.get("optimization") or {}),
+        }
+
+        candidates = [(detail, ()) for detail in (FULL_DETAIL, CORE_DETAIL, NO_INDICATORS)]
+        dropped = ()
+        for name in OPTIONAL_SECTION_DROP_ORDER:
+            dropped += (name,)
+            candidates.append((NO_INDICATORS, dropped))
+        candidates += [(detail, dropped) for detail in range(NO_INDICATORS + 1, max_detail(len(holdings)) + 1)]
+
+        prompt = ""
+        for detail, dropped in candidates:
+            sections = "".join(text for name, text in optional.items() if name not in dropped)
+            prompt = self._render_user_prompt(report_data, encode_holdings(holdings, detail), sections + extra_sections)
+            tokens = estimate_tokens(prompt)
+            if tokens <= budget:
+                if detail or dropped:
+                    logger.info(f"   提示词已按预算降级（detail={detail}，省略 {list(dropped)}），约 {tokens} tokens")
+                return prompt
+
+        logger.warning(f"   ⚠️ 提示词降级后仍约 {estimate_tokens(prompt)} tokens，超出预算 {budget}")
+        return prompt
+
+    def _render_user_prompt(self, report_data: Dict[str, Any], holdings_table: str, sections: str) -> str:
+        """按给定的持仓表与附加片段渲染用户提示词（模板见 prompts/<版本>/report_user.md）"""
+        metrics = report_data.get("metrics", {})
+        return self.prompts.render(
+            "report_user.md",
+            period=report_data.get("period", ""),
+            portfolio=report_data.get("portfolio", {}),
+            metrics=metrics,
+            total_assets=metrics.get("total_market_value", 0.0) + metrics.get("cash", 0.0),
+            benchmark_name=report_data.get("benchmark_name", "沪深300"),
+            benchmark_return=report_data.get("benchmark_return", 0.0),
+            holding_count=len(report_data.get("holdings", [])),
+            holdings_table=holdings_table,
+            sections=sections,
+        )
+
+    def _build_stock_system_prompt(self) -> str:
+        """构建个股分析的系统提示词（个股并行模式：一次只输出一个 stock_analysis 条目）"""
+        return self.prompts.static("stock_system.md")
+
+    def _build_stock_prompt(self, report_data: Dict[str, Any], holding: Dict[str, Any]) -> str:
+        """构建单只持仓的用户提示词：该股数据 + 必要的组合背景（模板见 prompts/<版本>/stock_user.md）"""
+        code = holding.get("stock_code")
+        week = (report_data.get("attribution") or {}).get("week") or {}
+        return self.prompts.render(
+            "stock_user.md",
+            period=report_data.get("period", ""),
+            metrics=report_data.get("metrics", {}),
+            benchmark_name=report_data.get("benchmark_name", "沪深300"),
+            benchmark_return=report_data.get("benchmark_return", 0.0),
+            contribution=next((h for h in week.get("holdings", []) if h.get("stock_code") == code), None),
+            anchor=next(
+                (h for h in (report_data.get("optimization") or {}).get("holdings", []) if h.get("stock_code") == code),
+                None
+            ),
+            holdings_table=encode_holdings([holding]),
+        )
+
+    @staticmethod
+    def _format_stock_conclusions(stock_items: List[Dict[str, Any]]) -> str:
+        """把个股并行生成的结果压缩为组合层面请求的提示词片段"""
+        lines = []
+        for item in stock_items:
+            suggestion = re.sub(r"<[^>]+>", "", item.get("suggestion") or "").strip()
+            lines.append(
+                f"- {item.get('stock_name')}（{item.get('stock_code')}）：{item.get('status', '')}"
+                f"，{item.get('sentiment_class', 'neutral')}；建议：{suggestion[:100]}"
             )
+        return f"""
+【个股分析结论】（已单独生成，action_plan 与各项判断请与之保持一致）
+{chr(10).join(lines)}
+"""
 
-        total_assets = metrics.get("total_market_value", 0.0) + metrics.get("cash", 0.0)
+    @staticmethod
+    def _placeholder_stock_item(holding: Dict[str, Any]) -> Dict[str, Any]:
+        """个股分析失败时的占位条目（保证模板可渲染）"""
+        return {
+            "stock_code": holding.get("stock_code"),
+            "stock_name": holding.get("stock_name"),
+            "stock_role": "",
+            "status": "暂无分析",
+            "status_class": "neutral",
+            "sentiment_class": "neutral",
+            "technical": "",
+            "fundamental": "",
+            "theme": "",
+            "risk": "",
+            "suggestion": "本条目生成失败，请参考持仓数据或重新生成。",
+        }
 
-        prompt = f"""
-下面是一个股票组合在本统计周期内的数据快照，请你基于这些数据，输出一个符合系统提示中 JSON 结构的分析结果。
+    @staticmethod
+    def _format_risk_metrics(risk: Dict[str, Any]) -> str:
+        """把量化风险指标格式化为提示词片段（无数据时返回空字符串）"""
+        if not risk:
+            return ""
+
+        beta = risk.get("beta")
+        beta_text = f"{beta:.2f}" if beta is not None else "N/A"
+        confidence = risk.get("confidence", 0.95)
+        top_contributors = "、".join(
+            f"{c['stock_code']} {c['risk_contribution_pct']:.1f}%"
+            for c in risk.get("risk_contributions", [])[:3]
+        )
+
+        return f"""
+【量化风险指标】（基于近 {risk.get('observations', 0)} 个交易日收益率，收缩协方差估计）
+- 年化波动率：{risk.get('annual_volatility_pct', 0.0):.2f}%
+- 单日 VaR（{confidence:.0%}，参数法 / 历史法）：{risk.get('parametric_var_pct', 0.0):.2f}% / {risk.get('historical_var_pct', 0.0):.2f}%
+- 单日 CVaR（{confidence:.0%}，参数法 / 历史法）：{risk.get('parametric_cvar_pct', 0.0):.2f}% / {risk.get('historical_cvar_pct', 0.0):.2f}%
+- 区间最大回撤：{risk.get('max_drawdown_pct', 0.0):.2f}%
+- 相对基准 Beta：{beta_text}
+- 集中度：HHI {risk.get('hhi', 0.0):.3f}，有效持仓数 {risk.get('effective_n', 0.0):.1f}，第一大持仓占持仓市值 {risk.get('top1_pct', 0.0):.1f}%，前三大 {risk.get('top3_pct', 0.0):.1f}%
+- 风险贡献前三：{top_contributors or 'N/A'}
+- 量化风险评分：{risk.get('risk_score', 0)}（{risk.get('risk_level', '')}）
+
+`risk_assessment.level_score` 请以上述量化风险评分为基准，仅在有充分理由时小幅调整。
+"""
 
-【统计周期】
-{period}
 
-【组合信息】
-- 组合名称：{portfolio.get('name', '未命名组合')}
-- 总资产：¥{total_assets:,.2f}
-- 持仓市值：¥{metrics.get('total_market_value', 0.0):,.2f}
-- 现金：¥{metrics.get('cash', 0.0):,.2f}
-- 当前整体仓位：{metrics.get('position_ratio', 0.0):.1f}%
+    @staticmethod
+    def _format_correlation(correlation: Dict[str, Any]) -> str:
+        """把相关性聚类结果格式化为提示词片段（无数据时返回空字符串）"""
+        if not correlation:
+            return ""
+
+        groups = [c for c in correlation.get("clusters", []) if len(c.get("stock_codes", [])) > 1]
+        group_lines = "\n".join(
+            f"- {'、'.join(c['stock_names'])}：平均相关系数 {c['avg_correlation']:.2f}，合计仓位 {c['weight_pct']:.1f}%"
+            for c in groups
+        ) or "- 无（各持仓之间相关性较低）"
+        pair_lines = "、".join(
+            f"{p['names'][0]}/{p['names'][1]} {p['correlation']:.2f}"
+            for p in correlation.get("high_correlation_pairs", [])[:5]
+        ) or "无"
+
+        return f"""
+【持仓相关性聚类】（相关系数 ≥ {correlation.get('cluster_threshold', 0.6):.1f} 的持仓归为一组，可视为同一风险敞口）
+- 平均两两相关系数：{correlation.get('average_correlation', 0.0):.2f}，独立风险簇数量：{correlation.get('effective_clusters', 0)}
+{group_lines}
+- 高相关持仓对：{pair_lines}
+"""
 
-【整体盈亏》
-- 总盈亏：¥{metrics.get('total_profit_loss', 0.0):+,.2f}
-- 总体收益率：{metrics.get('total_return_pct', 0.0):+.2f}%
-- 本周组合收益率：{metrics.get('weekly_return', 0.0):+.2f}%
-- 基准（{benchmark_name}）本周收益率：{benchmark_return:+.2f}%
+    @staticmethod
+    def _format_attribution(attribution: Dict[str, Any]) -> str:
+        """把业绩归因结果格式化为提示词片段（无数据时返回空字符串）"""
+        if not attribution:
+            return ""
+
+        labels = {"week": "本周", "ytd": "年初至今"}
+        blocks = []
+        for key, label in labels.items():
+            period = attribution.get(key)
+            if not period:
+                continue
+            contributors = "、".join(
+                f"{h['stock_name']} {h['contribution_pct']:+.2f}%"
+                for h in period.get("holdings", [])[:3]
+                if h["contribution_pct"] > 0
+            ) or "无"
+            detractors = "、".join(
+                f"{h['stock_name']} {h['contribution_pct']:+.2f}%"
+                for h in reversed(period.get("holdings", [])[-3:])
+                if h["contribution_pct"] < 0
+            ) or "无"
+            sectors = "、".join(
+                f"{r['sector']}（配置 {r['allocation_pct']:+.2f}% / 选股 {r['selection_pct']:+.2f}%）"
+                for r in period.get("sectors", [])[:4]
+            ) or "无"
+            since = "（行情数据起始日，不足完整区间）" if period.get("truncated") else ""
+            blocks.append(
+                f"- {label}（{period['start']}{since} ~ {period['end']}）："
+                f"组合 {period['portfolio_return_pct']:+.2f}%，基准 {period['benchmark_return_pct']:+.2f}%，"
+                f"超额 {period['excess_return_pct']:+.2f}% = 配置 {period['allocation_pct']:+.2f}% + 选股 {period['selection_pct']:+.2f}%\n"
+                f"  主要贡献：{contributors}；主要拖累：{detractors}\n"
+                f"  行业归因：{sectors}"
+            )
 
-【持仓明细列表】（共 {len(holdings)} 只）
-以下为每只持仓的简要数据与技术指标（JSON 数组）：
-{json.dumps(holdings_summary, ensure_ascii=False, indent=2)}
+        return f"""
+【业绩归因】（按当前持仓买入持有计算，个股贡献 = 区间初始权重 × 区间涨跌幅；行业为 Brinson 配置 / 选股效应）
+{chr(10).join(blocks)}
 
-请基于这些数据进行你自己的专业分析和判断，自由发挥内容，
-但最终输出必须是一个**严格符合系统提示中定义结构的 JSON 对象**。不要输出任何多余说明文字。
+`kpis.weekly_return`、`kpis.benchmark_return`、`kpis.ytd_return` 请直接使用上述本周组合、本周基准和年初至今组合收益；
+`holdings_analysis.summary` 请基于上述归因解读收益来源，不要自行推算。
 """
 
-        return prompt
-
+    @staticmethod
+    def _format_optimization(optimization: Dict[str, Any]) -> str:
+        """把量化参考配置格式化为提示词片段（无数据时返回空字符串）"""
+        if not optimization:
+            return ""
+
+        methods = optimization.get("methods", {})
+        method_lines = "\n".join(
+            f"- {m['label']}：预期年化收益 {m['expected_return_pct']:.1f}%，年化波动 {m['volatility_pct']:.1f}%"
+            for m in methods.values()
+        )
+        current = optimization.get("current", {})
+        holding_lines = "\n".join(
+            f"- {h['stock_name']}（{h['stock_code']}）：当前 {h['current_pct']:.1f}% → "
+            f"均值-方差 {h['mean_variance_pct']:.1f}% / 最小方差 {h['min_variance_pct']:.1f}% / 风险平价 {h['risk_parity_pct']:.1f}%"
+            for h in optimization.get("holdings", [])
+        )
+
+        return f"""
+【量化参考配置】（总仓位保持 {optimization.get('budget_pct', 0.0):.1f}%，单股上限 {optimization.get('max_weight_pct', 0.0):.0f}%）
+- 当前配置：预期年化收益 {current.get('expected_return_pct', 0.0):.1f}%，年化波动 {current.get('volatility_pct', 0.0):.1f}%
+{method_lines}
+{holding_lines}
+
+`action_plan[*].target_position_pct` 请以均值-方差配置为量化锚点，结合基本面与技术面判断调整；
+与锚点偏离超过 5 个百分点时，请在 `reason` 中说明理由。
+"""
 
     # --------------------------------------------------------------------- #
     # 调用 API（流式输出 + JSON 提取）
     # --------------------------------------------------------------------- #
+    def _build_headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _build_payload(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = MAX_TOKENS,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """请求体（OpenAI 兼容的流式 chat completions）"""
+        return {
+            "model": model or self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "max_tokens": max_tokens,
+            "temperature": 0.6,
+            "top_p": 0.9,
+            "top_k": 40,
+            "frequency_penalty": 0.1,
+            "response_format": {"type": "json_object"},
+        }
+
     def _call_api(
         self,
         system_prompt: str,
         user_prompt: str,
         max_retries: int = 3,
-        stream_callback=None
+        stream_callback=None,
+        field_callback=None,
+        max_tokens: int = MAX_TOKENS,
+        metrics: Optional[LLMCallMetrics] = None,
+        model: Optional[str] = None,
+        deadline: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
-        调用 Gemini API（流式输出，带重试机制）
+        调用 Gemini API（同步版本，供命令行脚本使用；流式输出，带重试机制）
 
         Args:
             system_prompt: 系统提示词
             user_prompt: 用户提示词
             max_retries: 最大重试次数
             stream_callback: 流式输出回调函数
+            field_callback: 字段完成回调函数
+            max_tokens: 最大输出 token 数
+            metrics: 调用指标（记录 token 用量、首 token 延迟、耗时与重试次数）
+            model: 模型名称（默认主模型）
+            deadline: 截止时间（秒，含重试），超过后不再等待该模型
 
         Returns:
             解析后的 JSON 响应（字典）
         """
+        model = model or self.model
+        headers = self._build_headers()
+        payload = self._build_payload(system_prompt, user_prompt, max_tokens, model)
+        metrics = metrics or LLMCallMetrics(model)
+        deadline_at = time.perf_counter() + deadline if deadline else None
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "stream": True,
-            "max_tokens": 50000,
-            "temperature": 0.6,
-            "top_p": 0.9,
-            "top_k": 40,
-            "frequency_penalty": 0.1,
-            "response_format": {"type": "json_object"},
-        }
+        def check_deadline(extra: float = 0.0):
+            if deadline_at is not None and time.perf_counter() + extra > deadline_at:
+                raise LLMAPIError(f"超过截止时间 {deadline:.0f} 秒", retry_count=metrics.retries)
 
         for attempt in range(max_retries):
             try:
                 if attempt > 0:
                     wait_time = 2 ** attempt
+                    check_deadline(wait_time)
                     logger.warning(f"⏳ 第 {attempt} 次重试，等待 {wait_time} 秒...")
                     time.sleep(wait_time)
 
-                logger.info(f"   📡 调用 LLM API... (尝试 {attempt + 1}/{max_retries})")
+                logger.info(f"   📡 调用 LLM API: {model} (尝试 {attempt + 1}/{max_retries})")
+                metrics.start_attempt(attempt)
 
+                timeout = settings.LLM_TIMEOUT
+                if deadline_at is not None:
+                    timeout = max(1.0, min(timeout, deadline_at - time.perf_counter()))
                 response = requests.post(
                     self.api_url,
                     headers=headers,
                     json=payload,
                     stream=True,
-                    timeout=300,
+                    timeout=timeout,
                 )
                 response.raise_for_status()
 
-                full_content = ""
+                buffer = StreamBuffer()
+                parser = self._make_stream_parser(field_callback)
+                usage = None
                 last_log_length = 0
 
                 for line in response.iter_lines():
                     if not line:
                         continue
 
-                    line = line.decode("utf-8")
+                    event = parse_sse_event(line)
+                    if event is None:
+                        logger.info("✓ 流式输出完成")
+                        break
 
-                    if not line.startswith("data: "):
-                        continue
+                    content_chunk, usage = event[0], event[1] or usage
+                    if content_chunk:
+                        if not buffer:
+                            metrics.first_token()
+                        buffer.append(content_chunk)
+                        parser.feed(content_chunk)
 
-                    data_str = line[6:]
+                        if stream_callback:
+                            stream_callback(content_chunk, len(buffer))
 
-                    if data_str.strip() == "[DONE]":
-                        logger.info("✓ 流式输出完成")
-                        break
+                        if len(buffer) - last_log_length >= 500:
+                            logger.debug(f"   📝 已生成约 {len(buffer)} 字...")
+                            last_log_length = len(buffer)
+                            check_deadline()
 
-                    try:
-                        data = json.loads(data_str)
-                        delta = data.get("choices", [{}])[0].get("delta", {})
-                        content_chunk = delta.get("content", "")
+                full_content = buffer.getvalue()
+                metrics.finish(usage, system_prompt + user_prompt, full_content)
+                return self._parse_content(full_content, parser)
 
-                        if content_chunk:
-                            full_content += content_chunk
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status in [429, 500, 502, 503, 504]:
+                    logger.warning(f"   ⚠️ API HTTP 错误 {status}，将重试...")
+                    if attempt == max_retries - 1:
+                        logger.error("   ❌ 已达到最大重试次数")
+                        raise LLMAPIError(f"HTTP 错误 {status}", status_code=status, retry_count=max_retries)
+                    continue
+                else:
+                    logger.error(f"   ✗ API HTTP 错误: {e}")
+                    raise LLMAPIError(str(e), status_code=status)
+            except requests.exceptions.Timeout:
+                logger.warning(f"   ⚠️ API 请求超时，将重试...")
+                if attempt == max_retries - 1:
+                    raise LLMAPIError("请求超时", retry_count=max_retries)
+                continue
+            except requests.exceptions.RequestException as e:
+                logger.error(f"   ✗ API 请求异常: {e}")
+                if attempt == max_retries - 1:
+                    raise LLMAPIError(str(e), retry_count=max_retries)
+                continue
+            except (LLMAPIError, LLMResponseParseError):
+                raise
+            except Exception as e:
+                logger.error(f"   ✗ 未知错误: {e}", exc_info=True)
+                raise LLMAPIError(str(e))
 
-                            if stream_callback:
-                                stream_callback(content_chunk, len(full_content))
+        logger.error("   ❌ 所有重试尝试均失败")
+        raise LLMAPIError("所有重试尝试均失败", retry_count=max_retries)
 
-                            if len(full_content) - last_log_length >= 500:
-                                logger.debug(f"   📝 已生成约 {len(full_content)} 字...")
-                                last_log_length = len(full_content)
+    async def _call_api_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int = 3,
+        stream_callback=None,
+        field_callback=None,
+        max_tokens: int = MAX_TOKENS,
+        metrics: Optional[LLMCallMetrics] = None,
+        model: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        调用 Gemini API（异步版本：共享连接池 + 流式 SSE，不阻塞事件循环，带重试机制）
 
-                    except json.JSONDecodeError:
-                        continue
+        截止时间由 ModelPolicy 在外层用 asyncio.wait_for 控制（超时即取消本协程）。
 
-                logger.info(f"   ✓ LLM 输出完成，总长度 {len(full_content)} 字")
-
-                if not full_content:
-                    logger.error("   ✗ API 返回内容为空")
-                    raise LLMResponseParseError("API 返回内容为空")
-
-                original_content = full_content
-
-                # 1. 过滤 <think> 思考内容
-                if "<think>" in full_content:
-                    think_end = full_content.find("</think>")
-                    if think_end != -1:
-                        full_content = full_content[think_end + len("</think>") :].strip()
-                        logger.debug(f"   已剥离思考内容，剩余 {len(full_content)} 字")
-
-                # 2. 若包在 ```json 代码块中，先截取
-                if "```json" in full_content:
-                    start = full_content.find("```json") + len("```json")
-                    end = full_content.find("```", start)
-                    if end != -1:
-                        full_content = full_content[start:end].strip()
-                        logger.debug("   从 ```json 代码块中提取内容")
-                elif "```" in full_content:
-                    start = full_content.find("```") + len("```")
-                    end = full_content.find("```", start)
-                    if end != -1:
-                        full_content = full_content[start:end].strip()
-                        logger.debug("   从 ``` 代码块中提取内容")
-
-                # 3. 如果前面有多余文字，尝试找到第一个 JSON 起始位置
-                if "{" in full_content and not full_content.lstrip().startswith("{"):
-                    json_start = full_content.find("{")
-                    full_content = full_content[json_start:]
-                    logger.debug("   已截断到第一个 '{{' 开始的位置")
-
-                # 4. 先尝试直接解析
-                try:
-                    parsed = json.loads(full_content)
-                    logger.debug("   ✓ JSON 解析成功")
-                    return parsed
-                except json.JSONDecodeError:
-                    logger.warning("   ⚠️ 直接解析失败，尝试用正则提取...")
-
-                    json_pattern = r"\{(?:[^{}]|(?:\{[^{}]*\}))*\}"
-                    matches = re.findall(json_pattern, full_content, re.DOTALL)
-
-                    for i, match in enumerate(matches):
-                        try:
-                            parsed = json.loads(match)
-                            if isinstance(parsed, dict) and (
-                                "core_viewpoint" in parsed or "stock_analysis" in parsed
-                            ):
-                                logger.debug(f"   ✓ 第 {i+1}/{len(matches)} 个匹配解析成功")
-                                return parsed
-                        except json.JSONDecodeError:
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            max_retries: 最大重试次数
+            stream_callback: 流式输出回调函数
+            field_callback: 字段完成回调函数
+            max_tokens: 最大输出 token 数
+            metrics: 调用指标（记录 token 用量、首 token 延迟、耗时与重试次数）
+            model: 模型名称（默认主模型）
+
+        Returns:
+            解析后的 JSON 响应（字典）
+        """
+        model = model or self.model
+        headers = self._build_headers()
+        payload = self._build_payload(system_prompt, user_prompt, max_tokens, model)
+        metrics = metrics or LLMCallMetrics(model)
+        client = get_async_client()
+
+        for attempt in range(max_retries):
+            try:
+                if attempt > 0:
+                    wait_time = 2 ** attempt
+                    logger.warning(f"⏳ 第 {attempt} 次重试，等待 {wait_time} 秒...")
+                    await asyncio.sleep(wait_time)
+
+                logger.info(f"   📡 调用 LLM API: {model} (尝试 {attempt + 1}/{max_retries})")
+                metrics.start_attempt(attempt)
+
+                buffer = StreamBuffer()
+                parser = self._make_stream_parser(field_callback)
+                usage = None
+                last_log_length = 0
+
+                async with client.stream("POST", self.api_url, headers=headers, json=payload) as response:
+                    response.raise_for_status()
+                    logger.debug(f"   连接协议: {response.http_version}")
+
+                    async for line in response.aiter_lines():
+                        if not line:
                             continue
 
-                    logger.error("   ✗ 无法从返回内容中解析出合法 JSON")
-                    logger.debug(f"   处理后内容前 500 字：{full_content[:500]}...")
+                        event = parse_sse_event(line)
+                        if event is None:
+                            logger.info("✓ 流式输出完成")
+                            break
 
-                    # 保存错误输出用于调试
-                    try:
-                        with open("output/llm_error_output.txt", "w", encoding="utf-8") as f:
-                            f.write(original_content)
-                        logger.warning("   原始内容已保存到 output/llm_error_output.txt")
-                    except Exception:
-                        pass
+                        content_chunk, usage = event[0], event[1] or usage
+                        if content_chunk:
+                            if not buffer:
+                                metrics.first_token()
+                            buffer.append(content_chunk)
+                            parser.feed(content_chunk)
 
-                    raise LLMResponseParseError("无法解析 LLM 响应为有效 JSON")
+                            if stream_callback:
+                                stream_callback(content_chunk, len(buffer))
 
-            except requests.exceptions.HTTPError as e:
-                status = e.response.status_code if e.response is not None else None
+                            if len(buffer) - last_log_length >= 500:
+                                logger.debug(f"   📝 已生成约 {len(buffer)} 字...")
+                                last_log_length = len(buffer)
+
+                full_content = buffer.getvalue()
+                metrics.finish(usage, system_prompt + user_prompt, full_content)
+                return self._parse_content(full_content, parser)
+
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
                 if status in [429, 500, 502, 503, 504]:
                     logger.warning(f"   ⚠️ API HTTP 错误 {status}，将重试...")
                     if attempt == max_retries - 1:
@@ -495,17 +1119,17 @@ class LLMService:
                 else:
                     logger.error(f"   ✗ API HTTP 错误: {e}")
                     raise LLMAPIError(str(e), status_code=status)
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.warning(f"   ⚠️ API 请求超时，将重试...")
                 if attempt == max_retries - 1:
                     raise LLMAPIError("请求超时", retry_count=max_retries)
                 continue
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.error(f"   ✗ API 请求异常: {e}")
                 if attempt == max_retries - 1:
                     raise LLMAPIError(str(e), retry_count=max_retries)
                 continue
-            except LLMResponseParseError:
+            except (LLMAPIError, LLMResponseParseError):
                 raise
             except Exception as e:
                 logger.error(f"   ✗ 未知错误: {e}", exc_info=True)
@@ -513,3 +1137,126 @@ class LLMService:
 
         logger.error("   ❌ 所有重试尝试均失败")
         raise LLMAPIError("所有重试尝试均失败", retry_count=max_retries)
+
+    @staticmethod
+    def _make_stream_parser(field_callback=None) -> IncrementalJSONParser:
+        """
+        创建随流解析的增量 JSON 解析器：字段一闭合即记录日志并回调，
+        单个字段损坏时立即告警，而不必等到整段输出结束
+
+        Args:
+            field_callback: 字段完成回调 field_callback(key, value, index)
+
+        Returns:
+            IncrementalJSONParser: 解析器
+        """
+        def on_field(key, value):
+            logger.debug(f"   ✓ 字段完成: {key}")
+            if field_callback:
+                field_callback(key, value, None)
+
+        def on_item(key, index, item):
+            if field_callback:
+                field_callback(key, item, index)
+
+        def on_error(error):
+            logger.warning(f"   ⚠️ 字段解析失败（已跳过）: {error}")
+
+        return IncrementalJSONParser(on_field=on_field, on_item=on_item, on_error=on_error)
+
+    def _parse_content(
+        self,
+        full_content: str,
+        parser: Optional[IncrementalJSONParser] = None
+    ) -> Dict[str, Any]:
+        """
+        从模型完整输出中提取 JSON 对象
+
+        整体解析失败时先做文本修复（尾逗号、截断的数组/对象），仍失败再使用增量解析器已完成的字段，
+        避免因为个别字段损坏而整份重新生成。
+
+        Args:
+            full_content: 流式拼接后的完整输出
+            parser: 随流喂入的增量解析器（不提供时在此重新解析一遍）
+
+        Returns:
+            解析后的 JSON 响应（字典）
+
+        Raises:
+            LLMResponseParseError: 内容为空或无法解析
+        """
+        logger.info(f"   ✓ LLM 输出完成，总长度 {len(full_content)} 字")
+
+        if not full_content:
+            logger.error("   ✗ API 返回内容为空")
+            raise LLMResponseParseError("API 返回内容为空")
+
+        original_content = full_content
+
+        # 1. 过滤 <think> 思考内容
+        if "<think>" in full_content:
+            think_end = full_content.find("</think>")
+            if think_end != -1:
+                full_content = full_content[think_end + len("</think>") :].strip()
+                logger.debug(f"   已剥离思考内容，剩余 {len(full_content)} 字")
+
+        # 2. 若包在 ```json 代码块中，先截取
+        if "```json" in full_content:
+            start = full_content.find("```json") + len("```json")
+            end = full_content.find("```", start)
+            if end != -1:
+                full_content = full_content[start:end].strip()
+                logger.debug("   从 ```json 代码块中提取内容")
+        elif "```" in full_content:
+            start = full_content.find("```") + len("```")
+            end = full_content.find("```", start)
+            if end != -1:
+                full_content = full_content[start:end].strip()
+                logger.debug("   从 ``` 代码块中提取内容")
+
+        # 3. 如果前面有多余文字，尝试找到第一个 JSON 起始位置
+        if "{" in full_content and not full_content.lstrip().startswith("{"):
+            json_start = full_content.find("{")
+            full_content = full_content[json_start:]
+            logger.debug("   已截断到第一个 '{{' 开始的位置")
+
+        # 4. 先尝试直接解析
+        try:
+            parsed = json.loads(full_content)
+            logger.debug("   ✓ JSON 解析成功")
+            return parsed
+        except json.JSONDecodeError:
+            repaired = repair_json(full_content)
+            if repaired is not None:
+                try:
+                    parsed = json.loads(repaired)
+                    logger.warning("   🔧 直接解析失败，已修复 JSON 格式（尾逗号 / 截断）")
+                    return parsed
+                except json.JSONDecodeError:
+                    pass
+            logger.warning("   ⚠️ 直接解析失败，使用增量解析结果...")
+
+            if parser is None:
+                parser = IncrementalJSONParser()
+                parser.feed(full_content)
+
+            recovered = parser.result
+            if "core_viewpoint" in recovered or "stock_analysis" in recovered:
+                logger.warning(
+                    f"   ⚠️ 已恢复 {len(recovered)} 个完整字段"
+                    f"（根对象{'已' if parser.complete else '未'}闭合，跳过 {len(parser.errors)} 处损坏）"
+                )
+                return recovered
+
+            logger.error("   ✗ 无法从返回内容中解析出合法 JSON")
+            logger.debug(f"   处理后内容前 500 字：{full_content[:500]}...")
+
+            # 保存错误输出用于调试
+            try:
+                with open("output/llm_error_output.txt", "w", encoding="utf-8") as f:
+                    f.write(original_content)
+                logger.warning("   原始内容已保存到 output/llm_error_output.txt")
+            except Exception:
+                pass
+
+            raise LLMResponseParseError("无法解析 LLM 响应为有效 JSON")
@@ -0,0 +1,307 @@
+"""
+LLM Stream - 流式输出的 SSE 解析与缓冲
+
+- parse_sse_line：解析一行 SSE 数据，安装了 orjson 时用它解码（直接接受 bytes，省去逐行 decode）
+- StreamBuffer：按块追加、结束时一次性拼接，避免逐块字符串拼接带来的 O(n²) 复制
+- IncrementalJSONParser：随流解析报告 JSON，顶层字段闭合即回调，尾部损坏时保留已完成字段
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _DecodeError = orjson.JSONDecodeError
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    _loads = json.loads
+    _DecodeError = json.JSONDecodeError
+    JSON_BACKEND = "json"
+
+_DATA_PREFIX = "data:"
+_DATA_PREFIX_BYTES = b"data:"
+_EMPTY = ("", None)
+
+
+def parse_sse_event(line: Union[str, bytes]) -> Optional[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    解析一行 SSE 数据（OpenAI 兼容的 chat.completion.chunk 格式）
+
+    Args:
+        line: 一行原始数据（str 或 bytes，不含换行）
+
+    Returns:
+        (增量文本, usage)：非 data 行、无内容或无法解析时文本为空字符串；
+        usage 仅在携带用量的事件（通常是最后一个 chunk）中非空；遇到 [DONE] 返回 None
+    """
+    if isinstance(line, bytes):
+        if not line.startswith(_DATA_PREFIX_BYTES):
+            return _EMPTY
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return None
+    else:
+        if not line.startswith(_DATA_PREFIX):
+            return _EMPTY
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+
+    if not data:
+        return _EMPTY
+
+    try:
+        event = _loads(data)
+    except (_DecodeError, UnicodeDecodeError, ValueError):
+        return _EMPTY
+
+    try:
+        usage = event.get("usage")
+        choices = event.get("choices")
+        content = (choices[0].get("delta") or {}).get("content") or "" if choices else ""
+    except (IndexError, TypeError, AttributeError):
+        return _EMPTY
+    return content, usage
+
+
+def parse_sse_line(line: Union[str, bytes]) -> Optional[str]:
+    """
+    解析一行 SSE 数据，只返回增量文本
+
+    Returns:
+        增量文本（可能为空字符串）；遇到 [DONE] 返回 None
+    """
+    event = parse_sse_event(line)
+    return None if event is None else event[0]
+
+
+class StreamBuffer:
+    """流式文本缓冲区：追加为 O(1)，完整文本只在需要时拼接一次"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._length = 0
+        self._joined: Optional[str] = None
+
+    def append(self, chunk: str) -> None:
+        """追加一段增量文本"""
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        self._joined = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def getvalue(self) -> str:
+        """返回完整文本（结果会被缓存，直到下一次追加）"""
+        if self._joined is None:
+            self._joined = "".join(self._chunks)
+            self._chunks = [self._joined] if self._joined else []
+        return self._joined
+
+
+# 结构字符（字符串外）与字符串内需要关注的字符
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# 解析器状态
+_BEFORE_ROOT, _EXPECT_KEY, _IN_KEY, _EXPECT_COLON, _IN_VALUE, _DONE = range(6)
+
+# 解析失败的占位值
+_INVALID = object()
+
+
+class IncrementalJSONParser:
+    """
+    增量 JSON 解析器：随流式输出逐块喂入，顶层字段一闭合就解析并回调
+
+    - 顶层字段（如 core_viewpoint、kpis）闭合时触发 on_field(key, value)
+    - 顶层数组字段（如 stock_analysis）的每个元素闭合时触发 on_item(key, index, item)，
+      数组整体闭合时再触发 on_field
+    - 单个元素或字段解析失败只记录到 errors 并跳过，不影响其它字段；
+      因此尾部截断或格式损坏时，已完成的字段仍可通过 result 取回
+
+    根对象之前的 <think> 思考内容、```json 代码块标记等前缀会被跳过，根对象闭合后的内容被忽略。
+    已处理完的文本会被及时丢弃，缓冲区只保留当前未闭合的字段或元素。
+    """
+
+    def __init__(self, on_field=None, on_item=None, on_error=None):
+        """
+        初始化解析器
+
+        Args:
+            on_field: 顶层字段完成回调 on_field(key, value)
+            on_item: 顶层数组元素完成回调 on_item(key, index, item)
+            on_error: 字段或元素解析失败回调 on_error(message)
+        """
+        self.on_field = on_field
+        self.on_item = on_item
+        self.on_error = on_error
+        self.result: Dict[str, Any] = {}
+        self.errors: List[str] = []
+
+        self._buf = ""
+        self._pos = 0
+        self._state = _BEFORE_ROOT
+        self._depth = 0
+        self._in_string = False
+        self._key_start = 0
+        self._key: Optional[str] = None
+        self._value_start = 0
+        self._array: Optional[List[Any]] = None
+        self._item_start = 0
+
+    @property
+    def complete(self) -> bool:
+        """根对象是否已闭合"""
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> None:
+        """喂入一段增量文本"""
+        if self._state == _DONE or not chunk:
+            return
+        self._buf += chunk
+        if self._state == _BEFORE_ROOT and not self._find_root():
+            return
+        self._scan()
+
+    def _find_root(self) -> bool:
+        """跳过前缀，定位根对象的 '{'"""
+        search_from = 0
+        think = self._buf.find("<think>")
+        if think != -1:
+            think_end = self._buf.find("</think>", think)
+            if think_end == -1:
+                return False
+            search_from = think_end + len("</think>")
+
+        root = self._buf.find("{", search_from)
+        if root == -1:
+            # 保留可能是 "<think>" 开头的尾部，其余前缀丢弃
+            self._buf = self._buf[search_from:][-len("<think>"):]
+            return False
+
+        self._buf = self._buf[root + 1:]
+        self._pos = 0
+        self._depth = 1
+        self._state = _EXPECT_KEY
+        return True
+
+    def _scan(self) -> None:
+        buf = self._buf
+        pos = self._pos
+
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+                pos = match.start()
+                if buf[pos] == "\\":
+                    if pos + 1 >= len(buf):
+                        break  # 转义字符被截断，等待下一块
+                    pos += 2
+                    continue
+                self._in_string = False
+                pos += 1
+                if self._state == _IN_KEY:
+                    self._key = self._loads(buf[self._key_start:pos], "key")
+                    self._state = _EXPECT_COLON
+                continue
+
+            match = _STRUCTURAL.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            pos = match.start()
+            char = buf[pos]
+            pos += 1
+
+            if char == '"':
+                self._in_string = True
+                if self._state == _EXPECT_KEY and self._depth == 1:
+                    self._key_start = pos - 1
+                    self._state = _IN_KEY
+            elif char == ":":
+                if self._state == _EXPECT_COLON and self._depth == 1:
+                    self._state = _IN_VALUE
+                    self._value_start = pos
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._state == _IN_VALUE:
+                    self._array = []
+                    self._item_start = pos
+            elif char == ",":
+                if self._depth == 1 and self._state == _IN_VALUE:
+                    self._finish_field(buf[self._value_start:pos - 1])
+                    buf, pos = buf[pos:], 0
+                elif self._depth == 2 and self._array is not None:
+                    self._finish_item(buf[self._item_start:pos - 1])
+                    buf, pos = buf[pos:], 0
+                    self._item_start = 0
+            else:  # '}' 或 ']'
+                self._depth -= 1
+                if self._depth == 1 and self._array is not None and char == "]":
+                    self._finish_item(buf[self._item_start:pos - 1])
+                    self._finish_field(None)
+                    self._state = _IN_VALUE  # 等待 ',' 或 '}' 结束该字段
+                    buf, pos = buf[pos:], 0
+                    self._value_start = -1
+                elif self._depth == 0:
+                    if self._state == _IN_VALUE and self._value_start >= 0:
+                        self._finish_field(buf[self._value_start:pos - 1])
+                    self._state = _DONE
+                    buf, pos = "", 0
+                    break
+
+        self._buf = buf
+        self._pos = pos
+
+    def _finish_field(self, text: Optional[str]) -> None:
+        """完成一个顶层字段；text 为 None 表示数组字段（元素已逐个解析）"""
+        if self._value_start < 0:
+            # 数组字段已在 ']' 处完成，这里只是遇到了其后的分隔符
+            self._state = _EXPECT_KEY
+            self._value_start = 0
+            return
+
+        key = self._key
+        if text is None:
+            value = self._array
+            self._array = None
+        else:
+            value = self._loads(text, key)
+        self._state = _EXPECT_KEY
+        self._key = None
+
+        if key is None or key is _INVALID or value is _INVALID:
+            return
+        self.result[key] = value
+        if self.on_field:
+            self.on_field(key, value)
+
+    def _finish_item(self, text: str) -> None:
+        """完成一个顶层数组元素"""
+        if not text.strip():
+            return  # 空数组或尾随逗号
+        item = self._loads(text, f"{self._key}[{len(self._array)}]")
+        if item is _INVALID:
+            return
+        self._array.append(item)
+        if self.on_item:
+            self.on_item(self._key, len(self._array) - 1, item)
+
+    def _loads(self, text: str, label: Optional[str]) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            message = f"{label}: {e.msg}"
+            self.errors.append(message)
+            if self.on_error:
+                self.on_error(message)
+            return _INVALID
+
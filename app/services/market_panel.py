@@ -0,0 +1,138 @@
+"""Market Panel - 持仓行情面板
+
+把多只股票的日线收盘价对齐成一个 (交易日 × 股票) 的二维数组，
+供风险、相关性、归因等分析模块做向量化计算。
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class PricePanel:
+    """价格面板：行是交易日，列是股票"""
+
+    def __init__(self, stock_codes: Sequence[str], dates: pd.DatetimeIndex, closes: np.ndarray):
+        """
+        初始化价格面板
+
+        Args:
+            stock_codes: 股票代码（列）
+            dates: 交易日（行）
+            closes: 收盘价矩阵，形状 (len(dates), len(stock_codes))
+        """
+        self.stock_codes: List[str] = list(stock_codes)
+        self.dates = pd.DatetimeIndex(dates)
+        self.closes = np.asarray(closes, dtype=np.float64)
+
+        if self.closes.shape != (len(self.dates), len(self.stock_codes)):
+            raise ValueError(f"价格面板形状不匹配: {self.closes.shape}")
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], field: str = "CLOSE") -> "PricePanel":
+        """
+        由每只股票的行情 DataFrame（DatetimeIndex）构建面板
+
+        交易日取并集，停牌日向前填充；上市前的缺口保持 NaN，收益率按 0 处理。
+
+        Args:
+            frames: 股票代码 → 行情 DataFrame
+            field: 价格字段名
+
+        Returns:
+            PricePanel: 价格面板
+        """
+        series = {
+            code: df[field].astype(float)
+            for code, df in frames.items()
+            if df is not None and field in df
+        }
+        if not series:
+            return cls([], pd.DatetimeIndex([]), np.empty((0, 0)))
+
+        wide = pd.concat(series, axis=1).sort_index().ffill()
+        wide = wide[~wide.index.duplicated(keep="last")]
+        return cls(list(wide.columns), wide.index, wide.to_numpy())
+
+    @property
+    def trading_day(self) -> Optional[date]:
+        """面板最后一个交易日（用作缓存分区）"""
+        if len(self.dates) == 0:
+            return None
+        return self.dates[-1].date()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def returns(self) -> np.ndarray:
+        """
+        日收益率矩阵，形状 (T-1, N)；缺失数据记为 0
+
+        Returns:
+            np.ndarray: 简单收益率
+        """
+        if len(self.dates) < 2:
+            return np.empty((0, len(self.stock_codes)))
+        prev = self.closes[:-1]
+        rets = np.divide(
+            self.closes[1:] - prev,
+            prev,
+            out=np.zeros_like(prev),
+            where=np.isfinite(prev) & (prev > 0)
+        )
+        rets[~np.isfinite(rets)] = 0.0
+        return rets
+
+    def aligned_returns(self, series: pd.Series) -> np.ndarray:
+        """
+        把外部价格序列（如基准指数）对齐到面板交易日并计算日收益率
+
+        Args:
+            series: 以日期为索引的价格序列
+
+        Returns:
+            np.ndarray: 形状 (T-1,) 的收益率
+        """
+        aligned = series.astype(float).reindex(self.dates, method="ffill").to_numpy()
+        if aligned.size < 2:
+            return np.empty(0)
+        prev = aligned[:-1]
+        rets = np.divide(
+            aligned[1:] - prev,
+            prev,
+            out=np.zeros_like(prev),
+            where=np.isfinite(prev) & (prev > 0)
+        )
+        rets[~np.isfinite(rets)] = 0.0
+        return rets
+
+    def select(self, stock_codes: Sequence[str]) -> "PricePanel":
+        """
+        按给定顺序选取部分股票（不在面板中的代码会被忽略）
+
+        Args:
+            stock_codes: 股票代码列表
+
+        Returns:
+            PricePanel: 子面板
+        """
+        idx = [self.stock_codes.index(c) for c in stock_codes if c in self.stock_codes]
+        return PricePanel([self.stock_codes[i] for i in idx], self.dates, self.closes[:, idx])
+
+    def weights_for(self, weights: Dict[str, float]) -> np.ndarray:
+        """
+        把 股票代码 → 权重 的字典转换成与面板列顺序一致的权重数组
+
+        Args:
+            weights: 股票代码 → 权重（0-1）
+
+        Returns:
+            np.ndarray: 权重数组（面板中无对应权重的为 0）
+        """
+        return np.array([weights.get(code, 0.0) for code in self.stock_codes], dtype=np.float64)
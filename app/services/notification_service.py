@@ -116,7 +116,8 @@ class NotificationService:
     def send_weekly_report(
         self, 
         html_content: str,
-        report_date: Optional[datetime] = None
+        report_date: Optional[datetime] = None,
+        push_content: Optional[str] = None
     ) -> bool:
         """
         推送周报到微信
@@ -124,6 +125,8 @@ class NotificationService:
         Args:
             html_content: 周报 HTML 内容
             report_date: 报告日期（可选，默认当前日期）
+            push_content: 推送摘要（TemplateService.render_push_digest 的 Markdown），
+                有摘要时推送摘要，没有时退回完整 HTML（样式表较大，微信中可能显示不全）
             
         Returns:
             bool: 是否推送成功
@@ -140,9 +143,13 @@ class NotificationService:
         
         logger.info(f"📤 准备推送周报: {title}")
         
+        content = push_content or html_content
+        if push_content:
+            logger.info(f"   📦 推送摘要 {len(push_content.encode('utf-8')):,} 字节（完整 HTML {len(html_content.encode('utf-8')):,} 字节）")
+        
         return self.send_serverchan(
             title=title,
-            content=html_content,
+            content=content,
             short=short
         )
     
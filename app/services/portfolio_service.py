@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from app.core.logging import get_logger
 from app.core.exceptions import PortfolioNotFoundError, PositionNotFoundError
 from app.models import Portfolio, Position
+from app.services.position_book import PositionBook
 
 logger = get_logger(__name__)
 
@@ -70,7 +71,7 @@ class PortfolioService:
         current_price: float
     ) -> Dict:
         """
-        计算单个持仓的指标
+        计算单个持仓的指标（批量场景请使用 build_position_book）
         
         Args:
             position: 持仓对象
@@ -80,85 +81,57 @@ class PortfolioService:
             Dict: 包含市值、盈亏等指标
         """
         try:
-            quantity = position.quantity
-            cost_price = float(position.cost_price)
-            
-            # 计算市值
-            market_value = quantity * current_price
-            cost_value = quantity * cost_price
-            
-            # 计算盈亏
-            profit_loss = market_value - cost_value
-            profit_loss_pct = (profit_loss / cost_value * 100) if cost_value > 0 else 0
-            
-            return {
-                "stock_code": position.stock_code,
-                "stock_name": position.stock_name,
-                "quantity": quantity,
-                "cost_price": cost_price,
-                "current_price": current_price,
-                "market_value": market_value,
-                "cost_value": cost_value,
-                "profit_loss": profit_loss,
-                "profit_loss_pct": profit_loss_pct
-            }
+            book = PositionBook.from_positions([position], {position.stock_code: current_price})
+            return book.to_records()[0]
         except Exception as e:
             logger.error(f"计算持仓指标失败: {position.stock_code}, {e}")
             return {}
     
+    def build_position_book(
+        self,
+        positions: List[Position],
+        prices: Dict[str, float],
+        names: Optional[Dict[str, str]] = None
+    ) -> PositionBook:
+        """
+        构建向量化持仓簿，一次性计算全部持仓的市值和盈亏
+        
+        Args:
+            positions: 持仓列表
+            prices: 股票代码 → 当前价格（缺失价格的持仓会被跳过）
+            names: 股票代码 → 股票名称（可选）
+            
+        Returns:
+            PositionBook: 持仓簿
+        """
+        return PositionBook.from_positions(positions, prices, names)
+    
     def calculate_portfolio_metrics(
         self, 
-        portfolio_id: int, 
-        positions_data: List[Dict]
+        portfolio: Portfolio, 
+        book: PositionBook
     ) -> Dict:
         """
         计算组合级别的指标
         
         Args:
-            portfolio_id: 组合ID
-            positions_data: 持仓数据列表（包含市值、盈亏等）
+            portfolio: 已加载的持仓组合对象（不再重复查询数据库）
+            book: 持仓簿
             
         Returns:
             Dict: 组合级别的汇总指标
         """
         try:
-            portfolio = self.get_portfolio(portfolio_id)
-            if not portfolio:
-                return {}
-            
-            # 计算总市值和总盈亏
-            total_market_value = sum(p.get("market_value", 0) for p in positions_data)
-            total_cost_value = sum(p.get("cost_value", 0) for p in positions_data)
-            total_profit_loss = sum(p.get("profit_loss", 0) for p in positions_data)
-            
-            # 计算总收益率
-            total_return_pct = (total_profit_loss / total_cost_value * 100) if total_cost_value > 0 else 0
-            
-            # 计算仓位占比（假设总资产包含现金）
+            # 总资产包含现金
             total_assets = float(portfolio.total_assets)
-            position_ratio = (total_market_value / total_assets * 100) if total_assets > 0 else 0
-            cash = total_assets - total_market_value
-            
-            # 计算每只股票的仓位占比
-            for pos_data in positions_data:
-                pos_data["position_ratio"] = (pos_data.get("market_value", 0) / total_assets * 100) if total_assets > 0 else 0
-            
             metrics = {
-                "portfolio_id": portfolio_id,
+                "portfolio_id": portfolio.id,
                 "portfolio_name": portfolio.name,
-                "total_assets": total_assets,
-                "total_market_value": total_market_value,
-                "total_cost_value": total_cost_value,
-                "total_profit_loss": total_profit_loss,
-                "total_return_pct": total_return_pct,
-                "position_ratio": position_ratio,
-                "cash": cash,
-                "cash_ratio": 100 - position_ratio,
-                "position_count": len(positions_data)
+                **book.summary(total_assets)
             }
             
-            logger.info(f"   ✓ 组合指标: 总资产 ¥{total_assets:,.2f}, 市值 ¥{total_market_value:,.2f}, "
-                        f"盈亏 {total_return_pct:+.2f}%, 仓位 {position_ratio:.1f}%")
+            logger.info(f"   ✓ 组合指标: 总资产 ¥{total_assets:,.2f}, 市值 ¥{metrics['total_market_value']:,.2f}, "
+                        f"盈亏 {metrics['total_return_pct']:+.2f}%, 仓位 {metrics['position_ratio']:.1f}%")
             
             return metrics
         except Exception as e:
@@ -0,0 +1,201 @@
+"""Position Book - 基于 NumPy 数组的持仓簿
+
+把一个组合的全部持仓压缩成几列定长数组（代码、数量、成本、现价），
+市值、盈亏、仓位占比等指标一次性向量化算出，避免逐只持仓的 Python 循环、
+Decimal → float 转换和字典查找。
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class PositionBook:
+    """持仓簿：一列一个指标，一行一只股票"""
+
+    def __init__(
+        self,
+        stock_codes: Sequence[str],
+        quantities: Sequence[float],
+        cost_prices: Sequence[float],
+        current_prices: Sequence[float],
+        stock_names: Optional[Sequence[Optional[str]]] = None
+    ):
+        """
+        初始化持仓簿
+
+        Args:
+            stock_codes: 股票代码列表
+            quantities: 持仓数量（股）
+            cost_prices: 成本价
+            current_prices: 当前价格
+            stock_names: 股票名称（可选）
+        """
+        self.stock_codes: List[str] = list(stock_codes)
+        self.stock_names: List[Optional[str]] = (
+            list(stock_names) if stock_names is not None else [None] * len(self.stock_codes)
+        )
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.cost_prices = np.asarray(cost_prices, dtype=np.float64)
+        self.current_prices = np.asarray(current_prices, dtype=np.float64)
+
+        n = len(self.stock_codes)
+        if not (len(self.stock_names) == self.quantities.size == self.cost_prices.size
+                == self.current_prices.size == n):
+            raise ValueError("持仓簿各列长度不一致")
+
+        # 向量化计算（一次完成全部持仓）
+        self.market_values = self.quantities * self.current_prices
+        self.cost_values = self.quantities * self.cost_prices
+        self.profit_loss = self.market_values - self.cost_values
+        self.profit_loss_pct = np.divide(
+            self.profit_loss * 100,
+            self.cost_values,
+            out=np.zeros(n),
+            where=self.cost_values > 0
+        )
+
+    @classmethod
+    def from_positions(
+        cls,
+        positions: Iterable,
+        prices: Dict[str, float],
+        names: Optional[Dict[str, str]] = None
+    ) -> "PositionBook":
+        """
+        由 Position 模型列表和价格表构建持仓簿（无价格的持仓会被跳过）
+
+        Args:
+            positions: Position 对象列表
+            prices: 股票代码 → 当前价格
+            names: 股票代码 → 股票名称（可选，覆盖数据库中的名称）
+
+        Returns:
+            PositionBook: 持仓簿
+        """
+        names = names or {}
+        codes, stock_names, quantities, costs, current = [], [], [], [], []
+        for position in positions:
+            price = prices.get(position.stock_code)
+            if price is None:
+                continue
+            codes.append(position.stock_code)
+            stock_names.append(names.get(position.stock_code) or position.stock_name)
+            quantities.append(position.quantity)
+            costs.append(float(position.cost_price))
+            current.append(price)
+        return cls(codes, quantities, costs, current, stock_names)
+
+    def __len__(self) -> int:
+        return len(self.stock_codes)
+
+    @property
+    def total_market_value(self) -> float:
+        """持仓总市值"""
+        return float(self.market_values.sum())
+
+    @property
+    def total_cost_value(self) -> float:
+        """持仓总成本"""
+        return float(self.cost_values.sum())
+
+    @property
+    def total_profit_loss(self) -> float:
+        """持仓总盈亏"""
+        return float(self.profit_loss.sum())
+
+    def weights(self, total_assets: float) -> np.ndarray:
+        """
+        计算各持仓占总资产的比例（0-1）
+
+        Args:
+            total_assets: 总资产（含现金）
+
+        Returns:
+            np.ndarray: 权重数组
+        """
+        if total_assets <= 0:
+            return np.zeros(len(self))
+        return self.market_values / total_assets
+
+    def weight_map(self, total_assets: float) -> Dict[str, float]:
+        """
+        股票代码 → 占总资产权重（0-1）的映射
+
+        Args:
+            total_assets: 总资产（含现金）
+
+        Returns:
+            Dict[str, float]: 权重字典
+        """
+        return dict(zip(self.stock_codes, self.weights(total_assets).tolist()))
+
+    def index_of(self, stock_code: str) -> int:
+        """返回股票在持仓簿中的行号，不存在时抛出 KeyError"""
+        try:
+            return self.stock_codes.index(stock_code)
+        except ValueError:
+            raise KeyError(stock_code)
+
+    def to_records(self, total_assets: Optional[float] = None) -> List[Dict]:
+        """
+        导出为逐只持仓的字典列表（字段与 calculate_position_metrics 一致）
+
+        Args:
+            total_assets: 总资产，提供时附带 position_ratio（百分比）
+
+        Returns:
+            List[Dict]: 持仓指标列表
+        """
+        columns = {
+            "quantity": self.quantities.astype(np.int64).tolist(),
+            "cost_price": self.cost_prices.tolist(),
+            "current_price": self.current_prices.tolist(),
+            "market_value": self.market_values.tolist(),
+            "cost_value": self.cost_values.tolist(),
+            "profit_loss": self.profit_loss.tolist(),
+            "profit_loss_pct": self.profit_loss_pct.tolist(),
+        }
+        if total_assets is not None:
+            columns["position_ratio"] = (self.weights(total_assets) * 100).tolist()
+
+        records = []
+        for i, code in enumerate(self.stock_codes):
+            record = {"stock_code": code, "stock_name": self.stock_names[i]}
+            for key, values in columns.items():
+                record[key] = values[i]
+            records.append(record)
+        return records
+
+    def summary(self, total_assets: float) -> Dict:
+        """
+        组合级汇总指标
+
+        Args:
+            total_assets: 总资产（含现金）
+
+        Returns:
+            Dict: 总市值、总成本、总盈亏、收益率、仓位、现金等
+        """
+        total_market_value = self.total_market_value
+        total_cost_value = self.total_cost_value
+        total_profit_loss = self.total_profit_loss
+
+        total_return_pct = (total_profit_loss / total_cost_value * 100) if total_cost_value > 0 else 0
+        position_ratio = (total_market_value / total_assets * 100) if total_assets > 0 else 0
+
+        return {
+            "total_assets": total_assets,
+            "total_market_value": total_market_value,
+            "total_cost_value": total_cost_value,
+            "total_profit_loss": total_profit_loss,
+            "total_return_pct": total_return_pct,
+            "position_ratio": position_ratio,
+            "cash": total_assets - total_market_value,
+            "cash_ratio": 100 - position_ratio,
+            "position_count": len(self)
+        }
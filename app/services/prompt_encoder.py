@@ -0,0 +1,197 @@
+"""
+Prompt Encoder - 提示词紧凑编码与 token 预算
+
+- 持仓明细用 CSV 风格的表格代替缩进 JSON：列名只出现一次，数值按含义取整，None 指标不输出
+- estimate_tokens 在本地估算 token 数（不依赖远端分词器），用于在发送前检查提示词预算
+- 超出预算时按 detail 等级逐步降级：先精简技术指标列，再去掉指标列，最后只保留仓位最大的若干只持仓，
+  其余持仓汇总为一行
+"""
+
+import math
+from typing import Any, Dict, List, Sequence
+
+# 技术指标列（按展示顺序）；None 在所有持仓上都缺失的列会被省略
+INDICATOR_COLUMNS = (
+    "MA5", "MA10", "MA20", "MA30", "MA250",
+    "RSI6", "RSI12", "RSI24",
+    "MACD_DIF", "MACD_DEA", "MACD",
+    "BOLL_upper", "BOLL_mid", "BOLL_lower",
+)
+
+# 精简模式下保留的指标
+CORE_INDICATOR_COLUMNS = ("MA20", "MA250", "RSI12", "MACD")
+
+# detail 等级：0 全部指标，1 核心指标，2 无指标，>= 3 起每级持仓行数减半
+FULL_DETAIL, CORE_DETAIL, NO_INDICATORS = 0, 1, 2
+
+# 行数截断的下限
+MIN_ROWS = 5
+
+# 汇总行中最多列出的股票名称数
+MAX_SUMMARY_NAMES = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算 token 数（偏保守）：CJK 字符约 1 token/字，其余字符约 4 字符/token
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def compact_number(value: Any, digits: int = 2) -> str:
+    """
+    数值的紧凑表示：按位数取整并去掉多余的 0，None/NaN 输出空串
+
+    Args:
+        value: 数值
+        digits: 小数位数
+
+    Returns:
+        str: 文本表示
+    """
+    if value is None:
+        return ""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(number):
+        return ""
+    text = f"{number:.{digits}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def encode_table(columns: Sequence[str], rows: Sequence[Sequence[str]]) -> str:
+    """
+    编码为 CSV 风格的表格（首行为列名，单元格中的逗号替换为全角）
+
+    Args:
+        columns: 列名
+        rows: 行（已格式化的文本）
+
+    Returns:
+        str: 表格文本
+    """
+    lines = [",".join(columns)]
+    lines.extend(",".join(str(cell).replace(",", "，") for cell in row) for row in rows)
+    return "\n".join(lines)
+
+
+def compact_price(value: Any) -> str:
+    """价格类数值：低价品种（如 ETF）保留 3 位小数，其余 2 位"""
+    if value is None:
+        return ""
+    try:
+        digits = 3 if abs(float(value)) < 10 else 2
+    except (TypeError, ValueError):
+        return str(value)
+    return compact_number(value, digits)
+
+
+def _format_indicator(name: str, value: Any) -> str:
+    if name.startswith("RSI"):
+        return compact_number(value, 1)
+    if name.startswith("MACD"):
+        return compact_number(value, 3)
+    return compact_price(value)
+
+
+def encode_holdings(holdings: List[Dict[str, Any]], detail: int = FULL_DETAIL) -> str:
+    """
+    把持仓明细编码为紧凑表格
+
+    Args:
+        holdings: 持仓列表（data_service 输出的 holdings）
+        detail: 详细程度等级，见模块说明
+
+    Returns:
+        str: 表格文本（超出行数的持仓汇总在末尾一行）
+    """
+    if detail <= FULL_DETAIL:
+        candidates = INDICATOR_COLUMNS
+    elif detail == CORE_DETAIL:
+        candidates = CORE_INDICATOR_COLUMNS
+    else:
+        candidates = ()
+    indicators = [
+        name for name in candidates
+        if any((h.get("indicators") or {}).get(name) is not None for h in holdings)
+    ]
+
+    rows_kept = holdings
+    rest: List[Dict[str, Any]] = []
+    if detail > NO_INDICATORS:
+        limit = max(MIN_ROWS, math.ceil(len(holdings) / 2 ** (detail - NO_INDICATORS)))
+        if limit < len(holdings):
+            ranked = sorted(holdings, key=lambda h: h.get("position_ratio") or 0.0, reverse=True)
+            kept_codes = {h.get("stock_code") for h in ranked[:limit]}
+            rows_kept = [h for h in holdings if h.get("stock_code") in kept_codes]
+            rest = [h for h in holdings if h.get("stock_code") not in kept_codes]
+
+    columns = ["代码", "名称", "现价", "成本", "数量", "市值", "盈亏", "盈亏%", "仓位%"] + indicators
+    rows = []
+    for h in rows_kept:
+        values = h.get("indicators") or {}
+        rows.append([
+            h.get("stock_code", ""),
+            h.get("stock_name", ""),
+            compact_price(h.get("current_price")),
+            compact_number(h.get("cost_price"), 3),
+            h.get("quantity", 0),
+            compact_number(h.get("market_value"), 0),
+            compact_number(h.get("profit_loss"), 0),
+            compact_number(h.get("profit_loss_pct"), 2),
+            compact_number(h.get("position_ratio"), 1),
+        ] + [_format_indicator(name, values.get(name)) for name in indicators])
+
+    table = encode_table(columns, rows)
+    if rest:
+        table += "\n" + summarize_rest(rest)
+    return table
+
+
+def summarize_rest(holdings: List[Dict[str, Any]]) -> str:
+    """
+    被截断持仓的汇总行
+
+    Args:
+        holdings: 被截断的持仓
+
+    Returns:
+        str: 汇总描述
+    """
+    position = sum(h.get("position_ratio") or 0.0 for h in holdings)
+    market_value = sum(h.get("market_value") or 0.0 for h in holdings)
+    profit_loss = sum(h.get("profit_loss") or 0.0 for h in holdings)
+    names = "、".join(str(h.get("stock_name") or h.get("stock_code")) for h in holdings[:MAX_SUMMARY_NAMES])
+    if len(holdings) > MAX_SUMMARY_NAMES:
+        names += " 等"
+    return (
+        f"（其余 {len(holdings)} 只持仓因篇幅汇总：{names}；合计仓位 {position:.1f}%，"
+        f"市值 {market_value:,.0f}，盈亏 {profit_loss:+,.0f}）"
+    )
+
+
+def max_detail(holding_count: int) -> int:
+    """
+    持仓数量对应的最低详细程度等级（再降级行数也不会减少）
+
+    Args:
+        holding_count: 持仓数量
+
+    Returns:
+        int: 最大 detail 等级
+    """
+    detail = NO_INDICATORS
+    while math.ceil(holding_count / 2 ** (detail - NO_INDICATORS)) > MIN_ROWS:
+        detail += 1
+    return detail
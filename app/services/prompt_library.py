@@ -0,0 +1,118 @@
+"""
+Prompt Library - 版本化的提示词模板
+
+提示词以 Jinja2 模板的形式放在 prompts/<版本>/ 下（版本由 LLM_PROMPT_VERSION 指定），
+每个版本在进程内只加载、编译一次：
+
+- 系统提示词不依赖任何数据，首次使用时渲染并缓存为字符串，每次请求逐字节一致，
+  可以命中上游服务的 prompt cache（KV 缓存折扣、更低的首 token 延迟）
+- 与数据相关的内容只出现在用户提示词中；组合层面请求在完整周报的系统提示词末尾追加说明，前缀不变
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+from app.core.cache import fingerprint
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PROMPTS_DIR = Path(__file__).resolve().parents[2] / "prompts"
+
+# 每个版本必须提供的模板（启动时全部预编译，缺失即报错）
+TEMPLATES = (
+    "html_rules.md",
+    "report_system.md",
+    "stock_system.md",
+    "portfolio_note.md",
+    "report_user.md",
+    "stock_user.md",
+    "repair_note.md",
+)
+
+# 不依赖数据的模板：渲染结果在进程内缓存
+STATIC_TEMPLATES = ("report_system.md", "stock_system.md", "portfolio_note.md")
+
+
+class PromptLibrary:
+    """一个版本的提示词模板（预编译 + 静态部分缓存）"""
+
+    def __init__(self, version: Optional[str] = None, directory: Optional[Path] = None):
+        """
+        加载并编译模板
+
+        Args:
+            version: 提示词版本（子目录名），默认取 LLM_PROMPT_VERSION
+            directory: 提示词根目录，默认为项目下的 prompts/
+        """
+        self.version = version or settings.LLM_PROMPT_VERSION
+        self.path = Path(directory or PROMPTS_DIR) / self.version
+        self.env = Environment(
+            loader=FileSystemLoader(str(self.path)),
+            autoescape=False,
+            keep_trailing_newline=True,
+            undefined=StrictUndefined,
+            auto_reload=False,
+        )
+        self.env.filters["fmt"] = format
+        self._templates = {name: self.env.get_template(name) for name in TEMPLATES}
+        self._static = {name: self._templates[name].render() for name in STATIC_TEMPLATES}
+
+    def static(self, name: str) -> str:
+        """
+        不依赖数据的提示词（系统提示词等），返回缓存的渲染结果
+
+        Args:
+            name: 模板文件名
+
+        Returns:
+            str: 提示词文本
+        """
+        return self._static[name]
+
+    def render(self, name: str, **context: Any) -> str:
+        """
+        渲染与数据相关的提示词
+
+        Args:
+            name: 模板文件名
+            **context: 模板变量
+
+        Returns:
+            str: 提示词文本
+        """
+        return self._templates[name].render(**context)
+
+    def fingerprint(self, name: str = "report_system.md") -> str:
+        """静态提示词的短指纹（日志中用于确认前缀是否变化）"""
+        return fingerprint("prompt", self.version, self._static[name])[:12]
+
+
+_libraries: Dict[str, PromptLibrary] = {}
+_lock = threading.Lock()
+
+
+def get_prompt_library(version: Optional[str] = None) -> PromptLibrary:
+    """
+    获取进程共享的提示词库（每个版本只编译一次）
+
+    Args:
+        version: 提示词版本，默认取 LLM_PROMPT_VERSION
+
+    Returns:
+        PromptLibrary: 提示词库
+    """
+    version = version or settings.LLM_PROMPT_VERSION
+    library = _libraries.get(version)
+    if library is None:
+        with _lock:
+            library = _libraries.get(version)
+            if library is None:
+                library = PromptLibrary(version)
+                _libraries[version] = library
+                logger.info(f"✓ 提示词模板已编译: {version}（系统提示词指纹 {library.fingerprint()}）")
+    return library
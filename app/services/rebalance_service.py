@@ -0,0 +1,411 @@
+"""Rebalance Simulator - 调仓可行性模拟服务
+
+LLM 给出的目标仓位（action_plan[*].target_position_pct）只是百分比，
+本模块把它转换为实际可下的委托，并按 A 股交易规则模拟成交：
+- 每手 100 股（科创板买入最少 200 股、超出部分按 1 股递增），清仓时允许卖出零股
+- 涨跌停：收于涨停不可买入，收于跌停不可卖出
+- 交易成本：佣金（有最低收费）、印花税（仅卖出）、过户费
+- 先卖后买，买入资金不足时按比例缩减后重新取整
+
+输出模拟后的现金、权重、相对目标的偏离和事前跟踪误差。
+计算按持仓向量化完成，足够在每份周报中运行，也可以在用户修改目标后交互式重算。
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.backtest_service import as_pct
+from app.services.position_book import PositionBook
+from app.services.risk_service import MIN_OBSERVATIONS, TRADING_DAYS, RiskService
+
+logger = get_logger(__name__)
+
+# 每手股数
+BOARD_LOT = 100
+
+# 科创板单笔买入最少股数
+STAR_MIN_SHARES = 200
+
+# 买入资金不足时的最大缩减迭代次数
+MAX_SCALE_ITERATIONS = 20
+
+# 目标仓位结构与模拟结果的现金比例允许偏差（百分点）
+ALLOCATION_TOLERANCE_PCT = 5.0
+
+
+def price_limit_ratio(stock_code: str, stock_name: Optional[str] = None) -> float:
+    """
+    涨跌幅限制比例
+
+    Args:
+        stock_code: 股票代码（如 600519.SH）
+        stock_name: 股票名称（用于识别 ST）
+
+    Returns:
+        float: 涨跌幅限制，如 0.1 表示 ±10%
+    """
+    code = stock_code.split(".")[0]
+    if code.startswith(("688", "689", "300", "301")):
+        return 0.20
+    if stock_code.upper().endswith(".BJ"):
+        return 0.30
+    if stock_name and "ST" in stock_name.upper():
+        return 0.05
+    return 0.10
+
+
+def limit_flags(
+    stock_codes: Sequence[str],
+    stock_names: Sequence[Optional[str]],
+    prices: np.ndarray,
+    prev_close: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    判断是否收于涨停 / 跌停（前收盘价缺失时视为未触及）
+
+    Args:
+        stock_codes: 股票代码
+        stock_names: 股票名称
+        prices: 最新价
+        prev_close: 前收盘价
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (涨停标记, 跌停标记)
+    """
+    ratios = np.array([price_limit_ratio(c, n) for c, n in zip(stock_codes, stock_names)])
+    valid = np.isfinite(prev_close) & (prev_close > 0)
+    base = np.where(valid, prev_close, 0.0)
+    up_price = np.round(base * (1 + ratios), 2)
+    down_price = np.round(base * (1 - ratios), 2)
+    return valid & (prices >= up_price - 0.005), valid & (prices <= down_price + 0.005)
+
+
+def round_shares(stock_codes: Sequence[str], shares: np.ndarray) -> np.ndarray:
+    """
+    把股数向下取整到可交易数量
+
+    Args:
+        stock_codes: 股票代码
+        shares: 期望股数（非负）
+
+    Returns:
+        np.ndarray: 可交易股数
+    """
+    star = np.array([c.startswith(("688", "689")) for c in stock_codes], dtype=bool)
+    whole = np.floor(np.maximum(shares, 0.0))
+    lots = np.floor(whole / BOARD_LOT) * BOARD_LOT
+    return np.where(star, np.where(whole >= STAR_MIN_SHARES, whole, 0.0), lots)
+
+
+class RebalanceSimulator:
+    """调仓模拟器：目标权重 → 委托 → 模拟成交"""
+
+    def __init__(
+        self,
+        commission_rate: Optional[float] = None,
+        min_commission: Optional[float] = None,
+        stamp_tax_rate: Optional[float] = None,
+        transfer_fee_rate: Optional[float] = None
+    ):
+        """
+        初始化模拟器（未指定的费率取配置）
+
+        Args:
+            commission_rate: 佣金费率
+            min_commission: 单笔最低佣金（元）
+            stamp_tax_rate: 印花税率（仅卖出）
+            transfer_fee_rate: 过户费率
+        """
+        self.commission_rate = settings.COMMISSION_RATE if commission_rate is None else commission_rate
+        self.min_commission = settings.MIN_COMMISSION if min_commission is None else min_commission
+        self.stamp_tax_rate = settings.STAMP_TAX_RATE if stamp_tax_rate is None else stamp_tax_rate
+        self.transfer_fee_rate = settings.TRANSFER_FEE_RATE if transfer_fee_rate is None else transfer_fee_rate
+
+    def trade_costs(self, amounts: np.ndarray, sell: bool) -> np.ndarray:
+        """
+        计算每笔成交的交易成本
+
+        Args:
+            amounts: 成交金额
+            sell: 是否卖出
+
+        Returns:
+            np.ndarray: 交易成本（元）
+        """
+        traded = amounts > 0
+        commission = np.where(traded, np.maximum(amounts * self.commission_rate, self.min_commission), 0.0)
+        stamp = amounts * self.stamp_tax_rate if sell else 0.0
+        return commission + stamp + amounts * self.transfer_fee_rate
+
+    def simulate(
+        self,
+        book: PositionBook,
+        cash: float,
+        targets: Dict[str, float],
+        prev_close: Optional[Dict[str, float]] = None,
+        covariance: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        模拟调仓
+
+        Args:
+            book: 当前持仓簿（按最新价估值）
+            cash: 当前现金
+            targets: 股票代码 → 目标权重（0-1，占总资产）；未给出的持仓保持当前权重
+            prev_close: 股票代码 → 前收盘价（用于涨跌停判断）
+            covariance: 与持仓簿顺序一致的日收益协方差矩阵（用于跟踪误差）
+
+        Returns:
+            Dict: 委托、受限委托、现金、权重偏离、交易成本、换手率和跟踪误差
+        """
+        codes = book.stock_codes
+        names = [name or code for code, name in zip(codes, book.stock_names)]
+        prices = book.current_prices
+        quantities = book.quantities
+        market_values = book.market_values
+        total_assets = float(market_values.sum() + cash)
+        warnings: List[str] = []
+
+        unknown = sorted(set(targets) - set(codes))
+        if unknown:
+            warnings.append(f"以下股票不在当前持仓中，无法模拟: {', '.join(unknown)}")
+
+        current_weights = market_values / total_assets if total_assets > 0 else np.zeros(len(codes))
+        target_weights = np.array([targets.get(c, w) for c, w in zip(codes, current_weights)], dtype=np.float64)
+        target_weights = np.clip(target_weights, 0.0, None)
+        if target_weights.sum() > 1:
+            warnings.append(f"目标仓位合计 {target_weights.sum() * 100:.1f}% 超过 100%，已等比缩放")
+            target_weights = target_weights / target_weights.sum()
+
+        priced = prices > 0
+        raw_shares = np.divide(
+            target_weights * total_assets - market_values,
+            prices,
+            out=np.zeros(len(codes)),
+            where=priced
+        )
+
+        prev = np.array([(prev_close or {}).get(c, np.nan) for c in codes], dtype=np.float64)
+        limit_up, limit_down = limit_flags(codes, names, prices, prev)
+
+        # 卖出：清仓允许零股；收于跌停不可卖出
+        want_sell = raw_shares < 0
+        sell_shares = np.where(want_sell, round_shares(codes, -raw_shares), 0.0)
+        clear = want_sell & ((target_weights <= 0) | (sell_shares >= quantities))
+        sell_shares = np.minimum(np.where(clear, quantities, sell_shares), quantities)
+        blocked_sell = (sell_shares > 0) & limit_down
+        sell_shares = np.where(blocked_sell, 0.0, sell_shares)
+
+        sell_amounts = sell_shares * prices
+        sell_costs = self.trade_costs(sell_amounts, sell=True)
+        available = cash + float(np.sum(sell_amounts - sell_costs))
+
+        # 买入：收于涨停不可买入；资金不足时按比例缩减后重新取整
+        want_buy = (raw_shares > 0) & priced
+        blocked_buy = want_buy & limit_up & (round_shares(codes, raw_shares) > 0)
+        buy_raw = np.where(want_buy & ~limit_up, raw_shares, 0.0)
+
+        scale = 1.0
+        for _ in range(MAX_SCALE_ITERATIONS):
+            buy_shares = round_shares(codes, buy_raw * scale)
+            buy_amounts = buy_shares * prices
+            buy_costs = self.trade_costs(buy_amounts, sell=False)
+            required = float(np.sum(buy_amounts + buy_costs))
+            if required <= available + 1e-6:
+                break
+            scale = scale * min(available / required, 0.995) if available > 0 else 0.0
+        else:
+            # 未能收敛：放弃全部买入
+            scale = 0.0
+            buy_shares = np.zeros(len(codes))
+            buy_amounts = np.zeros(len(codes))
+            buy_costs = np.zeros(len(codes))
+            required = 0.0
+        if scale < 1.0 and buy_raw.any():
+            if buy_shares.any():
+                warnings.append(f"可用资金不足，买入委托已按 {scale * 100:.1f}% 缩减")
+            else:
+                warnings.append("可用资金不足，全部买入委托已取消")
+
+        # 模拟结果
+        new_quantities = quantities - sell_shares + buy_shares
+        new_values = new_quantities * prices
+        cash_after = available - required
+        total_after = float(new_values.sum() + cash_after)
+        result_weights = new_values / total_after if total_after > 0 else np.zeros(len(codes))
+        deviation = result_weights - target_weights
+
+        tracking_error = None
+        if covariance is not None and covariance.shape == (len(codes), len(codes)):
+            tracking_error = float(np.sqrt(max(deviation @ covariance @ deviation, 0.0) * TRADING_DAYS) * 100)
+
+        orders = []
+        for i in np.flatnonzero((sell_shares > 0) | (buy_shares > 0) | blocked_sell | blocked_buy):
+            side = "sell" if want_sell[i] else "buy"
+            shares = sell_shares[i] if side == "sell" else buy_shares[i]
+            amount = sell_amounts[i] if side == "sell" else buy_amounts[i]
+            cost = sell_costs[i] if side == "sell" else buy_costs[i]
+            blocked = None
+            if blocked_sell[i]:
+                blocked = "跌停无法卖出"
+            elif blocked_buy[i]:
+                blocked = "涨停无法买入"
+            orders.append({
+                "stock_code": codes[i],
+                "stock_name": names[i],
+                "side": side,
+                "shares": int(shares),
+                "price": float(prices[i]),
+                "amount": float(amount),
+                "cost": float(cost),
+                "clear": bool(clear[i] and not blocked),
+                "blocked": blocked,
+            })
+
+        weights = [
+            {
+                "stock_code": codes[i],
+                "stock_name": names[i],
+                "current_pct": float(current_weights[i] * 100),
+                "target_pct": float(target_weights[i] * 100),
+                "result_pct": float(result_weights[i] * 100),
+                "deviation_pct": float(deviation[i] * 100),
+            }
+            for i in range(len(codes))
+        ]
+
+        total_cost = float(sell_costs.sum() + buy_costs.sum())
+        traded = float(sell_amounts.sum() + buy_amounts.sum())
+        return {
+            "orders": orders,
+            "weights": weights,
+            "cash_before": float(cash),
+            "cash_after": float(cash_after),
+            "cash_pct": float(cash_after / total_after * 100) if total_after > 0 else 0.0,
+            "target_cash_pct": float((1 - target_weights.sum()) * 100),
+            "total_assets_before": total_assets,
+            "total_assets_after": total_after,
+            "total_cost": total_cost,
+            "turnover_pct": float(traded / total_assets * 100) if total_assets > 0 else 0.0,
+            "max_deviation_pct": float(np.abs(deviation).max() * 100) if len(codes) else 0.0,
+            "tracking_error_pct": tracking_error,
+            "buy_scale": float(scale),
+            "blocked_count": int(blocked_sell.sum() + blocked_buy.sum()),
+            "warnings": warnings,
+        }
+
+
+def targets_from_action_plan(action_plan: Optional[List[Dict]]) -> Dict[str, float]:
+    """
+    从 LLM 的 action_plan 中提取目标权重
+
+    Args:
+        action_plan: 调仓建议列表
+
+    Returns:
+        Dict[str, float]: 股票代码 → 目标权重（0-1）
+    """
+    targets = {}
+    for item in action_plan or []:
+        code = item.get("stock_code")
+        pct = as_pct(item.get("target_position_pct"))
+        if code and pct is not None:
+            targets[code] = pct / 100
+    return targets
+
+
+def check_target_allocation(target_allocation: Optional[Dict], cash_pct: float) -> Dict:
+    """
+    检查 LLM 给出的目标仓位结构是否自洽、是否与模拟结果一致
+
+    Args:
+        target_allocation: analysis.target_allocation（各桶含 percent / label）
+        cash_pct: 模拟后的现金比例（%）
+
+    Returns:
+        Dict: 合计比例、目标 / 模拟现金比例和警告，无目标结构时返回空字典
+    """
+    if not target_allocation:
+        return {}
+
+    buckets = {k: as_pct(v.get("percent")) if isinstance(v, dict) else None
+               for k, v in target_allocation.items()}
+    total = sum(p for p in buckets.values() if p is not None)
+    target_cash = buckets.get("cash")
+
+    warnings = []
+    if abs(total - 100) > 1:
+        warnings.append(f"目标仓位结构合计 {total:.1f}%，不等于 100%")
+    if target_cash is not None and abs(target_cash - cash_pct) > ALLOCATION_TOLERANCE_PCT:
+        warnings.append(f"目标现金比例 {target_cash:.1f}% 与模拟结果 {cash_pct:.1f}% 相差较大")
+
+    return {
+        "total_pct": total,
+        "target_cash_pct": target_cash,
+        "result_cash_pct": cash_pct,
+        "consistent": not warnings,
+        "warnings": warnings,
+    }
+
+
+class RebalanceService:
+    """调仓模拟服务类：在持仓行情快照上运行模拟器"""
+
+    def __init__(self, simulator: Optional[RebalanceSimulator] = None):
+        """
+        初始化调仓模拟服务
+
+        Args:
+            simulator: 调仓模拟器（默认按配置费率创建）
+        """
+        self.simulator = simulator or RebalanceSimulator()
+
+    def simulate(self, snapshot, targets: Dict[str, float], target_allocation: Optional[Dict] = None) -> Dict:
+        """
+        在持仓行情快照上模拟调仓
+
+        Args:
+            snapshot: 持仓行情快照（HoldingsSnapshot）
+            targets: 股票代码 → 目标权重（0-1）
+            target_allocation: 目标仓位结构（可选，用于一致性检查）
+
+        Returns:
+            Dict: 模拟结果
+        """
+        book = snapshot.book
+        panel = snapshot.panel.select(book.stock_codes)
+        covariance = None
+        if panel.stock_codes == book.stock_codes and len(panel) > MIN_OBSERVATIONS:
+            covariance, _ = RiskService().covariance(panel)
+
+        result = self.simulator.simulate(
+            book,
+            snapshot.cash,
+            targets,
+            prev_close=snapshot.prev_close,
+            covariance=covariance
+        )
+        result["allocation_check"] = check_target_allocation(target_allocation, result["cash_pct"])
+
+        logger.info(f"   ✓ 调仓模拟: {len(result['orders'])} 笔委托, "
+                    f"成本 {result['total_cost']:.2f} 元, 最大偏离 {result['max_deviation_pct']:.2f}%")
+        return result
+
+    def simulate_analysis(self, snapshot, analysis: Dict) -> Dict:
+        """
+        按 LLM 分析结果中的 action_plan / target_allocation 模拟调仓
+
+        Args:
+            snapshot: 持仓行情快照（HoldingsSnapshot）
+            analysis: LLM 结构化分析结果
+
+        Returns:
+            Dict: 模拟结果，action_plan 中没有目标仓位时返回空字典
+        """
+        targets = targets_from_action_plan(analysis.get("action_plan"))
+        if not targets:
+            return {}
+        return self.simulate(snapshot, targets, analysis.get("target_allocation"))
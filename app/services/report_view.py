@@ -0,0 +1,207 @@
+"""
+Report View - 周报模板的视图模型
+
+模板里按持仓逐个扫描 stock_analysis 查找对应条目（持仓数 × 个股数次比较），并在循环中
+用多层 set/if 推导状态、角色和操作的 CSS 类。这里在 Python 中一次完成：
+持仓、个股分析、操作清单与年内归因按 stock_code 建字典关联，CSS 类和数字格式提前算好，
+模板只负责遍历输出。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+STATUS_CLASSES = ("positive", "negative", "warning", "neutral")
+
+ACTION_BADGES = {
+    "reduce": "badge-action badge-reduce",
+    "clear": "badge-action badge-clear",
+    "add": "badge-action badge-add",
+    "hold": "badge-action badge-hold",
+}
+
+DEFAULT_ROLE = "配置类"
+
+
+def _index(items: Optional[Iterable[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """按 stock_code 建索引（同一代码出现多次时取最后一条，与原模板的查找结果一致）"""
+    return {item.get("stock_code"): item for item in items or []}
+
+
+def _trend_class(value: float) -> str:
+    """涨跌颜色"""
+    return "text-up" if value >= 0 else "text-down"
+
+
+def status_class(analysis: Optional[Dict[str, Any]]) -> str:
+    """
+    个股状态对应的 CSS 类后缀
+
+    Args:
+        analysis: stock_analysis 条目，可为 None
+
+    Returns:
+        str: positive / negative / warning / neutral
+    """
+    value = (analysis or {}).get("status_class")
+    return value if value in STATUS_CLASSES else "neutral"
+
+
+def role_class(role: str) -> str:
+    """
+    持仓角色对应的 CSS 类
+
+    Args:
+        role: 持仓角色（如“核心仓位”“卫星仓位”）
+
+    Returns:
+        str: role-core / role-satellite / role-observe
+    """
+    if "核心" in role:
+        return "role-core"
+    if "卫星" in role:
+        return "role-satellite"
+    return "role-observe"
+
+
+def build_holding_rows(holdings: List[Dict[str, Any]], analyses: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    持仓盈亏表的行
+
+    Args:
+        holdings: 持仓列表
+        analyses: stock_code → stock_analysis 条目
+
+    Returns:
+        List[Dict]: 每行的显示字段
+    """
+    rows = []
+    for h in holdings or []:
+        analysis = analyses.get(h["stock_code"])
+        role = (analysis or {}).get("stock_role") or DEFAULT_ROLE
+        rows.append({
+            "stock_code": h["stock_code"],
+            "stock_name": h["stock_name"],
+            "current_price": "%.2f" % h["current_price"],
+            "cost_price": "%.2f" % h["cost_price"],
+            "market_value": "%.2f" % h["market_value"],
+            "position_ratio": "%.1f" % h["position_ratio"],
+            "profit_loss": "%+.2f" % h["profit_loss"],
+            "profit_loss_class": _trend_class(h["profit_loss"]),
+            "profit_loss_pct": "%+.2f" % h["profit_loss_pct"],
+            "arrow": "▲" if h["profit_loss_pct"] >= 0 else "▼",
+            "status_class": status_class(analysis),
+            "role": role,
+            "role_class": role_class(role),
+        })
+    return rows
+
+
+def build_stock_cards(analyses: List[Dict[str, Any]], holdings: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    个股分析卡片
+
+    Args:
+        analyses: stock_analysis 列表
+        holdings: stock_code → 持仓（模型未给出名称时用持仓名称补全）
+
+    Returns:
+        List[Dict]: 卡片字段，points 为非空的要点列表
+    """
+    cards = []
+    for s in analyses or []:
+        code = s.get("stock_code")
+        role = s.get("stock_role")
+        cards.append({
+            "stock_name": s.get("stock_name") or holdings.get(code, {}).get("stock_name", ""),
+            "subtitle": f"{code} · {role}" if role else code,
+            "status": s.get("status"),
+            "capsule_class": f"capsule-{status_class(s)}",
+            "suggestion": s.get("suggestion"),
+            "points": [s[key] for key in ("technical", "fundamental", "theme", "risk", "suggestion") if s.get(key)],
+        })
+    return cards
+
+
+def build_action_rows(actions: List[Dict[str, Any]], holdings: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    操作清单的行
+
+    Args:
+        actions: action_plan 列表
+        holdings: stock_code → 持仓（模型未给出名称时用持仓名称补全）
+
+    Returns:
+        List[Dict]: 每行的显示字段
+    """
+    rows = []
+    for a in actions or []:
+        code = a.get("stock_code")
+        rows.append({
+            "stock_code": code,
+            "stock_name": a.get("stock_name") or holdings.get(code, {}).get("stock_name", ""),
+            "action": a.get("action"),
+            "badge_class": ACTION_BADGES.get(a.get("action_class"), "badge-action"),
+            "price_range": a.get("price_range"),
+            "current_position_pct": "%.1f" % a["current_position_pct"],
+            "target_position_pct": "%.1f" % a["target_position_pct"],
+            "plan": a.get("plan"),
+            "reason": a.get("reason"),
+        })
+    return rows
+
+
+def build_attribution_rows(attribution: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    本周个股贡献表的行（关联年内贡献）
+
+    Args:
+        attribution: 业绩归因结果（week / ytd）
+
+    Returns:
+        List[Dict]: 每行的显示字段；没有本周归因时为空列表
+    """
+    attribution = attribution or {}
+    week = attribution.get("week") or {}
+    ytd = attribution.get("ytd")
+    ytd_contrib = {h["stock_code"]: h["contribution_pct"] for h in (ytd or {}).get("holdings", [])}
+
+    rows = []
+    for h in week.get("holdings", []):
+        row = {
+            "stock_code": h["stock_code"],
+            "stock_name": h["stock_name"],
+            "sector": h["sector"],
+            "start_weight_pct": "%.1f" % h["start_weight_pct"],
+            "return_pct": "%+.2f" % h["return_pct"],
+            "return_class": _trend_class(h["return_pct"]),
+            "contribution_pct": "%+.2f" % h["contribution_pct"],
+            "contribution_class": _trend_class(h["contribution_pct"]),
+        }
+        if ytd:
+            ytd_value = ytd_contrib.get(h["stock_code"], 0)
+            row["ytd_contribution_pct"] = "%+.2f" % ytd_value
+            row["ytd_contribution_class"] = _trend_class(ytd_value)
+        rows.append(row)
+    return rows
+
+
+def build_report_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    构建周报模板的视图模型
+
+    Args:
+        data: 周报渲染数据（report_data + analysis + rebalance）
+
+    Returns:
+        Dict: holdings / stock_cards / actions / attribution_holdings
+    """
+    analysis = data.get("analysis") or {}
+    holdings = data.get("holdings") or []
+    stock_analysis = analysis.get("stock_analysis") or []
+    holdings_by_code = _index(holdings)
+
+    return {
+        "holdings": build_holding_rows(holdings, _index(stock_analysis)),
+        "stock_cards": build_stock_cards(stock_analysis, holdings_by_code),
+        "actions": build_action_rows(analysis.get("action_plan") or [], holdings_by_code),
+        "attribution_holdings": build_attribution_rows(data.get("attribution")),
+    }
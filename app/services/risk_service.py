@@ -0,0 +1,327 @@
+"""Risk Analytics Service - 组合风险分析服务
+
+基于持仓日收益率面板，向量化计算：
+- Ledoit-Wolf 收缩协方差矩阵
+- 组合波动率、参数法 / 历史法 VaR 与 CVaR
+- 最大回撤、相对基准的 Beta
+- 集中度（HHI、有效持仓数、前 N 大权重）与风险贡献
+
+结果按交易日缓存，同一交易日内相同持仓结构只计算一次。
+"""
+
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.cache import TradingDayCache, fingerprint
+from app.core.logging import get_logger
+from app.services.market_panel import PricePanel
+
+logger = get_logger(__name__)
+
+# 年化交易日数
+TRADING_DAYS = 252
+
+# 风险计算所需的最少收益率样本数
+MIN_OBSERVATIONS = 20
+
+# 进程级缓存：按交易日分区
+_risk_cache = TradingDayCache(maxsize=256)
+
+
+def shrunk_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf 收缩协方差（收缩目标为等方差对角阵）
+
+    Args:
+        returns: 收益率矩阵，形状 (T, N)
+
+    Returns:
+        Tuple[np.ndarray, float]: (协方差矩阵, 收缩强度 0-1)
+    """
+    t, n = returns.shape
+    if t < 2 or n == 0:
+        return np.zeros((n, n)), 0.0
+
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / t
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+
+    delta = np.sum((sample - target) ** 2) / n
+    if delta <= 0:
+        return sample, 0.0
+
+    # Σ_t ||x_t x_t' - S||² = Σ_t |x_t|⁴ - T·||S||²
+    row_norms = np.sum(x ** 2, axis=1)
+    beta_bar = (np.sum(row_norms ** 2) - t * np.sum(sample ** 2)) / (t ** 2 * n)
+    shrinkage = float(np.clip(beta_bar / delta, 0.0, 1.0))
+
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def max_drawdown(nav: np.ndarray) -> float:
+    """
+    最大回撤（负数，如 -0.12 表示 12% 回撤）
+
+    Args:
+        nav: 净值序列
+
+    Returns:
+        float: 最大回撤
+    """
+    if nav.size == 0:
+        return 0.0
+    peak = np.maximum.accumulate(nav)
+    return float(np.min(nav / peak - 1))
+
+
+def historical_var_cvar(returns: np.ndarray, confidence: float) -> Tuple[float, float]:
+    """
+    历史模拟法 VaR / CVaR（以正数表示损失比例）
+
+    Args:
+        returns: 组合日收益率
+        confidence: 置信水平，如 0.95
+
+    Returns:
+        Tuple[float, float]: (VaR, CVaR)
+    """
+    if returns.size == 0:
+        return 0.0, 0.0
+    cutoff = np.quantile(returns, 1 - confidence)
+    tail = returns[returns <= cutoff]
+    cvar = -tail.mean() if tail.size else -cutoff
+    return float(-cutoff), float(cvar)
+
+
+def parametric_var_cvar(mean: float, std: float, confidence: float) -> Tuple[float, float]:
+    """
+    正态参数法 VaR / CVaR（以正数表示损失比例）
+
+    Args:
+        mean: 日收益率均值
+        std: 日收益率标准差
+        confidence: 置信水平
+
+    Returns:
+        Tuple[float, float]: (VaR, CVaR)
+    """
+    dist = NormalDist()
+    z = dist.inv_cdf(1 - confidence)
+    var = -(mean + z * std)
+    cvar = -(mean - std * dist.pdf(z) / (1 - confidence))
+    return float(var), float(cvar)
+
+
+def concentration(weights: np.ndarray) -> Dict[str, float]:
+    """
+    持仓集中度指标（全部基于持仓内部的相对权重，不含现金）
+
+    Args:
+        weights: 各持仓占总资产的权重
+
+    Returns:
+        Dict: hhi、effective_n、top1_pct、top3_pct（前几大持仓占持仓市值的比例）
+    """
+    invested = weights.sum()
+    if invested <= 0:
+        return {"hhi": 0.0, "effective_n": 0.0, "top1_pct": 0.0, "top3_pct": 0.0}
+
+    relative = weights / invested
+    hhi = float(np.sum(relative ** 2))
+    ordered = np.sort(relative)[::-1]
+    return {
+        "hhi": hhi,
+        "effective_n": 1 / hhi if hhi > 0 else 0.0,
+        "top1_pct": float(ordered[:1].sum() * 100),
+        "top3_pct": float(ordered[:3].sum() * 100),
+    }
+
+
+def risk_score(annual_vol: float, drawdown: float, hhi: float) -> Tuple[int, str]:
+    """
+    把波动率、回撤和集中度合成为 0-100 的风险评分
+
+    Args:
+        annual_vol: 年化波动率（0.25 表示 25%）
+        drawdown: 最大回撤（负数）
+        hhi: 持仓 HHI
+
+    Returns:
+        Tuple[int, str]: (评分, 等级描述)
+    """
+    score = (
+        min(annual_vol / 0.35, 1.0) * 60
+        + min(abs(drawdown) / 0.30, 1.0) * 20
+        + min(hhi, 1.0) * 20
+    )
+    score = int(round(score))
+    if score < 30:
+        level = "偏低"
+    elif score < 50:
+        level = "中等"
+    elif score < 70:
+        level = "中等偏高"
+    else:
+        level = "偏高"
+    return score, level
+
+
+class RiskService:
+    """组合风险分析服务类"""
+
+    def __init__(self, confidence: float = 0.95, cache: Optional[TradingDayCache] = None):
+        """
+        初始化风险服务
+
+        Args:
+            confidence: VaR / CVaR 置信水平
+            cache: 交易日缓存（默认使用进程级缓存）
+        """
+        self.confidence = confidence
+        self.cache = cache if cache is not None else _risk_cache
+
+    def assess(
+        self,
+        panel: PricePanel,
+        weights: Dict[str, float],
+        total_assets: float,
+        benchmark: Optional[pd.Series] = None,
+        portfolio_id: Optional[int] = None
+    ) -> Dict:
+        """
+        计算组合风险指标
+
+        Args:
+            panel: 持仓价格面板
+            weights: 股票代码 → 占总资产权重（0-1），现金部分视为零波动
+            total_assets: 总资产（用于把比例换算成金额）
+            benchmark: 基准指数收盘价序列（可选，用于 Beta）
+            portfolio_id: 组合ID（参与缓存键）
+
+        Returns:
+            Dict: 风险指标，数据不足时返回空字典
+        """
+        trading_day = panel.trading_day
+        if trading_day is None or len(panel) - 1 < MIN_OBSERVATIONS:
+            logger.warning(f"   ⚠️ 行情样本不足（{max(len(panel) - 1, 0)} 条），跳过风险计算")
+            return {}
+
+        key = fingerprint(
+            "risk",
+            portfolio_id,
+            panel.stock_codes,
+            panel.dates[0].date(),
+            {code: round(w, 6) for code, w in weights.items()},
+            round(total_assets, 2),
+            self.confidence,
+            benchmark is not None
+        )
+        cached = self.cache.get(trading_day, key)
+        if cached is not None:
+            logger.debug("   ✓ 风险指标命中缓存")
+            return cached
+
+        result = self._compute(panel, panel.weights_for(weights), total_assets, benchmark)
+        result["trading_day"] = trading_day.isoformat()
+        self.cache.set(trading_day, key, result)
+        return result
+
+    def covariance(self, panel: PricePanel) -> Tuple[np.ndarray, float]:
+        """
+        持仓日收益率的收缩协方差（按交易日缓存，风险、优化和调仓模拟共用）
+
+        Args:
+            panel: 持仓价格面板
+
+        Returns:
+            Tuple[np.ndarray, float]: (与面板列顺序一致的协方差矩阵, 收缩强度)
+        """
+        trading_day = panel.trading_day
+        if trading_day is None:
+            return shrunk_covariance(panel.returns())
+
+        # 面板区间（首尾交易日 + 长度）参与缓存键：同一交易日内不同回看窗口的面板不共用结果
+        key = fingerprint("covariance", panel.stock_codes, panel.dates[0].date(), trading_day, len(panel))
+        cached = self.cache.get(trading_day, key)
+        if cached is None:
+            cached = shrunk_covariance(panel.returns())
+            self.cache.set(trading_day, key, cached)
+        return cached
+
+    def _compute(
+        self,
+        panel: PricePanel,
+        w: np.ndarray,
+        total_assets: float,
+        benchmark: Optional[pd.Series]
+    ) -> Dict:
+        """执行向量化风险计算"""
+        returns = panel.returns()
+        cov, shrinkage = self.covariance(panel)
+
+        # 组合日收益率与波动
+        port_returns = returns @ w
+        daily_mean = float(port_returns.mean())
+        daily_vol = float(np.sqrt(max(w @ cov @ w, 0.0)))
+        annual_vol = daily_vol * np.sqrt(TRADING_DAYS)
+
+        param_var, param_cvar = parametric_var_cvar(daily_mean, daily_vol, self.confidence)
+        hist_var, hist_cvar = historical_var_cvar(port_returns, self.confidence)
+
+        nav = np.cumprod(1 + port_returns)
+        drawdown = max_drawdown(nav)
+
+        # 相对基准的 Beta
+        beta = None
+        benchmark_corr = None
+        if benchmark is not None and len(benchmark) > 0:
+            bench_returns = panel.aligned_returns(benchmark)
+            bench_var = float(np.var(bench_returns))
+            if bench_var > 0:
+                beta = float(np.cov(port_returns, bench_returns, bias=True)[0, 1] / bench_var)
+                benchmark_corr = float(np.corrcoef(port_returns, bench_returns)[0, 1])
+
+        # 风险贡献：w_i (Σw)_i / σ²
+        port_var = daily_vol ** 2
+        contributions = (w * (cov @ w)) / port_var if port_var > 0 else np.zeros_like(w)
+        order = np.argsort(-contributions)
+        risk_contributions = [
+            {
+                "stock_code": panel.stock_codes[i],
+                "weight_pct": float(w[i] * 100),
+                "risk_contribution_pct": float(contributions[i] * 100),
+            }
+            for i in order
+        ]
+
+        conc = concentration(w)
+        score, level = risk_score(annual_vol, drawdown, conc["hhi"])
+
+        logger.info(f"   ✓ 风险指标: 年化波动 {annual_vol * 100:.1f}%, "
+                    f"VaR({self.confidence:.0%}) {param_var * 100:.2f}%, "
+                    f"最大回撤 {drawdown * 100:.1f}%, 评分 {score}")
+
+        return {
+            "confidence": self.confidence,
+            "observations": int(returns.shape[0]),
+            "shrinkage": shrinkage,
+            "daily_volatility_pct": daily_vol * 100,
+            "annual_volatility_pct": annual_vol * 100,
+            "parametric_var_pct": param_var * 100,
+            "parametric_cvar_pct": param_cvar * 100,
+            "historical_var_pct": hist_var * 100,
+            "historical_cvar_pct": hist_cvar * 100,
+            "parametric_var_amount": param_var * total_assets,
+            "historical_var_amount": hist_var * total_assets,
+            "max_drawdown_pct": drawdown * 100,
+            "beta": beta,
+            "benchmark_correlation": benchmark_corr,
+            **conc,
+            "risk_contributions": risk_contributions,
+            "risk_score": score,
+            "risk_level": level,
+        }
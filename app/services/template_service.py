@@ -1,52 +1,234 @@
-"""Template Service - Jinja2 模板渲染服务"""
+"""
+Template Service - Jinja2 模板渲染服务
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape, TemplateNotFound
-from typing import Dict
+Environment 按模板目录在进程内共享：过滤器只注册一次，编译结果保存在 Environment 的模板缓存中，
+字节码写入 FileSystemBytecodeCache（进程重启后免去重新解析 1000+ 行的 weekly_report.html）。
+生产环境关闭 auto_reload（不再每次检查模板文件的修改时间），应用启动时预编译全部模板。
+
+周报按区块（KPI、持仓表、每张个股卡片、操作清单、风险、板块）分别渲染，每个区块以其输入的指纹为键
+缓存渲染结果：只改了一行 action_plan 或更新了价格时，输入未变的区块逐字节复用，只重新渲染受影响的部分。
+stream_weekly_report 基于 Template.stream() 边渲染边输出，供 StreamingResponse 使用；
+render_push_digest 渲染微信推送用的 Markdown 摘要（weekly_push.md）。
+"""
+
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape, TemplateNotFound
+from markupsafe import Markup
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 from pathlib import Path
 
+from app.core.cache import fingerprint
+from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.exceptions import TemplateRenderError
+from app.services.report_view import build_report_view
 
 logger = get_logger(__name__)
 
+_HTML_TAG = re.compile(r"<[^>]+>")
+_BOLD_TAG = re.compile(r"</?(?:strong|b)\b[^>]*>", re.IGNORECASE)
+
+# 模板目录 → 共享的 Environment
+_environments: Dict[str, Environment] = {}
+_env_lock = threading.Lock()
+
+
+def _register_filters(env: Environment):
+    """注册自定义过滤器"""
+    # 格式化金额
+    env.filters['format_price'] = lambda x: f"{x:,.2f}" if x is not None else "N/A"
+
+    # 格式化百分比
+    env.filters['format_percent'] = lambda x: f"{x:+.2f}%" if x is not None else "N/A"
+
+    # 格式化日期
+    env.filters['format_date'] = lambda x: x.strftime('%Y年%m月%d日') if x else ""
+
+    # 格式化数字（带符号）
+    env.filters['format_number'] = lambda x: f"{x:+,.2f}" if x is not None else "N/A"
+
+    # 判断涨跌
+    env.filters['is_positive'] = lambda x: x > 0 if x is not None else False
+    env.filters['is_negative'] = lambda x: x < 0 if x is not None else False
+
+    # LLM 输出中的 HTML 转为单行纯文本（推送摘要用，<strong>/<b> 转为 Markdown 加粗）
+    env.filters['plain_text'] = _plain_text
+
+
+def _plain_text(value: Any) -> str:
+    """去掉 HTML 标签与实体，合并空白"""
+    text = _HTML_TAG.sub("", _BOLD_TAG.sub("**", str(value or "")))
+    return " ".join(html.unescape(text).split())
+
+
+def _pick(mapping: Dict[str, Any], *keys: str) -> Dict[str, Any]:
+    """取出存在的键（缺失的键不传入区块模板，模板中的 default 过滤器照常生效）"""
+    return {key: mapping[key] for key in keys if key in mapping}
+
+
+# 周报区块 → 输入（templates/sections/<区块>.html 只能使用这里列出的变量）
+REPORT_SECTIONS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "kpis": lambda c: {
+        **_pick(c, "period", "report_date", "metrics", "attribution"),
+        "analysis": _pick(c["analysis"], "kpis"),
+    },
+    "overview": lambda c: {
+        "analysis": _pick(c["analysis"], "section_subtitles", "core_viewpoint", "holdings_analysis"),
+    },
+    "holdings": lambda c: {
+        **_pick(c, "attribution"),
+        "analysis": _pick(c["analysis"], "section_subtitles", "holdings_analysis"),
+        "view": _pick(c["view"], "holdings", "attribution_holdings"),
+    },
+    "actions": lambda c: {
+        **_pick(c, "rebalance"),
+        "analysis": _pick(c["analysis"], "section_subtitles", "target_allocation"),
+        "view": _pick(c["view"], "actions"),
+    },
+    "risk": lambda c: {
+        **_pick(c, "risk_metrics"),
+        "analysis": _pick(c["analysis"], "section_subtitles", "risk_assessment"),
+    },
+    "sector": lambda c: {
+        "analysis": _pick(c["analysis"], "section_subtitles", "sector_view"),
+    },
+}
+
+
+class SectionCache:
+    """区块渲染结果的 LRU 缓存（线程安全）"""
+
+    def __init__(self, maxsize: int = 256):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大缓存条目数，0 表示不缓存
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[Template, Markup]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, template: Template) -> Optional[Markup]:
+        """
+        读取缓存（模板被重新加载后旧的渲染结果视为失效）
+
+        Args:
+            key: 输入指纹
+            template: 当前的区块模板
+
+        Returns:
+            Markup: 渲染结果，不存在返回 None
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] is not template:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, template: Template, html: Markup):
+        """
+        写入缓存
+
+        Args:
+            key: 输入指纹
+            template: 区块模板
+            html: 渲染结果
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (template, html)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+section_cache = SectionCache(settings.TEMPLATE_SECTION_CACHE_SIZE)
+
+
+def get_template_environment(template_dir: str = "templates") -> Environment:
+    """
+    获取模板目录对应的共享 Environment（首次调用时创建）
+
+    Args:
+        template_dir: 模板目录路径
+
+    Returns:
+        Environment: Jinja2 环境
+    """
+    key = str(Path(template_dir).resolve())
+    env = _environments.get(key)
+    if env is not None:
+        return env
+
+    with _env_lock:
+        env = _environments.get(key)
+        if env is None:
+            auto_reload = settings.DEBUG if settings.TEMPLATE_AUTO_RELOAD is None else settings.TEMPLATE_AUTO_RELOAD
+            bytecode_cache = None
+            if settings.TEMPLATE_CACHE_DIR:
+                os.makedirs(settings.TEMPLATE_CACHE_DIR, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(settings.TEMPLATE_CACHE_DIR)
+            env = Environment(
+                loader=FileSystemLoader(key),
+                autoescape=select_autoescape(['html', 'xml']),
+                bytecode_cache=bytecode_cache,
+                auto_reload=auto_reload,
+            )
+            _register_filters(env)
+            _environments[key] = env
+            logger.info(f"✓ 模板环境初始化成功，模板目录: {template_dir}（auto_reload={auto_reload}）")
+    return env
+
+
+def precompile_templates(template_dir: str = "templates") -> int:
+    """
+    预编译目录下的全部 HTML / Markdown 模板（应用启动时调用）
+
+    Args:
+        template_dir: 模板目录路径
+
+    Returns:
+        int: 编译的模板数量
+    """
+    env = get_template_environment(template_dir)
+    names = env.list_templates(filter_func=lambda name: name.endswith((".html", ".md")))
+    for name in names:
+        env.get_template(name)
+    logger.info(f"✓ 已预编译 {len(names)} 个模板")
+    return len(names)
+
 
 class TemplateService:
     """模板渲染服务类"""
     
     def __init__(self, template_dir: str = "templates"):
         """
-        初始化模板服务
+        初始化模板服务（复用进程共享的 Environment，创建开销可忽略）
         
         Args:
             template_dir: 模板目录路径
         """
         self.template_dir = Path(template_dir)
-        self.env = Environment(
-            loader=FileSystemLoader(str(self.template_dir)),
-            autoescape=select_autoescape(['html', 'xml'])
-        )
-        self._register_filters()
-        logger.info(f"✓ 模板服务初始化成功，模板目录: {self.template_dir}")
-    
-    def _register_filters(self):
-        """注册自定义过滤器"""
-        # 格式化金额
-        self.env.filters['format_price'] = lambda x: f"{x:,.2f}" if x is not None else "N/A"
-        
-        # 格式化百分比
-        self.env.filters['format_percent'] = lambda x: f"{x:+.2f}%" if x is not None else "N/A"
-        
-        # 格式化日期
-        self.env.filters['format_date'] = lambda x: x.strftime('%Y年%m月%d日') if x else ""
-        
-        # 格式化数字（带符号）
-        self.env.filters['format_number'] = lambda x: f"{x:+,.2f}" if x is not None else "N/A"
-        
-        # 判断涨跌
-        self.env.filters['is_positive'] = lambda x: x > 0 if x is not None else False
-        self.env.filters['is_negative'] = lambda x: x < 0 if x is not None else False
-        
-        logger.info("✓ 自定义过滤器注册完成")
+        self.env = get_template_environment(template_dir)
     
     def render_weekly_report(self, data: Dict) -> str:
         """
@@ -70,10 +252,15 @@ class TemplateService:
             # 加载模板
             template = self.env.get_template(template_name)
             
-            # 渲染模板
-            html = template.render(**data)
+            # 渲染模板（关联与格式化在视图模型中完成，模板只负责遍历；各区块优先复用缓存）
+            context = {**data, "view": build_report_view(data)}
+            stats = {"rendered": 0, "reused": 0}
+            html = template.render(**context, section=self._section_renderer(context, stats))
             
-            logger.info(f"   ✓ HTML 渲染成功，长度: {len(html)} 字符")
+            logger.info(
+                f"   ✓ HTML 渲染成功，长度: {len(html)} 字符"
+                f"（区块复用 {stats['reused']}/{stats['reused'] + stats['rendered']}）"
+            )
             
             return html
         
@@ -84,6 +271,116 @@ class TemplateService:
             logger.error(f"   ✗ 渲染失败: {e}", exc_info=True)
             raise TemplateRenderError(template_name, str(e))
     
+    def render_push_digest(self, data: Dict) -> str:
+        """
+        渲染微信推送用的 Markdown 摘要
+
+        只保留核心观点、持仓、操作建议、个股结论与风险要点，不带样式表和图表，
+        体积约为完整 HTML 的十分之一；生成周报时与 HTML 一起渲染并保存，重新推送时直接复用。
+
+        Args:
+            data: 周报数据，同 render_weekly_report
+
+        Returns:
+            str: Markdown 文本
+
+        Raises:
+            TemplateRenderError: 模板渲染失败
+        """
+        template_name = 'weekly_push.md'
+        try:
+            template = self.env.get_template(template_name)
+            digest = template.render(**data, view=build_report_view(data))
+            logger.info(f"   ✓ 推送摘要渲染成功，长度: {len(digest)} 字符")
+            return digest
+        except TemplateNotFound:
+            logger.error(f"   ✗ 模板文件不存在: {template_name}")
+            raise TemplateRenderError(template_name, "模板文件不存在")
+        except Exception as e:
+            logger.error(f"   ✗ 推送摘要渲染失败: {e}", exc_info=True)
+            raise TemplateRenderError(template_name, str(e))
+
+    def stream_weekly_report(self, data: Dict, buffer_size: int = 4) -> Iterator[str]:
+        """
+        流式渲染周报 HTML（逐块产出，不在内存中拼接整页）
+
+        模板加载与视图模型构建在调用时完成，这一阶段的错误直接抛出；
+        迭代过程中的渲染错误记录日志后以 TemplateRenderError 抛出（此时响应已开始发送，只能中断）。
+
+        Args:
+            data: 周报数据，同 render_weekly_report
+            buffer_size: 每次产出合并的模板片段数（区块较大，默认值下每块约一到数个区块）
+
+        Returns:
+            Iterator[str]: HTML 片段
+
+        Raises:
+            TemplateRenderError: 模板不存在或视图模型构建失败
+        """
+        template_name = 'weekly_report.html'
+        try:
+            logger.info("🎨 开始流式渲染周报 HTML...")
+            template = self.env.get_template(template_name)
+            context = {**data, "view": build_report_view(data)}
+        except TemplateNotFound:
+            logger.error(f"   ✗ 模板文件不存在: {template_name}")
+            raise TemplateRenderError(template_name, "模板文件不存在")
+        except Exception as e:
+            logger.error(f"   ✗ 渲染失败: {e}", exc_info=True)
+            raise TemplateRenderError(template_name, str(e))
+
+        stats = {"rendered": 0, "reused": 0}
+        stream = template.stream(**context, section=self._section_renderer(context, stats))
+        if buffer_size > 1:
+            stream.enable_buffering(buffer_size)
+        return self._guard_stream(stream, template_name, stats)
+
+    @staticmethod
+    def _guard_stream(stream: Iterator[str], template_name: str, stats: Dict[str, int]) -> Iterator[str]:
+        """逐块转发渲染结果，统计长度并把渲染错误转换为 TemplateRenderError"""
+        length = 0
+        try:
+            for chunk in stream:
+                length += len(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"   ✗ 流式渲染中断（已输出 {length} 字符）: {e}", exc_info=True)
+            raise TemplateRenderError(template_name, str(e))
+        logger.info(
+            f"   ✓ HTML 流式渲染完成，长度: {length} 字符"
+            f"（区块复用 {stats['reused']}/{stats['reused'] + stats['rendered']}）"
+        )
+    
+    def _section_renderer(self, context: Dict[str, Any], stats: Dict[str, int]) -> Callable[..., Markup]:
+        """
+        创建模板中使用的 section() 函数
+
+        Args:
+            context: 周报渲染上下文（含视图模型）
+            stats: 渲染 / 复用计数，原地更新
+
+        Returns:
+            Callable: section(name, **inputs)，未给出 inputs 时按 REPORT_SECTIONS 从上下文中取
+        """
+        def section(name: str, **inputs: Any) -> Markup:
+            template_name = f"sections/{name}.html"
+            if not inputs:
+                inputs = REPORT_SECTIONS[name](context)
+            template = self.env.get_template(template_name)
+            key = fingerprint(template_name, inputs)
+
+            html = section_cache.get(key, template)
+            if html is not None:
+                stats["reused"] += 1
+                return html
+
+            html = Markup(template.render(**inputs))
+            section_cache.set(key, template, html)
+            stats["rendered"] += 1
+            return html
+
+        return section
+    
     def save_html(self, html: str, output_path: str) -> bool:
         """
         保存 HTML 到文件
@@ -152,6 +152,89 @@ class WindService:
             logger.error(f"✗ 获取行情数据异常: {stock_code} - {e}")
             return pd.DataFrame()
     
+    def get_stock_industries(self, stock_codes: List[str]) -> Dict[str, Optional[str]]:
+        """
+        批量获取申万一级行业
+        
+        Args:
+            stock_codes: 股票代码列表
+            
+        Returns:
+            Dict[str, Optional[str]]: 股票代码 → 行业名称（获取失败为 None）
+        """
+        if not stock_codes:
+            return {}
+        try:
+            res = w.wss(",".join(stock_codes), "industry_sw_2021", "industryType=1")
+            
+            if res.ErrorCode != 0:
+                error_msg = self._get_error_message(res.ErrorCode)
+                logger.warning(f"⚠️  获取行业分类失败: {error_msg}")
+                return {code: None for code in stock_codes}
+            
+            return {code: res.Data[0][i] or None for i, code in enumerate(res.Codes)}
+        except Exception as e:
+            logger.error(f"✗ 获取行业分类异常: {e}")
+            return {code: None for code in stock_codes}
+    
+    def get_period_returns(self, stock_codes: List[str], start_date: str, end_date: str) -> Dict[str, Optional[float]]:
+        """
+        批量获取区间涨跌幅（前复权）
+        
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 区间起始日（不含该日之前的收盘价作为基准）
+            end_date: 区间截止日
+            
+        Returns:
+            Dict[str, Optional[float]]: 股票代码 → 区间涨跌幅（%）
+        """
+        if not stock_codes:
+            return {}
+        try:
+            res = w.wss(
+                ",".join(stock_codes),
+                "pct_chg_per",
+                f"startDate={start_date};endDate={end_date};PriceAdj=F"
+            )
+            
+            if res.ErrorCode != 0:
+                error_msg = self._get_error_message(res.ErrorCode)
+                logger.warning(f"⚠️  获取区间涨跌幅失败: {error_msg}")
+                return {}
+            
+            return {code: res.Data[0][i] for i, code in enumerate(res.Codes)}
+        except Exception as e:
+            logger.error(f"✗ 获取区间涨跌幅异常: {e}")
+            return {}
+    
+    def get_index_constituents(self, index_code: str, trade_date: str) -> Dict[str, float]:
+        """
+        获取指数成分股及权重
+        
+        Args:
+            index_code: 指数代码（如 000300.SH）
+            trade_date: 日期
+            
+        Returns:
+            Dict[str, float]: 成分股代码 → 权重（%），获取失败返回空字典
+        """
+        try:
+            res = w.wset("indexconstituent", f"date={trade_date};windcode={index_code}")
+            
+            if res.ErrorCode != 0:
+                error_msg = self._get_error_message(res.ErrorCode)
+                logger.warning(f"⚠️  获取指数成分失败: {index_code} - {error_msg}")
+                return {}
+            
+            fields = [f.lower() for f in res.Fields]
+            codes = res.Data[fields.index("wind_code")]
+            weights = res.Data[fields.index("i_weight")]
+            return {code: float(weight) for code, weight in zip(codes, weights) if weight is not None}
+        except Exception as e:
+            logger.error(f"✗ 获取指数成分异常: {index_code} - {e}")
+            return {}
+    
     def get_latest_price(self, stock_code: str) -> Optional[float]:
         """
         获取股票最新价格
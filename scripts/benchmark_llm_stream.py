@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM 流式解析基准测试
+
+对比旧实现（逐块字符串拼接 + 标准库 json 逐行解码）与新实现
+（StreamBuffer 一次性拼接 + parse_sse_line，可用时走 orjson）处理同一段 SSE 流的耗时。
+
+使用方法：
+    python scripts/benchmark_llm_stream.py [--file recorded.sse] [--chars 50000] [--rounds 20]
+
+--file 指定录制的原始 SSE 流（每行一条 "data: {...}"）；不指定时合成一段
+约 --chars 字的流，每个增量约 4-12 字，接近真实模型的输出粒度。
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_stream import JSON_BACKEND, StreamBuffer, parse_sse_line
+
+
+def synthesize_stream(total_chars: int, seed: int = 7) -> list:
+    """合成一段 chat.completion.chunk 格式的 SSE 流（bytes 行列表）"""
+    rng = random.Random(seed)
+    alphabet = "组合本周收益回撤仓位建议板块风险估值景气度核心观点" + "abcdefghij0123456789{}[]:,\""
+    lines = []
+    produced = 0
+    while produced < total_chars:
+        size = rng.randint(4, 12)
+        content = "".join(rng.choice(alphabet) for _ in range(size))
+        event = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "model": "bench",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        }
+        lines.append(("data: " + json.dumps(event, ensure_ascii=False)).encode("utf-8"))
+        lines.append(b"")
+        produced += size
+    lines.append(b"data: [DONE]")
+    return lines
+
+
+def load_stream(path: str) -> list:
+    """读取录制的 SSE 流"""
+    with open(path, "rb") as f:
+        return f.read().splitlines()
+
+
+def baseline(lines: list) -> str:
+    """旧实现：decode + json.loads + 字符串累加"""
+    full_content = ""
+    for line in lines:
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if not line.startswith("data: "):
+            continue
+        data_str = line[6:]
+        if data_str.strip() == "[DONE]":
+            break
+        try:
+            data = json.loads(data_str)
+        except json.JSONDecodeError:
+            continue
+        content = data.get("choices", [{}])[0].get("delta", {}).get("content", "")
+        if content:
+            full_content += content
+            _ = len(full_content)
+    return full_content
+
+
+def optimized(lines: list) -> str:
+    """新实现：parse_sse_line + StreamBuffer"""
+    buffer = StreamBuffer()
+    for line in lines:
+        if not line:
+            continue
+        content = parse_sse_line(line)
+        if content is None:
+            break
+        if content:
+            buffer.append(content)
+            _ = len(buffer)
+    return buffer.getvalue()
+
+
+def timeit(func, lines: list, rounds: int) -> float:
+    """返回多轮中的最短耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(lines)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM 流式解析基准测试')
+    parser.add_argument('--file', help='录制的 SSE 流文件')
+    parser.add_argument('--chars', type=int, default=50000, help='合成流的输出字数')
+    parser.add_argument('--rounds', type=int, default=20, help='重复轮数（取最短耗时）')
+    args = parser.parse_args()
+
+    lines = load_stream(args.file) if args.file else synthesize_stream(args.chars)
+    assert baseline(lines) == optimized(lines), "两种实现的输出不一致"
+
+    events = sum(1 for line in lines if line)
+    old_ms = timeit(baseline, lines, args.rounds)
+    new_ms = timeit(optimized, lines, args.rounds)
+
+    print(f"SSE 事件数: {events}, 输出字数: {len(optimized(lines))}, JSON 后端: {JSON_BACKEND}")
+    print(f"旧实现: {old_ms:8.2f} ms")
+    print(f"新实现: {new_ms:8.2f} ms  (加速 {old_ms / new_ms:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+本地 Mock LLM 服务（OpenAI 兼容的流式 chat completions）
+
+不依赖外部 Gemini 代理即可跑通 LLMService 与完整周报流程，用于压测和基准测试：
+回放录制的输出（默认 test_llm_output.json），可配置分块大小、输出速率、首 token 延迟与错误注入，
+固定 --seed 时结果可复现。
+
+- .json 文件：作为分析结果 JSON 按 --chunk-chars 切块输出；个股并行模式下按提示词中的股票代码
+  返回对应的 stock_analysis 条目，组合层面请求省略 stock_analysis
+- .sse 文件：逐行原样回放录制的 SSE 流（只按 --tokens-per-sec 控制节奏）
+
+使用方法：
+    python scripts/mock_llm_server.py [--file test_llm_output.json] [--port 8800]
+        [--chunk-chars 8] [--tokens-per-sec 200] [--ttft 1.5] [--jitter 0.2]
+        [--error-rate 0.1] [--error-status 503] [--truncate-rate 0.05] [--malformed-rate 0.05] [--seed 7]
+
+    然后设置 LLM_API_URL=http://127.0.0.1:8800/v1/chat/completions 运行 run_weekly_report.py 或启动 API。
+    GET /stats 返回请求、注入错误与输出 token 的计数。
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.prompt_encoder import estimate_tokens
+
+# 识别个股并行模式的两类请求（与 LLMService 的提示词保持一致）
+STOCK_PROMPT_MARKER = "单只持仓"
+PORTFOLIO_ONLY_MARKER = "省略 `stock_analysis` 字段"
+
+
+class MockConfig:
+    """Mock 服务配置"""
+
+    def __init__(
+        self,
+        file: str = "test_llm_output.json",
+        chunk_chars: int = 8,
+        tokens_per_sec: float = 0.0,
+        ttft: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        truncate_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            file: 录制的输出（.json 分析结果 / .sse 原始流）
+            chunk_chars: 每个增量的字数
+            tokens_per_sec: 输出速率（token/秒），<= 0 表示不限速
+            ttft: 首 token 延迟（秒）
+            jitter: 延迟的随机抖动比例（0.2 表示 ±20%）
+            error_rate: 直接返回 HTTP 错误的概率
+            error_status: 注入错误的状态码
+            truncate_rate: 输出到一半断流（不发送 [DONE]）的概率
+            malformed_rate: 在输出中间插入损坏片段的概率
+            seed: 随机种子
+        """
+        self.file = file
+        self.chunk_chars = max(1, chunk_chars)
+        self.tokens_per_sec = tokens_per_sec
+        self.ttft = ttft
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.truncate_rate = truncate_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    """
+    读取录制的输出
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        Dict: {"report": 分析结果} 或 {"lines": SSE 行列表}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return {"report": json.load(f)}
+        return {"lines": f.read().splitlines()}
+
+
+def select_response(report: Dict[str, Any], system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    """
+    按请求类型选择要回放的 JSON
+
+    Args:
+        report: 录制的完整分析结果
+        system_prompt: 系统提示词
+        user_prompt: 用户提示词
+
+    Returns:
+        Dict: 完整周报 / 单只个股条目 / 省略 stock_analysis 的组合层面结果
+    """
+    if STOCK_PROMPT_MARKER in system_prompt:
+        items = report.get("stock_analysis") or [{}]
+        for item in items:
+            if item.get("stock_code") and item["stock_code"] in user_prompt:
+                return item
+        return items[0]
+    if PORTFOLIO_ONLY_MARKER in system_prompt:
+        return {k: v for k, v in report.items() if k != "stock_analysis"}
+    return report
+
+
+def _chunk_event(content: str, model: str) -> str:
+    event = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+    return "data: " + json.dumps(event, ensure_ascii=False) + "\n\n"
+
+
+def _usage_event(prompt_tokens: int, completion_tokens: int, model: str) -> str:
+    event = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+    return "data: " + json.dumps(event, ensure_ascii=False) + "\n\n"
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """
+    创建 Mock 服务
+
+    Args:
+        config: 服务配置
+
+    Returns:
+        FastAPI: 应用
+    """
+    app = FastAPI(title="Mock LLM Server")
+    recording = load_recording(config.file)
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "errors": 0, "truncated": 0, "malformed": 0, "completion_tokens": 0}
+
+    def jittered(seconds: float) -> float:
+        if seconds <= 0 or config.jitter <= 0:
+            return max(0.0, seconds)
+        return seconds * (1 + rng.uniform(-config.jitter, config.jitter))
+
+    async def paced(pieces: List[str]) -> AsyncIterator[str]:
+        """按首 token 延迟 + 输出速率的时间表逐块输出"""
+        started = time.perf_counter()
+        ttft = jittered(config.ttft)
+        tokens = 0
+        for piece in pieces:
+            due = started + ttft
+            if config.tokens_per_sec > 0:
+                due += tokens / config.tokens_per_sec
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tokens += estimate_tokens(piece)
+            yield piece
+
+    async def stream(payload: Dict[str, Any]) -> AsyncIterator[str]:
+        model = payload.get("model", "mock")
+        messages = payload.get("messages") or []
+        system_prompt = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user_prompt = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+        truncate = rng.random() < config.truncate_rate
+        malformed = rng.random() < config.malformed_rate
+
+        if "lines" in recording:
+            lines = [line + "\n" for line in recording["lines"]]
+            if truncate:
+                stats["truncated"] += 1
+                lines = lines[:len(lines) // 2]
+            async for line in paced(lines):
+                yield line
+            return
+
+        content = json.dumps(
+            select_response(recording["report"], system_prompt, user_prompt), ensure_ascii=False, indent=2
+        )
+        pieces = [content[i:i + config.chunk_chars] for i in range(0, len(content), config.chunk_chars)]
+        if malformed:
+            stats["malformed"] += 1
+            pieces.insert(len(pieces) // 2, '"}, ,{')
+        if truncate:
+            stats["truncated"] += 1
+            pieces = pieces[:len(pieces) // 2]
+
+        completion_tokens = 0
+        async for piece in paced(pieces):
+            completion_tokens += estimate_tokens(piece)
+            yield _chunk_event(piece, model)
+        stats["completion_tokens"] += completion_tokens
+        if truncate:
+            return
+
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield _usage_event(estimate_tokens(system_prompt + user_prompt), completion_tokens, model)
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        payload = await request.json()
+        if rng.random() < config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(jittered(config.ttft) / 2)
+            return JSONResponse(
+                {"error": {"message": "injected error", "type": "mock_error"}}, status_code=config.error_status
+            )
+        return StreamingResponse(stream(payload), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Mock LLM 服务（回放录制的流式输出）')
+    parser.add_argument('--file', default='test_llm_output.json', help='录制的输出（.json 分析结果 / .sse 原始流）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8800, help='监听端口')
+    parser.add_argument('--chunk-chars', type=int, default=8, help='每个增量的字数')
+    parser.add_argument('--tokens-per-sec', type=float, default=200.0, help='输出速率，<= 0 不限速')
+    parser.add_argument('--ttft', type=float, default=1.5, help='首 token 延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟抖动比例')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 HTTP 错误的概率')
+    parser.add_argument('--error-status', type=int, default=503, help='注入错误的状态码')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='中途断流的概率')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='输出损坏片段的概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（固定后结果可复现）')
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(
+        file=args.file,
+        chunk_chars=args.chunk_chars,
+        tokens_per_sec=args.tokens_per_sec,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        truncate_rate=args.truncate_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    print(f"Mock LLM 服务: http://{args.host}:{args.port}/v1/chat/completions （回放 {args.file}）")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
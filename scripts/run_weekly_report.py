@@ -11,12 +11,14 @@
 5. 推送到微信
 
 使用方法：
-    python scripts/run_weekly_report.py [--skip-push] [--portfolio-id 1]
+    python scripts/run_weekly_report.py [--skip-push] [--portfolio-id 1] [--no-cache] [--fanout]
 
 输出文件：
     output/report_data.json     - 原始数据
     output/llm_analysis.json    - LLM 分析结果
+    output/llm_metrics.json     - LLM 用量与延迟指标
     output/weekly_report.html   - 渲染后的 HTML 报告
+    output/weekly_push.md       - 微信推送摘要（Markdown）
 """
 
 import sys
@@ -35,9 +37,11 @@ os.environ['NO_PROXY'] = '*'
 from app.core.database import SessionLocal
 from app.core.config import settings
 from app.services.data_service import DataService
+from app.services.llm_metrics import LLMUsage
 from app.services.llm_service import LLMService
 from app.services.template_service import TemplateService
 from app.services.notification_service import NotificationService
+from app.services.rebalance_service import RebalanceService
 
 import logging
 
@@ -119,7 +123,7 @@ def step1_get_data(db, portfolio_id):
     return report_data, data_service
 
 
-def step2_llm_analysis(report_data):
+def step2_llm_analysis(report_data, use_cache=True, fanout=None):
     """步骤 2: LLM 分析"""
     logger.info("\n" + "=" * 60)
     logger.info("🤖 步骤 2/5: LLM 智能分析")
@@ -136,7 +140,9 @@ def step2_llm_analysis(report_data):
     )
     
     logger.info(f"\n   正在调用 LLM...")
-    analysis = llm_service.generate_weekly_analysis(report_data)
+    usage = LLMUsage()
+    analysis = llm_service.generate_weekly_analysis(report_data, use_cache=use_cache, fanout=fanout, usage=usage)
+    save_json(usage.to_dict(), 'llm_metrics.json')
     
     if not analysis:
         logger.error("✗ LLM 分析失败")
@@ -152,15 +158,23 @@ def step2_llm_analysis(report_data):
     return analysis
 
 
-def step3_merge_data(report_data, analysis):
+def step3_merge_data(report_data, analysis, data_service, portfolio_id):
     """步骤 3: 合并数据"""
     logger.info("\n" + "=" * 60)
     logger.info("📦 步骤 3/5: 合并数据")
     logger.info("=" * 60)
     
+    rebalance = {}
+    try:
+        snapshot = data_service.get_holdings_snapshot(portfolio_id)
+        rebalance = RebalanceService().simulate_analysis(snapshot, analysis)
+    except Exception as e:
+        logger.warning(f"   ⚠️ 调仓模拟失败: {e}")
+    
     complete_data = {
         **report_data,
-        'analysis': analysis
+        'analysis': analysis,
+        'rebalance': rebalance
     }
     
     logger.info("   ✓ 数据合并完成")
@@ -179,16 +193,20 @@ def step4_render_html(complete_data):
     
     if not html:
         logger.error("✗ HTML 渲染失败")
-        return None
+        return None, None
     
     logger.info(f"   ✓ HTML 渲染完成，长度: {len(html):,} 字符")
     
     save_html(html, 'weekly_report.html')
     
-    return html
+    push_content = template_service.render_push_digest(complete_data)
+    logger.info(f"   ✓ 推送摘要渲染完成，长度: {len(push_content):,} 字符")
+    save_html(push_content, 'weekly_push.md')
+    
+    return html, push_content
 
 
-def step5_push_wechat(html, skip_push=False):
+def step5_push_wechat(html, push_content=None, skip_push=False):
     """步骤 5: 推送到微信"""
     logger.info("\n" + "=" * 60)
     logger.info("📱 步骤 5/5: 推送到微信")
@@ -205,7 +223,8 @@ def step5_push_wechat(html, skip_push=False):
     notification_service = NotificationService(settings.SERVERCHAN_KEY)
     pushed = notification_service.send_weekly_report(
         html_content=html,
-        report_date=datetime.now()
+        report_date=datetime.now(),
+        push_content=push_content
     )
     
     if pushed:
@@ -222,6 +241,8 @@ def main():
     parser = argparse.ArgumentParser(description='生成并推送周报')
     parser.add_argument('--skip-push', action='store_true', help='跳过微信推送')
     parser.add_argument('--portfolio-id', type=int, default=1, help='持仓组合ID')
+    parser.add_argument('--no-cache', action='store_true', help='忽略 LLM 响应缓存，强制重新生成')
+    parser.add_argument('--fanout', action='store_true', default=None, help='按个股并行生成分析')
     args = parser.parse_args()
     
     logger.info("\n" + "=" * 60)
@@ -245,20 +266,20 @@ def main():
             return False
         
         # 步骤 2: LLM 分析
-        analysis = step2_llm_analysis(report_data)
+        analysis = step2_llm_analysis(report_data, use_cache=not args.no_cache, fanout=args.fanout)
         if not analysis:
             return False
         
         # 步骤 3: 合并数据
-        complete_data = step3_merge_data(report_data, analysis)
+        complete_data = step3_merge_data(report_data, analysis, data_service, args.portfolio_id)
         
         # 步骤 4: 渲染 HTML
-        html = step4_render_html(complete_data)
+        html, push_content = step4_render_html(complete_data)
         if not html:
             return False
         
         # 步骤 5: 推送到微信
-        pushed = step5_push_wechat(html, args.skip_push)
+        pushed = step5_push_wechat(html, push_content, args.skip_push)
         
         # 完成
         elapsed = (datetime.now() - start_time).total_seconds()
@@ -272,6 +293,7 @@ def main():
         logger.info(f"   - output/report_data.json")
         logger.info(f"   - output/llm_analysis.json")
         logger.info(f"   - output/weekly_report.html")
+        logger.info(f"   - output/weekly_push.md")
         logger.info("=" * 60 + "\n")
         
         return True
@@ -0,0 +1,101 @@
+"""Test performance attribution"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.cache import TradingDayCache
+from app.services.attribution_service import AttributionService, brinson_fachler
+from app.services.market_panel import PricePanel
+from app.services.position_book import PositionBook
+
+
+class FakeWind:
+    """固定行业与基准成分的 Wind 替身"""
+
+    def get_stock_industries(self, stock_codes):
+        industries = {"600519.SH": "食品饮料", "000858.SZ": "食品饮料", "300750.SZ": "电力设备",
+                      "601318.SH": "非银金融"}
+        return {c: industries.get(c) for c in stock_codes}
+
+    def get_index_constituents(self, index_code, trade_date):
+        return {"600519.SH": 30.0, "300750.SZ": 30.0, "601318.SH": 40.0}
+
+    def get_period_returns(self, stock_codes, start_date, end_date):
+        return {"600519.SH": 2.0, "300750.SZ": -1.0, "601318.SH": 1.0}
+
+
+def _setup():
+    dates = pd.bdate_range("2024-12-02", "2025-02-28")
+    rng = np.random.default_rng(11)
+    closes = 50 * np.cumprod(1 + rng.normal(0.001, 0.02, size=(len(dates), 3)), axis=0)
+    codes = ["600519.SH", "000858.SZ", "300750.SZ"]
+    panel = PricePanel(codes, dates, closes)
+    book = PositionBook(codes, [100, 200, 300], [40.0, 40.0, 40.0], closes[-1], ["茅台", "五粮液", "宁德"])
+    benchmark = pd.Series(3500 * np.cumprod(1 + rng.normal(0, 0.01, len(dates))), index=dates)
+    return panel, book, benchmark
+
+
+def test_brinson_effects_sum_to_excess():
+    """Test allocation + selection equals excess return"""
+    portfolio = {"A": (0.6, 0.05), "B": (0.3, -0.02), "现金": (0.1, 0.0)}
+    benchmark = {"A": (0.5, 0.03), "C": (0.5, 0.01)}
+    rb = 0.5 * 0.03 + 0.5 * 0.01
+    rp = 0.6 * 0.05 + 0.3 * -0.02
+    rows = brinson_fachler(portfolio, benchmark, rb)
+    total = sum(r["allocation"] + r["selection"] for r in rows)
+    assert total == pytest.approx(rp - rb)
+
+
+def test_analyze_with_constituents():
+    """Test holding contributions and sector attribution are consistent"""
+    panel, book, benchmark = _setup()
+    service = AttributionService(FakeWind(), cache=TradingDayCache())
+    result = service.analyze(panel, book, cash=10000.0, benchmark=benchmark,
+                             report_date=date(2025, 2, 28), benchmark_code="000300.SH")
+
+    for key in ("week", "ytd"):
+        period = result[key]
+        contributions = sum(h["contribution_pct"] for h in period["holdings"])
+        assert contributions == pytest.approx(period["portfolio_return_pct"])
+        assert period["allocation_pct"] + period["selection_pct"] == pytest.approx(period["excess_return_pct"])
+        assert period["benchmark_source"] == "constituents"
+
+    assert result["week"]["start"] == "2025-02-21"
+    assert result["ytd"]["start"] == "2024-12-31"
+    assert not result["ytd"]["truncated"]
+    sectors = {r["sector"] for r in result["week"]["sectors"]}
+    assert {"食品饮料", "电力设备", "现金"} <= sectors
+
+
+def test_analyze_index_fallback():
+    """Test attribution falls back to the index return without constituent data"""
+    panel, book, benchmark = _setup()
+    result = AttributionService(cache=TradingDayCache()).analyze(
+        panel, book, cash=0.0, benchmark=benchmark, report_date=date(2025, 2, 28)
+    )
+    week = result["week"]
+    assert week["benchmark_source"] == "index"
+    assert week["benchmark_return_pct"] == pytest.approx(week["index_return_pct"])
+    assert week["allocation_pct"] == pytest.approx(0.0)
+    assert week["selection_pct"] == pytest.approx(week["excess_return_pct"])
+
+
+def test_holding_listed_inside_period_is_not_a_gain():
+    """Test a holding first priced after the base day does not count its whole value as return"""
+    dates = pd.bdate_range("2024-12-02", "2025-02-28")
+    closes = np.full((len(dates), 2), 10.0)
+    closes[dates < pd.Timestamp("2025-01-27"), 1] = np.nan
+    codes = ["600519.SH", "300750.SZ"]
+    panel = PricePanel(codes, dates, closes)
+    book = PositionBook(codes, [100, 100], [10.0, 10.0], closes[-1], ["茅台", "宁德"])
+    result = AttributionService(cache=TradingDayCache()).analyze(
+        panel, book, cash=0.0, benchmark=None, report_date=date(2025, 2, 28)
+    )
+
+    ytd = result["ytd"]
+    assert ytd["portfolio_return_pct"] == pytest.approx(0.0)
+    assert sum(h["contribution_pct"] for h in ytd["holdings"]) == pytest.approx(0.0)
+    assert ytd["allocation_pct"] + ytd["selection_pct"] == pytest.approx(ytd["excess_return_pct"])
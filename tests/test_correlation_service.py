@@ -0,0 +1,37 @@
+"""Test holdings correlation clustering"""
+
+import numpy as np
+import pandas as pd
+
+from app.core.cache import TradingDayCache
+from app.services.correlation_service import CorrelationService
+from app.services.market_panel import PricePanel
+
+
+def test_correlated_holdings_cluster_together():
+    """Test two names driven by the same factor end up in one cluster"""
+    rng = np.random.default_rng(1)
+    factor = rng.normal(0, 0.02, (80, 1))
+    rets = np.hstack([
+        factor + rng.normal(0, 0.004, (80, 1)),
+        factor + rng.normal(0, 0.004, (80, 1)),
+        rng.normal(0, 0.02, (80, 2)),
+    ])
+    closes = 10 * np.cumprod(1 + rets, axis=0)
+    codes = ["600519.SH", "000858.SZ", "000651.SZ", "600887.SH"]
+    panel = PricePanel(codes, pd.bdate_range("2025-01-01", periods=80), closes)
+
+    service = CorrelationService(cache=TradingDayCache())
+    weights = {"600519.SH": 0.3, "000858.SZ": 0.2, "000651.SZ": 0.1, "600887.SH": 0.1}
+    result = service.analyze(panel, weights, portfolio_id=1)
+
+    assert result["clusters"][0]["stock_codes"] == ["600519.SH", "000858.SZ"]
+    assert abs(result["clusters"][0]["weight_pct"] - 50.0) < 1e-9
+    assert result["high_correlation_pairs"][0]["pair"] == ["600519.SH", "000858.SZ"]
+    assert set(result["order"]) == set(codes)
+
+    # 看板接口读取同一份缓存，簇的合计仓位按读取时的权重计算
+    assert service.get_cached(panel, weights, portfolio_id=1) == result
+    reweighted = service.analyze(panel, {**weights, "600519.SH": 0.1}, portfolio_id=1)
+    assert abs(reweighted["clusters"][0]["weight_pct"] - 30.0) < 1e-9
+    assert abs(result["clusters"][0]["weight_pct"] - 50.0) < 1e-9
@@ -0,0 +1,100 @@
+"""Test LLM response cache"""
+
+from app.services import llm_cache
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_policy import ModelPolicy
+from app.services.llm_service import LLMService
+
+
+def valid_report(core_viewpoint: str) -> dict:
+    """通过结构校验的最小周报结果"""
+    return {
+        "core_viewpoint": core_viewpoint,
+        "kpis": {"weekly_return": 1.0, "benchmark_return": 0.5, "ytd_return": 3.0,
+                 "position_ratio": 80.0, "action_count": 0},
+        "holdings_analysis": {"summary": "s", "highlights": []},
+        "stock_analysis": [],
+        "action_plan": [],
+        "risk_assessment": {"level": "中", "level_score": 50.0, "current_risks": [], "optimization_suggestions": []},
+        "sector_view": {"summary": "s"},
+        "target_allocation": {},
+    }
+
+
+class CountingLLMService(LLMService):
+    """记录 API 调用次数的 LLM 服务"""
+
+    calls = 0
+    valid = True
+
+    def _call_api(self, system_prompt, user_prompt, max_retries=3, stream_callback=None, field_callback=None,
+                  max_tokens=50000, metrics=None, model=None, deadline=None):
+        self.calls += 1
+        response = valid_report(f"core_viewpoint-{self.calls}")
+        if not self.valid:
+            response["kpis"] = "n/a"
+        return response
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    """Test expired entries miss and the least recently used entry is evicted"""
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMResponseCache(":memory:", ttl_hours=1, max_entries=2)
+
+    cache.set("a", "m", {"v": 1})
+    cache.set("b", "m", {"v": 2})
+    now[0] += 10
+    assert cache.get("a") == {"v": 1}  # a 变为最近访问
+    cache.set("c", "m", {"v": 3})
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    now[0] += 3601
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+def test_service_uses_cache_and_bypass(monkeypatch):
+    """Test repeat generations hit the cache unless bypassed"""
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_SECTION_REPAIR", False)
+    service = CountingLLMService("http://llm", "key", "model", cache=LLMResponseCache(":memory:"))
+    report_data = {"holdings": []}
+
+    first = service.generate_weekly_analysis(report_data)
+    second = service.generate_weekly_analysis(report_data)
+    assert service.calls == 1
+    assert second == first
+
+    third = service.generate_weekly_analysis(report_data, use_cache=False)
+    assert service.calls == 2
+    assert third["core_viewpoint"] == "core_viewpoint-2"
+    assert service.generate_weekly_analysis(report_data) == third
+
+
+def test_invalid_results_are_not_cached(monkeypatch):
+    """Test a result that still fails validation is regenerated instead of replayed from the cache"""
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_SECTION_REPAIR", False)
+    service = CountingLLMService("http://llm", "key", "model", cache=LLMResponseCache(":memory:"))
+    service.valid = False
+
+    service.generate_weekly_analysis({"holdings": []})
+    service.generate_weekly_analysis({"holdings": []})
+    assert service.calls == 2
+
+
+def test_fallback_results_are_not_cached(monkeypatch):
+    """Test a result produced by a fallback model is not stored under the primary model's key"""
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_SECTION_REPAIR", False)
+
+    class FallbackLLMService(CountingLLMService):
+        def _call_api(self, system_prompt, user_prompt, model=None, **kwargs):
+            if model == "model":
+                raise ValueError("primary down")
+            return super()._call_api(system_prompt, user_prompt, model=model, **kwargs)
+
+    service = FallbackLLMService("http://llm", "key", "model", cache=LLMResponseCache(":memory:"),
+                                 policy=ModelPolicy(["model", "fast"]))
+    service.generate_weekly_analysis({"holdings": []})
+    service.generate_weekly_analysis({"holdings": []})
+    assert service.calls == 2
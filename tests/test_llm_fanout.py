@@ -0,0 +1,51 @@
+"""Test per-stock fan-out generation"""
+
+import asyncio
+
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_service import REPORT_FIELDS, LLMService
+
+
+class FakeFanoutService(LLMService):
+    """按提示词内容返回个股或组合结果的 LLM 服务"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.max_active = 0
+        self.portfolio_prompts = []
+
+    async def _call_api_async(self, system_prompt, user_prompt, max_retries=3, stream_callback=None,
+                              field_callback=None, max_tokens=50000, metrics=None, model=None):
+        if "【个股分析结论】" in user_prompt:
+            self.portfolio_prompts.append(user_prompt)
+            return {f: f for f in REPORT_FIELDS if f != "stock_analysis"}
+
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if "000002.SZ" in user_prompt:
+            raise ValueError("broken output")
+        return {"stock_code": "?", "status": "多头趋势", "status_class": "positive",
+                "technical": "t", "suggestion": "<strong>继续持有</strong>"}
+
+
+def test_fanout_merges_stock_items(monkeypatch):
+    """Test stock items keep holding order, failures degrade to placeholders"""
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_FANOUT_CONCURRENCY", 2)
+    codes = ["000001.SZ", "000002.SZ", "600000.SH", "600036.SH"]
+    report_data = {"holdings": [{"stock_code": c, "stock_name": f"股票{i}"} for i, c in enumerate(codes)]}
+    service = FakeFanoutService("http://llm", "key", "model", cache=LLMResponseCache(":memory:"))
+
+    events = []
+    result = service.generate_weekly_analysis(
+        report_data, fanout=True, field_callback=lambda key, value, index: events.append((key, index))
+    )
+
+    assert [item["stock_code"] for item in result["stock_analysis"]] == codes
+    assert result["stock_analysis"][1]["status"] == "暂无分析"
+    assert result["core_viewpoint"] == "core_viewpoint"
+    assert service.max_active == 2
+    assert "股票0（000001.SZ）：多头趋势，neutral；建议：继续持有" in service.portfolio_prompts[0]
+    assert sorted(i for k, i in events if i is not None) == [0, 1, 2, 3]
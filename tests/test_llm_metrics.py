@@ -0,0 +1,83 @@
+"""Test LLM usage and latency metrics"""
+
+import asyncio
+import json
+
+import httpx
+
+import app.core.http as http
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_metrics import LLMUsage, summarize_reports
+from app.services.llm_service import LLMService
+
+
+def _sse(content_chunks, usage=None):
+    events = [{"choices": [{"delta": {"content": c}}]} for c in content_chunks]
+    if usage:
+        events.append({"choices": [], "usage": usage})
+    return "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+def test_async_call_records_usage_and_cache_hits(monkeypatch):
+    """Test usage from the final chunk is captured and cache hits cost no tokens"""
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_SECTION_REPAIR", False)
+    report = json.dumps({
+        "core_viewpoint": "x",
+        "kpis": {"weekly_return": 1.0, "benchmark_return": 0.5, "ytd_return": 3.0,
+                 "position_ratio": 80.0, "action_count": 0},
+        "holdings_analysis": {"summary": "s", "highlights": []},
+        "stock_analysis": [],
+        "action_plan": [],
+        "risk_assessment": {"level": "中", "level_score": 50.0, "current_risks": [], "optimization_suggestions": []},
+        "sector_view": {"summary": "s"},
+        "target_allocation": {},
+    })
+    body = _sse([report[:20], report[20:]], usage={"prompt_tokens": 1200, "completion_tokens": 345})
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(json.loads(request.content))
+        return httpx.Response(200, text=body)
+
+    async def run():
+        http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http._client_loop = asyncio.get_running_loop()
+        service = LLMService("http://llm/v1/chat/completions", "key", "model-a",
+                             cache=LLMResponseCache(":memory:"))
+        first, second = LLMUsage(), LLMUsage()
+        await service.generate_weekly_analysis_async({"holdings": []}, usage=first)
+        await service.generate_weekly_analysis_async({"holdings": []}, usage=second)
+        await http.close_async_client()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(requests_seen) == 1
+    assert requests_seen[0]["stream_options"] == {"include_usage": True}
+    metrics = first.to_dict()
+    assert (metrics["prompt_tokens"], metrics["completion_tokens"], metrics["total_tokens"]) == (1200, 345, 1545)
+    assert metrics["ttft_ms"] is not None and not metrics["usage_estimated"]
+    assert metrics["retries"] == 0
+
+    assert second.total_tokens == 0
+    assert second.to_dict()["cached_calls"] == 1
+
+
+def test_summarize_reports_by_model():
+    """Test per-model aggregation of stored report metrics"""
+    records = [
+        {"generation_time": 60, "llm_metrics": {"model": "a", "calls": 1, "cached_calls": 0, "total_tokens": 1000,
+                                                "ttft_ms": 800.0, "wall_ms": 50000.0, "retries": 0}},
+        {"generation_time": 80, "llm_metrics": {"model": "a", "calls": 1, "cached_calls": 0, "total_tokens": 3000,
+                                                "ttft_ms": 1200.0, "wall_ms": 70000.0, "retries": 1}},
+        {"generation_time": 5, "llm_metrics": {"model": "b", "calls": 1, "cached_calls": 1, "total_tokens": 0,
+                                               "ttft_ms": None, "wall_ms": 3.0, "retries": 0}},
+        {"generation_time": 5, "llm_metrics": None},
+    ]
+    summary = summarize_reports(records)
+
+    assert summary["a"]["reports"] == 2
+    assert summary["a"]["avg_total_tokens"] == 2000.0
+    assert summary["a"]["ttft_p50_ms"] == 1000.0
+    assert summary["a"]["retry_rate"] == 0.5
+    assert summary["b"]["wall_p50_ms"] is None
@@ -0,0 +1,110 @@
+"""Test model fallback and hedged requests"""
+
+import asyncio
+
+import pytest
+
+from app.core.exceptions import LLMAPIError
+from app.services.llm_policy import ModelPolicy
+from app.services.llm_service import LLMService
+
+
+def test_fallback_order_and_deadline():
+    """Test a model past its deadline falls back to the next model in order"""
+    calls = []
+
+    async def attempt(model, first_token):
+        calls.append(model)
+        if model == "slow":
+            await asyncio.sleep(1)
+        if model == "broken":
+            raise ValueError("invalid json")
+        return {"model": model}
+
+    policy = ModelPolicy(["slow", "broken", "fast"], deadlines={"slow": 0.05})
+    assert asyncio.run(policy.run(attempt)) == ("fast", {"model": "fast"})
+    assert calls == ["slow", "broken", "fast"]
+
+    single = ModelPolicy(["broken"])
+    with pytest.raises(ValueError):
+        asyncio.run(single.run(attempt))
+
+    def sync_attempt(model):
+        calls.append(model)
+        raise ValueError("invalid json")
+
+    with pytest.raises(LLMAPIError, match="所有模型均失败"):
+        ModelPolicy(["a", "b"]).run_sync(sync_attempt)
+    assert calls[-2:] == ["a", "b"]
+
+
+def test_hedge_starts_after_ttft_threshold_and_cancels_loser():
+    """Test a slow first token starts a hedge, the first valid result wins and the other is cancelled"""
+    cancelled = []
+
+    async def attempt(model, first_token):
+        try:
+            if model == "primary":
+                await asyncio.sleep(1)
+            else:
+                first_token.set()
+                await asyncio.sleep(0.01)
+            return {"model": model}
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+
+    policy = ModelPolicy(["primary", "hedge"], hedge_after=0.05)
+    assert asyncio.run(policy.run(attempt)) == ("hedge", {"model": "hedge"})
+    assert cancelled == ["primary"]
+
+    async def fast_primary(model, first_token):
+        first_token.set()
+        await asyncio.sleep(0.1)
+        return {"model": model}
+
+    # 首 token 在阈值内到达：不发起对冲
+    assert asyncio.run(policy.run(fast_primary)) == ("primary", {"model": "primary"})
+
+
+def test_truncated_result_does_not_win_the_race():
+    """Test a partial result from the primary waits for the hedge, and is kept only if the hedge fails"""
+    async def attempt(model, first_token):
+        if model == "primary":
+            await asyncio.sleep(0.1)
+            return {"core_viewpoint": "partial"}
+        await asyncio.sleep(0.2)
+        if model == "broken":
+            raise ValueError("invalid json")
+        return {"core_viewpoint": "full", "stock_analysis": []}
+
+    def accept(result):
+        return "stock_analysis" in result
+
+    policy = ModelPolicy(["primary", "hedge"], hedge_after=0.05)
+    assert asyncio.run(policy.run(attempt, accept)) == ("hedge", {"core_viewpoint": "full", "stock_analysis": []})
+
+    policy = ModelPolicy(["primary", "broken"], hedge_after=0.05)
+    assert asyncio.run(policy.run(attempt, accept)) == ("primary", {"core_viewpoint": "partial"})
+
+
+def test_callbacks_forwarded_until_a_hedge_starts():
+    """Test field callbacks stream live when no hedge starts, and only the winner is replayed after one does"""
+    class FakeService(LLMService):
+        async def _call_api_async(self, system_prompt, user_prompt, field_callback=None, model=None, **kwargs):
+            field_callback("core_viewpoint", f"{model}-early", None)
+            await asyncio.sleep(0.2 if model == "slow" else 0.01)
+            return {"core_viewpoint": model}
+
+    def run(models):
+        events = []
+        service = FakeService("http://llm", "key", models[0], cache=None,
+                              policy=ModelPolicy(models, hedge_after=0.05))
+        result = asyncio.run(service._run_policy_async(
+            "s", "u", 100, None, "report",
+            field_callback=lambda field, value, index: events.append(value), required=("core_viewpoint",)
+        ))
+        return result, events
+
+    assert run(["fast", "hedge"]) == (("fast", {"core_viewpoint": "fast"}), ["fast-early"])
+    assert run(["slow", "hedge"]) == (("hedge", {"core_viewpoint": "hedge"}), ["slow-early", "hedge"])
@@ -0,0 +1,87 @@
+"""Test LLM output schema validation and repair"""
+
+import json
+
+from app.services.llm_schema import REPORT_SCHEMA, STOCK_SCHEMA, repair_json, validate
+
+
+def test_recorded_legacy_output_is_repaired():
+    """Test the recorded sample (older field names and bare allocation numbers) is repaired in place"""
+    with open("test_llm_output.json", encoding="utf-8") as f:
+        data = json.load(f)
+    report = validate(data, REPORT_SCHEMA)
+
+    assert report.invalid == ["kpis.benchmark_return"]
+    assert data["action_plan"][0]["current_position_pct"] == 3.3
+    assert data["action_plan"][0]["target_position_pct"] == 0.0
+    assert data["target_allocation"]["cash"] == {"percent": 10.0, "label": "现金/货基"}
+
+
+def test_repairs_trailing_commas_truncation_and_field_types():
+    """Test text repair plus number, enum and list coercion, leaving unrepairable paths"""
+    text = '{"kpis": {"weekly_return": "+1.5%", "action_count": 2.0,}, "stock_analysis": [{"a": 1}, {"b": "x'
+    assert json.loads(repair_json(text)) == {
+        "kpis": {"weekly_return": "+1.5%", "action_count": 2.0}, "stock_analysis": [{"a": 1}]
+    }
+    assert repair_json('{"a": "unterminated') is None
+
+    item = {"stock_code": "600519.SH", "status": "趋势破位", "status_class": "红色",
+            "technical": 12, "suggestion": "<strong>减仓</strong>"}
+    report = validate(item, STOCK_SCHEMA)
+    assert report.ok
+    assert item["status_class"] == "negative" and item["technical"] == "12"
+
+    data = {
+        "core_viewpoint": "ok",
+        "kpis": {"weekly_return": "+1.5%", "benchmark_return": "-0.8", "ytd_return": 12, "position_ratio": "85%",
+                 "action_count": 2.0},
+        "holdings_analysis": {"summary": "s", "highlights": "only one"},
+        "stock_analysis": [],
+        "action_plan": [{"stock_code": "000651.SZ", "action": "逢高减仓", "action_class": "sell-ish",
+                         "current_position_pct": "38%", "target_position_pct": 30}],
+        "risk_assessment": {"level": "中等", "level_score": "65", "current_risks": [], "optimization_suggestions": []},
+        "sector_view": {"summary": "s"},
+        "target_allocation": {"cash": {"percent": "10%", "label": "现金"}, "tech": {"percent": "很多", "label": "科技"}},
+    }
+    report = validate(data, REPORT_SCHEMA)
+    assert data["kpis"]["weekly_return"] == 1.5 and data["kpis"]["action_count"] == 2
+    assert data["holdings_analysis"]["highlights"] == ["only one"]
+    assert data["action_plan"][0]["action_class"] == "reduce"
+    assert data["action_plan"][0]["current_position_pct"] == 38.0
+    assert report.invalid == ["target_allocation.tech.percent"]
+
+
+def test_service_regenerates_only_invalid_sections():
+    """Test invalid fields and entries are requested alone with valid context and merged back"""
+    from app.services.llm_cache import LLMResponseCache
+    from app.services.llm_metrics import LLMUsage
+    from app.services.llm_service import LLMService
+
+    with open("test_llm_output.json", encoding="utf-8") as f:
+        recorded = json.load(f)
+    recorded["kpis"]["benchmark_return"] = 0.5
+    broken = json.loads(json.dumps(recorded))
+    del broken["target_allocation"]
+    del broken["stock_analysis"][2]["suggestion"]
+    code = broken["stock_analysis"][2]["stock_code"]
+    prompts = []
+
+    class RepairingService(LLMService):
+        def _call_api(self, system_prompt, user_prompt, max_retries=3, stream_callback=None, field_callback=None,
+                      max_tokens=50000, metrics=None, model=None, deadline=None):
+            prompts.append(user_prompt)
+            if "【补全任务】" not in user_prompt:
+                return json.loads(json.dumps(broken))
+            return {"target_allocation": recorded["target_allocation"],
+                    "stock_analysis": [recorded["stock_analysis"][2]]}
+
+    usage = LLMUsage()
+    service = RepairingService("http://llm", "key", "model", cache=LLMResponseCache(":memory:"))
+    result = service.generate_weekly_analysis({"holdings": []}, usage=usage)
+
+    assert [c.kind for c in usage.calls] == ["report", "repair"]
+    assert f"`stock_analysis` 的第 3 个条目（stock_code: {code}）" in prompts[1]
+    assert "`target_allocation`：整体重新输出" in prompts[1]
+    assert result["stock_analysis"][2]["suggestion"] == recorded["stock_analysis"][2]["suggestion"]
+    assert result["target_allocation"]["cash"]["percent"] == 10.0
+    assert validate(result, REPORT_SCHEMA).ok
@@ -0,0 +1,62 @@
+"""Test LLM stream parsing"""
+
+import json
+
+from app.services.llm_stream import IncrementalJSONParser, StreamBuffer, parse_sse_line
+
+
+def test_parse_sse_line():
+    """Test content, skip and done handling for str and bytes lines"""
+    line = 'data: {"choices":[{"delta":{"content":"组合"}}]}'
+    assert parse_sse_line(line) == "组合"
+    assert parse_sse_line(line.encode("utf-8")) == "组合"
+    assert parse_sse_line('data:{"choices":[{"delta":{"role":"assistant"}}]}') == ""
+    assert parse_sse_line(": keep-alive") == ""
+    assert parse_sse_line("data: {broken") == ""
+    assert parse_sse_line("data: [DONE]") is None
+    assert parse_sse_line(b"data: [DONE]") is None
+
+
+def test_stream_buffer():
+    """Test buffer length tracking and single join"""
+    buffer = StreamBuffer()
+    for chunk in ["{", '"a"', ": 1", "}"]:
+        buffer.append(chunk)
+    assert len(buffer) == 8
+    assert buffer.getvalue() == '{"a": 1}'
+    buffer.append(" ")
+    assert buffer.getvalue() == '{"a": 1} '
+
+
+def test_incremental_parser_emits_fields_in_order():
+    """Test fields and array items are emitted as soon as they close"""
+    report = {
+        "core_viewpoint": "<p>仓位 \"偏高\", 注意 } 与 ]</p>",
+        "kpis": {"weekly_return": 1.2, "tags": ["a", "b"]},
+        "stock_analysis": [{"code": "600519.SH", "points": ["x"]}, {"code": "300750.SZ"}],
+        "action_plan": [],
+    }
+    text = "<think>先想想 {</think>\n```json\n" + json.dumps(report, ensure_ascii=False, indent=2) + "\n```"
+
+    events = []
+    parser = IncrementalJSONParser(
+        on_field=lambda key, value: events.append(key),
+        on_item=lambda key, index, item: events.append(f"{key}[{index}]"),
+    )
+    for i in range(0, len(text), 3):
+        parser.feed(text[i:i + 3])
+
+    assert parser.complete and not parser.errors
+    assert parser.result == report
+    assert events == ["core_viewpoint", "kpis", "stock_analysis[0]", "stock_analysis[1]",
+                      "stock_analysis", "action_plan"]
+
+
+def test_incremental_parser_keeps_fields_before_malformed_tail():
+    """Test a broken item or truncated tail only drops the affected part"""
+    parser = IncrementalJSONParser()
+    parser.feed('{"core_viewpoint": "ok", "stock_analysis": [{"a": 1}, {"a": }, {"a": 3}], "kpis": {"x": 1')
+
+    assert not parser.complete
+    assert parser.result == {"core_viewpoint": "ok", "stock_analysis": [{"a": 1}, {"a": 3}]}
+    assert len(parser.errors) == 1
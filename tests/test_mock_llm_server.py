@@ -0,0 +1,48 @@
+"""Test the offline mock LLM server against LLMService"""
+
+import asyncio
+import json
+
+import httpx
+
+import app.core.http as http
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_metrics import LLMUsage
+from app.services.llm_schema import REPORT_SCHEMA, validate
+from app.services.llm_service import LLMService
+from scripts.mock_llm_server import MockConfig, create_app
+
+
+def _run(config, report_data, fanout=False):
+    async def run():
+        http._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))
+        http._client_loop = asyncio.get_running_loop()
+        service = LLMService("http://mock/v1/chat/completions", "key", "mock-model",
+                             cache=LLMResponseCache(":memory:"))
+        usage = LLMUsage()
+        try:
+            result = await service.generate_weekly_analysis_async(report_data, fanout=fanout, usage=usage)
+        finally:
+            await http.close_async_client()
+        return result, usage
+
+    return asyncio.run(run())
+
+
+def test_replays_recorded_report_and_per_stock_items():
+    """Test full replay with usage, and fan-out requests get the matching stock entry"""
+    with open("test_llm_output.json", encoding="utf-8") as f:
+        recorded = json.load(f)
+    validate(recorded, REPORT_SCHEMA)  # 生成结果会按输出结构就地修复
+
+    result, usage = _run(MockConfig(chunk_chars=16, seed=1), {"holdings": []})
+    assert result == recorded
+    assert usage.calls[0].prompt_tokens > 0 and not usage.calls[0].usage_estimated
+
+    item = recorded["stock_analysis"][1]
+    holdings = [{"stock_code": item["stock_code"], "stock_name": item["stock_name"], "position_ratio": 10.0}]
+    result, usage = _run(MockConfig(seed=1), {"holdings": holdings}, fanout=True)
+    assert result["stock_analysis"][0]["status"] == item["status"]
+    assert result["core_viewpoint"] == recorded["core_viewpoint"]
+    # 录制的输出缺少 kpis.benchmark_return，组合层面结果会单独请求补全一次
+    assert [c.kind for c in usage.calls] == ["stock", "portfolio", "repair"]
@@ -0,0 +1,60 @@
+"""Test portfolio optimizer"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.cache import TradingDayCache
+from app.services.market_panel import PricePanel
+from app.services.optimizer_service import (
+    OptimizerService,
+    mean_variance_weights,
+    project_capped_simplex,
+    risk_parity_weights,
+)
+from app.services.risk_service import RiskService
+
+
+def test_project_capped_simplex():
+    """Test projection satisfies budget and bounds"""
+    w = project_capped_simplex(np.array([0.5, 0.1, -0.2, 0.9]), 0.8, 0.3)
+    assert w.sum() == pytest.approx(0.8)
+    assert w.min() >= 0 and w.max() <= 0.3 + 1e-12
+
+
+def test_min_variance_and_risk_parity_on_diagonal_covariance():
+    """Test closed-form solutions for uncorrelated assets"""
+    variances = np.array([0.04, 0.09, 0.16])
+    cov = np.diag(variances)
+
+    mv = mean_variance_weights(cov, np.zeros(3), 1.0, 1.0, 1.0)
+    inverse_var = (1 / variances) / (1 / variances).sum()
+    assert np.allclose(mv, inverse_var, atol=1e-8)
+
+    capped = mean_variance_weights(cov, np.zeros(3), 1.0, 1.0, 0.4)
+    assert capped.max() <= 0.4 + 1e-12
+    assert capped.sum() == pytest.approx(1.0)
+
+    rp = risk_parity_weights(cov, 0.9)
+    inverse_vol = (1 / np.sqrt(variances)) / (1 / np.sqrt(variances)).sum() * 0.9
+    assert np.allclose(rp, inverse_vol, atol=1e-8)
+
+
+def test_optimize_panel():
+    """Test optimizer keeps the invested budget and respects the weight cap"""
+    rng = np.random.default_rng(3)
+    codes = [f"60{i:04d}.SH" for i in range(20)]
+    dates = pd.bdate_range("2025-01-01", periods=120)
+    closes = 10 * np.cumprod(1 + rng.normal(0.0005, 0.02, size=(120, 20)), axis=0)
+    panel = PricePanel(codes, dates, closes)
+    weights = {c: 0.04 for c in codes}
+
+    service = OptimizerService(max_weight=0.15, risk_service=RiskService(cache=TradingDayCache()))
+    result = service.optimize(panel, weights)
+
+    assert result["budget_pct"] == pytest.approx(80.0)
+    for key in ("mean_variance", "min_variance", "risk_parity"):
+        pcts = [h[f"{key}_pct"] for h in result["holdings"]]
+        assert sum(pcts) == pytest.approx(80.0)
+    assert max(h["min_variance_pct"] for h in result["holdings"]) <= 15.0 + 1e-9
+    assert result["methods"]["min_variance"]["volatility_pct"] <= result["current"]["volatility_pct"] + 1e-9
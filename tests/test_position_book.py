@@ -0,0 +1,32 @@
+"""Test vectorized position book"""
+
+import pytest
+from app.services.position_book import PositionBook
+
+
+def test_position_book_metrics():
+    """Test market value, P&L and weights are computed for all holdings"""
+    book = PositionBook(
+        ["600519.SH", "000651.SZ"],
+        quantities=[100, 4000],
+        cost_prices=[1500.0, 40.0],
+        current_prices=[1450.0, 41.0]
+    )
+    records = book.to_records(total_assets=400000.0)
+
+    assert records[0]["market_value"] == pytest.approx(145000.0)
+    assert records[0]["profit_loss"] == pytest.approx(-5000.0)
+    assert records[1]["profit_loss_pct"] == pytest.approx(2.5)
+    assert records[1]["position_ratio"] == pytest.approx(41.0)
+
+    summary = book.summary(400000.0)
+    assert summary["total_market_value"] == pytest.approx(309000.0)
+    assert summary["cash"] == pytest.approx(91000.0)
+    assert summary["position_count"] == 2
+
+
+def test_position_book_zero_cost():
+    """Test zero-cost holdings do not divide by zero"""
+    book = PositionBook(["510300.SH"], [0], [0.0], [4.0])
+    assert book.to_records()[0]["profit_loss_pct"] == 0
+    assert book.summary(0)["position_ratio"] == 0
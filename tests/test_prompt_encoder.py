@@ -0,0 +1,52 @@
+"""Test compact prompt encoding and token budgeting"""
+
+from app.services.llm_service import LLMService
+from app.services.prompt_encoder import (
+    CORE_DETAIL,
+    compact_number,
+    encode_holdings,
+    estimate_tokens,
+)
+
+
+def _holding(i, with_indicators=True):
+    indicators = {"MA5": 10.123456, "MA20": 10.5, "RSI12": 55.55555, "MACD": None, "BOLL_upper": None}
+    return {
+        "stock_code": f"{600000 + i}.SH",
+        "stock_name": f"股票{i}",
+        "current_price": 10.0 + i,
+        "cost_price": 9.87654,
+        "quantity": 100 * (i + 1),
+        "market_value": 1000.0 * (i + 1),
+        "profit_loss": -12.3456,
+        "profit_loss_pct": -1.23456,
+        "position_ratio": 50.0 / (i + 1),
+        "indicators": indicators if with_indicators else {},
+    }
+
+
+def test_compact_encoding():
+    """Test rounding, None indicator columns and detail levels"""
+    assert compact_number(1.2300001) == "1.23"
+    assert compact_number(-0.0001) == "0"
+    assert compact_number(None) == ""
+
+    table = encode_holdings([_holding(0), _holding(1)])
+    header, first = table.splitlines()[:2]
+    assert header == "代码,名称,现价,成本,数量,市值,盈亏,盈亏%,仓位%,MA5,MA20,RSI12"
+    assert first == "600000.SH,股票0,10,9.877,100,1000,-12,-1.23,50,10.12,10.5,55.6"
+
+    assert encode_holdings([_holding(0)], CORE_DETAIL).splitlines()[0].endswith("仓位%,MA20,RSI12")
+
+
+def test_user_prompt_respects_budget(monkeypatch):
+    """Test large portfolios degrade to fit the token budget"""
+    report_data = {"holdings": [_holding(i) for i in range(400)]}
+    service = LLMService("http://llm", "key", "model")
+
+    full = service._build_user_prompt(report_data)
+    monkeypatch.setattr("app.services.llm_service.settings.LLM_PROMPT_MAX_TOKENS", 2000)
+    budgeted = service._build_user_prompt(report_data)
+
+    assert estimate_tokens(budgeted) <= 2000 < estimate_tokens(full)
+    assert "股票0" in budgeted and "其余" in budgeted
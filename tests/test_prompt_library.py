@@ -0,0 +1,37 @@
+"""Test versioned prompt templates"""
+
+import json
+
+from app.services.llm_service import LLMService
+from app.services.prompt_library import PromptLibrary, get_prompt_library
+
+
+def test_system_prefix_is_compiled_once_and_stable():
+    """Test the library is shared per version and system prompts are identical across services"""
+    assert get_prompt_library() is get_prompt_library()
+    first, second = LLMService("http://llm", "key", "a"), LLMService("http://llm", "key", "b")
+
+    assert first._build_system_prompt() is second._build_system_prompt()
+    portfolio = first._build_system_prompt() + first.prompts.static("portfolio_note.md")
+    assert portfolio.startswith(second._build_system_prompt())
+    assert "## 1. 允许使用的 HTML" in first._build_stock_system_prompt()
+    assert PromptLibrary().fingerprint() == get_prompt_library().fingerprint()
+
+
+def test_user_prompts_render_data():
+    """Test data only appears in user prompts and numbers keep their formats"""
+    with open("test_output_data.json", encoding="utf-8") as f:
+        report_data = json.load(f)
+    service = LLMService("http://llm", "key", "model")
+
+    prompt = service._build_user_prompt(report_data)
+    assert f"（共 {len(report_data['holdings'])} 只）" in prompt
+    assert f"¥{report_data['metrics']['cash']:,.2f}" in prompt
+    assert "{{" not in prompt and "{%" not in prompt
+
+    report_data["attribution"] = {"week": {"holdings": [
+        {"stock_code": report_data["holdings"][0]["stock_code"], "contribution_pct": 0.42}
+    ]}}
+    stock_prompt = service._build_stock_prompt(report_data, report_data["holdings"][0])
+    assert "- 该股本周对组合收益的贡献：+0.42%\n\n【持仓数据】" in stock_prompt
+    assert "量化参考配置" not in stock_prompt
@@ -0,0 +1,92 @@
+"""Test rebalance simulator"""
+
+import numpy as np
+import pytest
+
+from app.services.position_book import PositionBook
+from app.services.rebalance_service import (
+    RebalanceSimulator,
+    check_target_allocation,
+    price_limit_ratio,
+    round_shares,
+    targets_from_action_plan,
+)
+
+
+def _book() -> PositionBook:
+    return PositionBook(
+        ["600519.SH", "300750.SZ", "688981.SH"],
+        [100, 1000, 500],
+        [1500.0, 180.0, 50.0],
+        [1500.0, 200.0, 60.0],
+        ["贵州茅台", "宁德时代", "中芯国际"],
+    )
+
+
+def _simulator() -> RebalanceSimulator:
+    return RebalanceSimulator(commission_rate=0.00025, min_commission=5.0,
+                              stamp_tax_rate=0.0005, transfer_fee_rate=0.00001)
+
+
+def test_price_limits_and_lots():
+    """Test board-specific price limits and lot rounding"""
+    assert price_limit_ratio("600519.SH") == 0.10
+    assert price_limit_ratio("300750.SZ") == 0.20
+    assert price_limit_ratio("430047.BJ") == 0.30
+    assert price_limit_ratio("600000.SH", "*ST某某") == 0.05
+
+    shares = round_shares(["600519.SH", "688981.SH", "688981.SH"], np.array([250.0, 250.7, 150.0]))
+    assert shares.tolist() == [200.0, 250.0, 0.0]
+
+
+def test_simulate_respects_cash_and_costs():
+    """Test sells fund buys, orders are lot-rounded and cash never goes negative"""
+    book = _book()
+    cash = 20000.0
+    result = _simulator().simulate(book, cash, {"600519.SH": 0.0, "300750.SZ": 0.8})
+
+    orders = {o["stock_code"]: o for o in result["orders"]}
+    assert orders["600519.SH"]["side"] == "sell"
+    assert orders["600519.SH"]["shares"] == 100 and orders["600519.SH"]["clear"]
+    assert orders["300750.SZ"]["side"] == "buy"
+    assert orders["300750.SZ"]["shares"] % 100 == 0
+    assert "688981.SH" not in orders
+
+    assert result["cash_after"] >= 0
+    assert result["total_assets_after"] == pytest.approx(result["total_assets_before"] - result["total_cost"])
+    weights = {w["stock_code"]: w for w in result["weights"]}
+    assert abs(weights["300750.SZ"]["deviation_pct"]) < 1.0
+
+
+def test_simulate_blocks_limit_moves():
+    """Test limit-down blocks sells and limit-up blocks buys"""
+    book = _book()
+    prev_close = {"600519.SH": 1666.67, "300750.SZ": 166.67}
+    result = _simulator().simulate(book, 50000.0, {"600519.SH": 0.0, "300750.SZ": 0.6},
+                                   prev_close=prev_close)
+
+    blocked = {o["stock_code"]: o["blocked"] for o in result["orders"] if o["blocked"]}
+    assert blocked == {"600519.SH": "跌停无法卖出", "300750.SZ": "涨停无法买入"}
+    assert result["cash_after"] == pytest.approx(50000.0)
+
+
+def test_targets_and_allocation_check():
+    """Test target extraction and allocation consistency"""
+    plan = [{"stock_code": "600519.SH", "target_position_pct": "40%"},
+            {"stock_code": "300750.SZ", "target_position_pct": None}]
+    assert targets_from_action_plan(plan) == {"600519.SH": 0.4}
+
+    check = check_target_allocation({"consumer": {"percent": 60}, "cash": {"percent": 30}}, 30.0)
+    assert not check["consistent"]
+    assert check["total_pct"] == 90
+
+
+def test_simulate_drops_all_buys_without_cash():
+    """Test buys are cancelled with a distinct warning when no cash can fund them"""
+    # 其余持仓收于跌停无法卖出，透支的现金无法为买入提供资金
+    prev_close = {"600519.SH": 1700.0, "300750.SZ": 260.0, "688981.SH": 60.0}
+    result = _simulator().simulate(_book(), -1000.0, {"688981.SH": 0.5}, prev_close=prev_close)
+
+    assert not [o for o in result["orders"] if o["side"] == "buy" and o["shares"] > 0]
+    assert "可用资金不足，全部买入委托已取消" in result["warnings"]
+    assert not any("缩减" in w for w in result["warnings"])
@@ -0,0 +1,40 @@
+"""Test compressed report storage"""
+
+from datetime import date
+
+from sqlalchemy import LargeBinary, create_engine, type_coerce
+from sqlalchemy.orm import sessionmaker
+
+from app.core.compression import GZIP_MAGIC, accepts_gzip, decompress_text
+from app.core.database import Base
+from app.models import Report
+
+
+def test_report_content_is_stored_compressed_and_loaded_lazily():
+    """Test content/HTML round-trip through gzip blobs, load on access and expose the raw bytes"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    html = "<html>" + "<div class='stock-card'>贵州茅台</div>" * 500 + "</html>"
+    analysis = {"core_viewpoint": "观点", "action_plan": [{"stock_code": "600519.SH", "target_position_pct": 30.0}]}
+    db.add(Report(portfolio_id=1, report_date=date(2025, 11, 28), content=analysis, html_content=html))
+    db.commit()
+    db.expunge_all()
+
+    report = db.query(Report).first()
+    assert "html_content" not in report.__dict__ and "content" not in report.__dict__
+    assert report.html_content == html and report.content == analysis
+    assert db.query(Report.report_date, Report.content).one() == (date(2025, 11, 28), analysis)
+
+    blob = db.query(type_coerce(Report.html_content, LargeBinary)).scalar()
+    assert blob.startswith(GZIP_MAGIC) and len(blob) * 20 < len(html.encode("utf-8"))
+    assert decompress_text(blob) == html
+
+
+def test_accepts_gzip():
+    """Test Accept-Encoding negotiation"""
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, *;q=0.5")
+    assert not accepts_gzip("gzip;q=0, *")
+    assert not accepts_gzip(None)
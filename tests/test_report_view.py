@@ -0,0 +1,53 @@
+"""Test weekly report view model"""
+
+from app.services.report_view import build_attribution_rows, build_report_view
+
+
+def test_holdings_joined_with_analysis_and_actions():
+    """Test holdings pick up their analysis by code and classes/numbers are precomputed"""
+    data = {
+        "holdings": [
+            {"stock_code": "A", "stock_name": "甲", "current_price": 10, "cost_price": 8, "market_value": 1000,
+             "position_ratio": 40.0, "profit_loss": 200, "profit_loss_pct": 25.0},
+            {"stock_code": "B", "stock_name": "乙", "current_price": 5, "cost_price": 6, "market_value": 500,
+             "position_ratio": 20.0, "profit_loss": -100, "profit_loss_pct": -16.666},
+        ],
+        "analysis": {
+            "stock_analysis": [
+                {"stock_code": "B", "stock_role": "卫星仓位", "status": "破位", "status_class": "negative",
+                 "technical": "跌破均线", "suggestion": "减仓"},
+                {"stock_code": "A", "stock_role": "核心仓位", "status": "多头", "status_class": "bogus",
+                 "technical": "站上均线", "suggestion": "持有"},
+            ],
+            "action_plan": [
+                {"stock_code": "B", "action": "减仓", "action_class": "reduce",
+                 "current_position_pct": 20, "target_position_pct": 10},
+            ],
+        },
+    }
+    view = build_report_view(data)
+
+    a, b = view["holdings"]
+    assert (a["role_class"], a["status_class"], a["arrow"]) == ("role-core", "neutral", "▲")
+    assert (b["role_class"], b["status_class"], b["profit_loss_pct"]) == ("role-satellite", "negative", "-16.67")
+    assert b["profit_loss_class"] == "text-down" and a["market_value"] == "1000.00"
+
+    card = view["stock_cards"][0]
+    assert card["stock_name"] == "乙" and card["subtitle"] == "B · 卫星仓位"
+    assert card["points"] == ["跌破均线", "减仓"]
+    assert view["actions"][0]["stock_name"] == "乙"
+    assert view["actions"][0]["badge_class"] == "badge-action badge-reduce"
+    assert view["actions"][0]["target_position_pct"] == "10.0"
+
+
+def test_attribution_rows_join_ytd_contribution():
+    """Test weekly contribution rows carry the year-to-date contribution of the same holding"""
+    holding = {"stock_code": "A", "stock_name": "甲", "sector": "消费", "start_weight_pct": 40.0,
+               "return_pct": 1.0, "contribution_pct": 0.4}
+    rows = build_attribution_rows({
+        "week": {"holdings": [holding, {**holding, "stock_code": "B", "contribution_pct": -0.1}]},
+        "ytd": {"holdings": [{"stock_code": "A", "contribution_pct": -2.5}]},
+    })
+    assert rows[0]["ytd_contribution_pct"] == "-2.50" and rows[0]["ytd_contribution_class"] == "text-down"
+    assert rows[1]["ytd_contribution_pct"] == "+0.00" and rows[1]["contribution_class"] == "text-down"
+    assert "ytd_contribution_pct" not in build_attribution_rows({"week": {"holdings": [holding]}})[0]
@@ -0,0 +1,77 @@
+"""Test risk analytics"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.cache import TradingDayCache
+from app.services.market_panel import PricePanel
+from app.services.risk_service import RiskService, concentration, max_drawdown, shrunk_covariance
+
+
+def _panel(days: int = 60) -> PricePanel:
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2025-01-01", periods=days)
+    rets = rng.normal(0, 0.02, size=(days, 3))
+    closes = 10 * np.cumprod(1 + rets, axis=0)
+    return PricePanel(["600519.SH", "000858.SZ", "000651.SZ"], dates, closes)
+
+
+def test_shrunk_covariance_is_symmetric_psd():
+    """Test shrunk covariance is a valid covariance matrix"""
+    cov, shrinkage = shrunk_covariance(_panel().returns())
+    assert cov.shape == (3, 3)
+    assert np.allclose(cov, cov.T)
+    assert np.all(np.linalg.eigvalsh(cov) >= 0)
+    assert 0.0 <= shrinkage <= 1.0
+
+
+def test_max_drawdown():
+    """Test max drawdown on a simple NAV path"""
+    assert max_drawdown(np.array([1.0, 1.2, 0.9, 1.1])) == pytest.approx(-0.25)
+
+
+def test_assess_and_cache():
+    """Test risk metrics are computed once per trading day"""
+    cache = TradingDayCache()
+    service = RiskService(cache=cache)
+    panel = _panel()
+    weights = {"600519.SH": 0.5, "000858.SZ": 0.3, "000651.SZ": 0.1}
+
+    result = service.assess(panel, weights, total_assets=100000.0, portfolio_id=1)
+    assert result["annual_volatility_pct"] > 0
+    assert result["historical_cvar_pct"] >= result["historical_var_pct"]
+    assert 0 <= result["risk_score"] <= 100
+    assert sum(c["risk_contribution_pct"] for c in result["risk_contributions"]) == pytest.approx(100.0)
+
+    assert service.assess(panel, weights, total_assets=100000.0, portfolio_id=1) is result
+    assert cache.hits == 1
+
+
+def test_assess_insufficient_data():
+    """Test short histories are skipped"""
+    assert RiskService(cache=TradingDayCache()).assess(_panel(5), {}, 0.0) == {}
+
+
+def test_covariance_cache_keyed_by_panel_window():
+    """Test panels with the same codes, length and last day but different windows do not share a covariance"""
+    service = RiskService(cache=TradingDayCache())
+    full = _panel(61)
+    recent = PricePanel(full.stock_codes, full.dates[1:], full.closes[1:])
+    keep = np.r_[0:30, 31:61]
+    gapped = PricePanel(full.stock_codes, full.dates[keep], full.closes[keep])
+    assert len(recent) == len(gapped) and recent.trading_day == gapped.trading_day
+
+    cov_recent, _ = service.covariance(recent)
+    cov_gapped, _ = service.covariance(gapped)
+    assert np.allclose(cov_gapped, shrunk_covariance(gapped.returns())[0])
+    assert not np.allclose(cov_recent, cov_gapped)
+    assert service.covariance(recent)[0] is cov_recent
+
+
+def test_concentration_uses_invested_weights():
+    """Test every concentration metric is relative to invested capital, not total assets"""
+    result = concentration(np.array([0.3, 0.1, 0.1]))
+    assert result["top1_pct"] == pytest.approx(60.0)
+    assert result["top3_pct"] == pytest.approx(100.0)
+    assert result["effective_n"] == pytest.approx(1 / (0.6 ** 2 + 0.2 ** 2 + 0.2 ** 2))
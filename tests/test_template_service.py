@@ -0,0 +1,106 @@
+"""Test template environment sharing and weekly report rendering"""
+
+import json
+
+from app.services.llm_schema import REPORT_SCHEMA, validate
+from app.services import template_service
+from app.services.template_service import (
+    SectionCache,
+    TemplateService,
+    get_template_environment,
+    precompile_templates,
+)
+
+
+def sample_report_data():
+    """Sample report data plus the recorded analysis, completed with the fields newer templates expect"""
+    with open("test_output_data.json", encoding="utf-8") as f:
+        report_data = json.load(f)
+    with open("test_llm_output.json", encoding="utf-8") as f:
+        analysis = json.load(f)
+    validate(analysis, REPORT_SCHEMA)
+    analysis["kpis"]["benchmark_return"] = 0.3
+    analysis["section_subtitles"] = {
+        key: f"{key} 小标题" for key in ("overview", "holdings", "stock", "action", "risk", "sector")
+    }
+    return {**report_data, "analysis": analysis, "rebalance": None}
+
+
+def test_environment_is_shared_and_precompiled(tmp_path, monkeypatch):
+    """Test services share one environment with a bytecode cache and templates compile once"""
+    monkeypatch.setattr("app.services.template_service.settings.TEMPLATE_CACHE_DIR", str(tmp_path / "jinja"))
+    monkeypatch.setattr("app.services.template_service._environments", {})
+
+    env = get_template_environment()
+    assert TemplateService().env is env and TemplateService().env is env
+    assert env.bytecode_cache is not None and not env.auto_reload
+    assert "format_price" in env.filters
+
+    assert precompile_templates() >= 1
+    assert list((tmp_path / "jinja").iterdir())
+    assert env.get_template("weekly_report.html") is env.get_template("weekly_report.html")
+
+
+def test_render_weekly_report():
+    """Test the weekly report renders holdings and analysis"""
+    data = sample_report_data()
+    html = TemplateService().render_weekly_report(data)
+    assert data["holdings"][0]["stock_name"] in html
+    assert data["analysis"]["stock_analysis"][0]["status"] in html
+
+
+def test_unchanged_sections_are_reused(monkeypatch):
+    """Test editing one action row re-renders only the actions section and matches a cold render"""
+    monkeypatch.setattr(template_service, "section_cache", SectionCache(256))
+    service = TemplateService()
+    data = sample_report_data()
+    service.render_weekly_report(data)
+    cache = template_service.section_cache
+    cards = len(data["analysis"]["stock_analysis"])
+    assert (cache.hits, cache.misses) == (0, 6 + cards)
+
+    data["analysis"]["action_plan"][0]["action"] = "清仓离场"
+    html = service.render_weekly_report(data)
+    assert (cache.hits, cache.misses) == (5 + cards, 7 + cards)
+    assert "清仓离场" in html
+
+    monkeypatch.setattr(template_service, "section_cache", SectionCache(0))
+    assert service.render_weekly_report(data) == html
+
+
+def test_stream_matches_full_render():
+    """Test the streamed report arrives in several chunks that join to the full render"""
+    service = TemplateService()
+    data = sample_report_data()
+    chunks = list(service.stream_weekly_report(data))
+    assert len(chunks) > 1
+    assert "".join(chunks) == service.render_weekly_report(data)
+
+
+def test_push_digest_is_compact_markdown():
+    """Test the push digest keeps the key content as Markdown at a fraction of the HTML size"""
+    service = TemplateService()
+    data = sample_report_data()
+    digest = service.render_push_digest(data)
+    html = service.render_weekly_report(data)
+
+    assert "<style" not in digest and "<span" not in digest
+    assert f"| {data['holdings'][0]['stock_name']} |" in digest
+    assert data["analysis"]["risk_assessment"]["level"] in digest
+    assert len(html.encode("utf-8")) >= 5 * len(digest.encode("utf-8"))
+
+
+def test_risk_gauge_uses_one_source():
+    """Test the risk gauge width and label come from risk_metrics when present, else from the LLM"""
+    data = sample_report_data()
+    risk = data["analysis"]["risk_assessment"]
+    risk["level"], risk["level_score"] = "LLM等级", 35
+    html = TemplateService().render_weekly_report(data)
+    assert 'style="width: 35%;"' in html and ">LLM等级<" in html
+
+    data["risk_metrics"] = {"risk_score": 72, "risk_level": "较高", "annual_volatility_pct": 20.0, "observations": 60,
+                            "confidence": 0.95, "historical_var_pct": 2.0, "historical_cvar_pct": 3.0,
+                            "parametric_var_pct": 2.1, "parametric_var_amount": 1000.0, "max_drawdown_pct": -8.0,
+                            "beta": None, "effective_n": 4.0, "top3_pct": 60.0}
+    html = TemplateService().render_weekly_report(data)
+    assert 'style="width: 72%;"' in html and ">较高<" in html and "LLM等级" not in html